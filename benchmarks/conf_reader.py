@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+"""Compare BibParser's conf reader against ConfigParser
+
+Usage: conf_reader.py [number of entries]"""
+
+import configparser
+import os
+import sys
+import tempfile
+import timeit
+
+from pybib import BibParser
+from pybib import Entry
+
+ENTRY = """[entry{n}]
+title: A Study of Things, Part {n}
+author: Jim Basney, Terry Fleury and Von Welch
+booktitle: Symposium on Identity and Trust on the Internet
+year: {year}
+mon: April
+url: http://example.com/papers/{n}.pdf
+project: TeraGrid
+type: paper
+
+"""
+
+def configparser_parse(filenames):
+    """The original ConfigParser-based implementation of BibParser"""
+    entries = []
+    config = configparser.ConfigParser(strict=False)
+    config.read(filenames)
+    for section in config.sections():
+        entry = Entry(config.items(section))
+        entry["key"] = section
+        entry.setdefault("month", None)
+        entry.setdefault("howpublished", None)
+        entries.append(entry)
+    return entries
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv
+    count = int(argv[1]) if len(argv) > 1 else 10000
+
+    fd, filename = tempfile.mkstemp(suffix=".conf")
+    with os.fdopen(fd, "w") as f:
+        for n in range(count):
+            f.write(ENTRY.format(n=n, year=1990 + n % 30))
+    try:
+        parser = BibParser()
+        for name, func in [
+                ("configparser", lambda: configparser_parse([filename])),
+                ("BibParser", lambda: parser.parse_bib([filename]))]:
+            elapsed = min(timeit.repeat(func, number=1, repeat=3))
+            print("{:>12}: {:.3f}s {:>10.0f} entries/s".format(
+                name, elapsed, count / elapsed))
+    finally:
+        os.unlink(filename)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+"""Generate a synthetic bibliography for benchmarking
+
+Usage: generate.py [-f bib|conf] [-s seed] count filename
+
+Entries have realistic fields: one to eight authors drawn, with a few
+prolific ones, from a pool of names; titles of common words; mostly
+recent years; month names in various forms or missing; conference or
+journal names; and URLs, DOIs and projects on some. The same seed and
+count always give the same bibliography."""
+
+import argparse
+import itertools
+import random
+import sys
+
+from pybib import BibTexWriter
+from pybib import BibWriter
+from pybib import Entry
+
+GIVEN_NAMES = """Jim Terry Von Nancy Himanshu James Mehedi Mike Randy Daniel
+David Chris Amit Warren John Adam Marianne Charlie Maifi Roy Jim Doru
+Sassa Mark Stuart Bill Patrick Michael Jing Jeffrey Joseph Jin Joe Meenal
+Frank Kate Monte Rachana Tim Tom Ian Ann Leara Willian Ludwig Anne Maria
+Wei Li Yuki Priya Ahmed Olga Pierre Sofia""".split()
+
+FAMILY_NAMES = """Basney Fleury Welch Wilkins-Diehr Khurana Bakht Freemon
+Butler Katz Hart Jordan Majumdar Navarro Smith Towns Lee Winslett Catlett
+Khan Campbell Barlow Marcusiu Chadwick Otenko Servilla Gage Baker Duda
+Gehrig Bletzinger Tao Hutzelman Salowey Galbraith Flanigan Heo Muggli
+Pant Slagell Barton Freeman Scavo Siebenlist Ananthakrishnan Goode
+Keahey Allcock Chervenak Foster Pearlman Wilde Humphrey Zhang Wang Chen
+Kumar Garcia Müller Dubois Rossi Tanaka""".split()
+
+TITLE_WORDS = """grid security identity federated trust authentication
+authorization infrastructure distributed computing science gateway model
+implementation lessons learned framework collaborative incident response
+investigation analysis cyberinfrastructure credential management
+certificate authority delegation policy access control virtual
+organization cloud network monitoring privacy scalable secure system
+approach study large scale data services""".split()
+
+VENUES = [
+    ("booktitle", "Symposium on Identity and Trust on the Internet"),
+    ("booktitle", "TeraGrid Conference"),
+    ("booktitle", "IEEE International Symposium on High Performance "
+     "Distributed Computing"),
+    ("booktitle", "Conference on Computer and Communications Security"),
+    ("booktitle", "Grid Computing Environments Workshop"),
+    ("journal", "Concurrency and Computation: Practice and Experience"),
+    ("journal", "Future Generation Computer Systems"),
+    ("journal", "Journal of Grid Computing"),
+]
+
+MONTHS = ["January", "February", "March", "April", "May", "June", "July",
+          "August", "September", "October", "November", "December"]
+
+PROJECTS = ["TeraGrid", "NCASSR", "gridshib", "MyProxy", "CILogon"]
+
+def generate_entries(count, seed=0):
+    """Generate count synthetic entries"""
+    rng = random.Random(seed)
+    # A pool of people, earlier ones appearing far more often
+    people = ["{} {}".format(rng.choice(GIVEN_NAMES),
+                             rng.choice(FAMILY_NAMES))
+              for _ in range(max(100, count // 20))]
+    cum_weights = list(itertools.accumulate(
+        1.0 / (n + 1) for n in range(len(people))))
+    for n in range(count):
+        entry = Entry()
+        entry["key"] = "entry{}".format(n)
+        words = rng.choices(TITLE_WORDS, k=rng.randint(3, 12))
+        words[0] = words[0].capitalize()
+        entry["title"] = " ".join(words)
+        authors = []
+        for author in rng.choices(people, cum_weights=cum_weights,
+                                  k=rng.randint(1, 8)):
+            if author not in authors:
+                authors.append(author)
+        if len(authors) > 1:
+            entry["author"] = ", ".join(authors[:-1]) + " and " + authors[-1]
+        else:
+            entry["author"] = authors[0]
+        field, venue = rng.choice(VENUES)
+        entry[field] = venue
+        # Skewed towards recent years
+        entry["year"] = str(2012 - int(rng.triangular(0, 25, 0)))
+        month = rng.random()
+        if month < 0.6:
+            entry["month"] = rng.choice(MONTHS)
+        elif month < 0.8:
+            entry["month"] = rng.choice(MONTHS)[:3]
+        if rng.random() < 0.7:
+            entry["url"] = "http://example.org/papers/{}/{}.pdf".format(
+                entry["year"], n)
+        if rng.random() < 0.4:
+            entry["doi"] = "10.{}/{}".format(1000 + n % 500, n)
+        if rng.random() < 0.5:
+            entry["project"] = rng.choice(PROJECTS)
+        entry["type"] = "paper"
+        yield entry
+
+def write_corpus(filename, count, fmt="bib", seed=0):
+    """Write count synthetic entries to filename in fmt, "bib" or "conf" """
+    writer = BibTexWriter() if fmt == "bib" else BibWriter()
+    with open(filename, "w") as f:
+        writer.write_iter(generate_entries(count, seed), f)
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("-f", "--format",
+                        choices=["bib", "conf"], default="bib",
+                        help="format to write (default %(default)s)")
+    parser.add_argument("-s", "--seed",
+                        type=int, default=0,
+                        help="random seed (default %(default)s)")
+    parser.add_argument("count", type=int, help="number of entries")
+    parser.add_argument("filename", help="file to write")
+    args = parser.parse_args(argv[1:])
+    write_corpus(args.filename, args.count, args.format, args.seed)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
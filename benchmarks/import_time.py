@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+"""Check pybib and its scripts start quickly
+
+Usage: import_time.py [-n runs] [--max-ms MS]
+
+Each case is run in a fresh interpreter, reporting the median time to
+import or start it and any heavy modules it loaded that it shouldn't
+have. Exits with status 1 if any did, or took longer than --max-ms."""
+
+import argparse
+import os.path
+import statistics
+import subprocess
+import sys
+
+TOP = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPTS = os.path.join(TOP, "scripts")
+
+# Modules only some of pybib needs
+HEAVY = ["requests", "urllib3", "ssl", "mako", "multiprocessing",
+         "concurrent.futures"]
+
+# (name, code to run, heavy modules it may load)
+CASES = [
+    ("import pybib", "import pybib", []),
+    ("parsers and writers",
+     "from pybib import BibParser, BibTexParser, BibWriter, BibTexWriter",
+     []),
+    ("pyBib.py --version",
+     "run_script('pyBib.py', '--version')", []),
+    ("convert-bibtex.py --help",
+     "run_script('convert-bibtex.py', '--help')", []),
+    ("pyBib-check-urls.py --help",
+     "run_script('pyBib-check-urls.py', '--help')",
+     ["requests", "urllib3", "ssl", "concurrent.futures"]),
+]
+
+# Run in the child: time code, then print time and heavy modules loaded
+CHILD = """
+import runpy, sys, time
+def run_script(name, *args):
+    sys.argv = [name] + list(args)
+    try:
+        runpy.run_path({scripts!r} + "/" + name, run_name="__main__")
+    except SystemExit:
+        pass
+start = time.perf_counter()
+{code}
+elapsed = time.perf_counter() - start
+print(elapsed, " ".join(m for m in {heavy!r} if m in sys.modules))
+"""
+
+def run_case(code, runs):
+    """Return (median seconds, set of heavy modules loaded) for code"""
+    times = []
+    loaded = set()
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        [TOP] + [p for p in [env.get("PYTHONPATH")] if p])
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, "-c",
+             CHILD.format(scripts=SCRIPTS, code=code, heavy=HEAVY)],
+            env=env, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+            universal_newlines=True, check=True)
+        # Script output comes first, result is the last line
+        fields = result.stdout.splitlines()[-1].split()
+        times.append(float(fields[0]))
+        loaded.update(fields[1:])
+    return statistics.median(times), loaded
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("-n", "--runs",
+                        type=int, default=5,
+                        help="runs of each case (default %(default)s)")
+    parser.add_argument("--max-ms",
+                        type=float, default=None,
+                        help="fail any case taking longer than MS",
+                        metavar="MS")
+    args = parser.parse_args(argv[1:])
+
+    failures = 0
+    for name, code, allowed in CASES:
+        seconds, loaded = run_case(code, args.runs)
+        problems = sorted(loaded - set(allowed))
+        slow = args.max_ms is not None and seconds * 1000 > args.max_ms
+        failures += bool(problems or slow)
+        print("{:<30}{:>8.1f} ms  {}{}".format(
+            name, seconds * 1000,
+            "loaded " + ", ".join(problems) if problems else "",
+            "  TOO SLOW" if slow else ""))
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+"""Show how parsing many files in parallel scales with processes
+
+Usage: parallel_parse.py [number of files] [entries per file] [processes]
+
+processes is the most to try, by default the number of CPUs."""
+
+import os
+import shutil
+import sys
+import tempfile
+import timeit
+
+from pybib import BibTexParser
+
+ENTRY = """@inproceedings{{entry{f}_{n},
+  title = {{A Study of Things, Part {n}}},
+  author = {{Jim Basney and Terry Fleury and Von Welch}},
+  booktitle = {{Symposium on Identity and Trust on the Internet}},
+  year = {year},
+  month = apr,
+  url = {{http://example.com/papers/{n}.pdf}},
+}}
+
+"""
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv
+    files = int(argv[1]) if len(argv) > 1 else 50
+    count = int(argv[2]) if len(argv) > 2 else 2000
+    max_processes = int(argv[3]) if len(argv) > 3 else os.cpu_count()
+
+    directory = tempfile.mkdtemp()
+    try:
+        filenames = []
+        for f in range(files):
+            filename = os.path.join(directory, "{}.bib".format(f))
+            with open(filename, "w") as out:
+                for n in range(count):
+                    out.write(ENTRY.format(f=f, n=n, year=1990 + n % 30))
+            filenames.append(filename)
+        parser = BibTexParser()
+        expected = parser.parse_bib(filenames)
+        serial = None
+        processes = 1
+        while processes <= max_processes:
+            bib = parser.parse_bib(filenames, processes=processes)
+            assert bib == expected, "Parallel parse differs"
+            elapsed = min(timeit.repeat(
+                lambda: parser.parse_bib(filenames, processes=processes),
+                number=1, repeat=3))
+            serial = serial or elapsed
+            print("{:>3} processes: {:.3f}s {:>10.0f} entries/s {:.2f}x".format(
+                processes, elapsed, files * count / elapsed,
+                serial / elapsed))
+            processes *= 2
+    finally:
+        shutil.rmtree(directory)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,19 @@
+## Template rendered by suite.py, using filters as a real page would.
+<%! from pybib import authors_filter, first_name_initial_filter, month_filter %>
+<ul>
+%for entry in entries:
+<li>${entry["title"]}.
+${authors_filter(entry["author"])}.
+${", ".join(first_name_initial_filter(p.name) for p in entry.authors())}.
+%if entry["booktitle"]:
+In ${entry["booktitle"]},
+%else:
+${entry["journal"]},
+%endif
+${month_filter(entry["month"]) or ""} ${entry["year"]}.
+%if entry["url"]:
+<a href="${entry["url"]}">PDF</a>
+%endif
+</li>
+%endfor
+</ul>
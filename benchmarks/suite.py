@@ -0,0 +1,261 @@
+#!/usr/bin/env python
+"""Benchmark parsing, writing, sorting, filters and rendering
+
+Synthetic bibliographies of each size are generated (see generate.py)
+and each stage is run on them. For each stage and size, reports the
+best time of the repeats, throughput in entries per second, latency
+percentiles per item (an entry, or a whole sort or render) and peak
+memory allocated, measured in a separate run under tracemalloc.
+
+Results can be saved with --save and compared with saved results with
+--compare, which reports changes and exits with status 1 if throughput
+or peak memory are worse by more than --tolerance."""
+
+import argparse
+import io
+import json
+import os
+import os.path
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from pybib import Bib
+from pybib import BibParser
+from pybib import BibTexParser
+from pybib import BibTexWriter
+from pybib import BibWriter
+from pybib import Entry
+from pybib import Renderer
+from pybib import authors_filter
+from pybib import month_filter
+from pybib.authors import parse_authors
+from pybib.authors import parse_name
+from pybib.filters import cache_clear
+
+from generate import write_corpus
+
+TEMPLATE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        "publications.mako")
+
+# Each stage takes the corpus and returns an iterator doing the work,
+# yielding after each item. Anything not to be timed is done before
+# returning it, including getting fresh entries, so every repeat starts
+# from the same cold state.
+
+def fresh_entries(corpus):
+    """Return copies of the corpus entries, with caches cleared
+
+    Copies have no cached date keys, nor fields added by looking up
+    missing ones, and are in corpus order however a run left them."""
+    cache_clear()
+    parse_authors.cache_clear()
+    parse_name.cache_clear()
+    return [Entry(entry) for entry in corpus["entries"]]
+
+def parse_bibtex(corpus):
+    return iter(BibTexParser().iter_entries([corpus["bib"]]))
+
+def parse_conf(corpus):
+    return iter(BibParser().iter_entries([corpus["conf"]]))
+
+def write(writer, entries):
+    out = io.StringIO()
+    for entry in entries:
+        writer.write_iter((entry,), out)
+        yield
+
+def write_conf(corpus):
+    return write(BibWriter(), fresh_entries(corpus))
+
+def write_bibtex(corpus):
+    return write(BibTexWriter(), fresh_entries(corpus))
+
+def sort_by_date(corpus):
+    bib = Bib(fresh_entries(corpus))
+    def run():
+        bib.sort_by_date()
+        yield
+    return run()
+
+def filters(corpus):
+    entries = fresh_entries(corpus)
+    def run():
+        for entry in entries:
+            authors_filter(entry["author"])
+            month_filter(entry["month"])
+            yield
+    return run()
+
+def render(corpus):
+    renderer = Renderer()
+    renderer.get_template(TEMPLATE)
+    entries = fresh_entries(corpus)
+    def run():
+        renderer.render(TEMPLATE, io.StringIO(), entries=entries)
+        yield
+    return run()
+
+STAGES = [
+    ("parse_bibtex", parse_bibtex),
+    ("parse_conf", parse_conf),
+    ("write_conf", write_conf),
+    ("write_bibtex", write_bibtex),
+    ("sort_by_date", sort_by_date),
+    ("filters", filters),
+    ("render", render),
+]
+
+def time_stage(stage, corpus):
+    """Run stage, returning (seconds, list of seconds per item)"""
+    latencies = []
+    iterator = stage(corpus)
+    clock = time.perf_counter
+    start = last = clock()
+    for _ in iterator:
+        now = clock()
+        latencies.append(now - last)
+        last = now
+    return last - start, latencies
+
+def peak_memory(stage, corpus):
+    """Return peak bytes allocated while running stage"""
+    tracemalloc.start()
+    try:
+        iterator = stage(corpus)
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        for _ in iterator:
+            pass
+        return tracemalloc.get_traced_memory()[1] - base
+    finally:
+        tracemalloc.stop()
+
+def percentile(values, p):
+    """Return pth percentile of sorted values"""
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+def run_stage(stage, corpus, repeat):
+    """Return dictionary of results of running stage repeat times"""
+    best = None
+    latencies = []
+    for _ in range(repeat):
+        seconds, item_latencies = time_stage(stage, corpus)
+        best = seconds if best is None else min(best, seconds)
+        latencies.extend(item_latencies)
+    latencies.sort()
+    count = len(corpus["entries"])
+    return {
+        "seconds": best,
+        "entries_per_s": count / best if best else 0,
+        "p50_us": percentile(latencies, 50) * 1e6,
+        "p95_us": percentile(latencies, 95) * 1e6,
+        "p99_us": percentile(latencies, 99) * 1e6,
+        "peak_mb": peak_memory(stage, corpus) / 1e6,
+    }
+
+def load_corpus(directory, size, seed):
+    """Return corpus of size entries, generating files if needed"""
+    corpus = {}
+    for fmt in ("bib", "conf"):
+        filename = os.path.join(directory,
+                                "corpus-{}-{}.{}".format(size, seed, fmt))
+        if not os.path.exists(filename):
+            write_corpus(filename, size, fmt, seed)
+        corpus[fmt] = filename
+    corpus["entries"] = BibParser().parse_bib([corpus["conf"]])
+    return corpus
+
+def compare(results, baseline, tolerance):
+    """Print changes from baseline, returning number of regressions"""
+    regressions = 0
+    print("\n{:<14}{:>9}{:>12}{:>12}".format(
+        "stage", "entries", "throughput", "peak mem"))
+    for size, stages in results.items():
+        for name, result in stages.items():
+            base = baseline.get(size, {}).get(name)
+            if base is None:
+                continue
+            speed = result["entries_per_s"] / base["entries_per_s"] - 1
+            memory = (result["peak_mb"] / base["peak_mb"] - 1
+                      if base["peak_mb"] else 0)
+            worse = speed < -tolerance or memory > tolerance
+            regressions += worse
+            print("{:<14}{:>9}{:>+11.1%}{:>+11.1%}{}".format(
+                name, size, speed, memory, "  REGRESSION" if worse else ""))
+    return regressions
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("-s", "--sizes",
+                        default="1000,10000",
+                        help="comma separated numbers of entries " \
+                        "(default %(default)s)")
+    parser.add_argument("-r", "--repeat",
+                        type=int, default=3,
+                        help="times to run each stage (default %(default)s)")
+    parser.add_argument("--stage",
+                        action="append", choices=[s[0] for s in STAGES],
+                        help="only run STAGE, may be given more than once")
+    parser.add_argument("--seed",
+                        type=int, default=0,
+                        help="random seed for corpora (default %(default)s)")
+    parser.add_argument("--corpus-dir",
+                        help="keep generated corpora in DIR to reuse",
+                        metavar="DIR")
+    parser.add_argument("--save",
+                        help="save results to FILE", metavar="FILE")
+    parser.add_argument("--compare",
+                        help="compare results with those saved in FILE",
+                        metavar="FILE")
+    parser.add_argument("--tolerance",
+                        type=float, default=0.1,
+                        help="fraction worse than baseline that is a " \
+                        "regression (default %(default)s)")
+    args = parser.parse_args(argv[1:])
+
+    stages = [s for s in STAGES if not args.stage or s[0] in args.stage]
+    directory = args.corpus_dir or tempfile.mkdtemp()
+    os.makedirs(directory, exist_ok=True)
+    results = {}
+    print("{:<14}{:>9}{:>10}{:>12}{:>11}{:>11}{:>11}{:>10}".format(
+        "stage", "entries", "seconds", "entries/s", "p50 us", "p95 us",
+        "p99 us", "peak MB"))
+    try:
+        for size in [int(s) for s in args.sizes.split(",")]:
+            corpus = load_corpus(directory, size, args.seed)
+            results[str(size)] = {}
+            for name, stage in stages:
+                result = run_stage(stage, corpus, args.repeat)
+                results[str(size)][name] = result
+                print("{:<14}{:>9}{seconds:>10.3f}{entries_per_s:>12.0f}"
+                      "{p50_us:>11.1f}{p95_us:>11.1f}{p99_us:>11.1f}"
+                      "{peak_mb:>10.1f}".format(name, size, **result))
+    finally:
+        if not args.corpus_dir:
+            shutil.rmtree(directory)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "results": results,
+            }, f, indent=2, sort_keys=True)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+        if compare(results, baseline, args.tolerance):
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
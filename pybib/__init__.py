@@ -1,11 +1,53 @@
-from .bib import Bib
-from .entry import Entry
-from .bibparser import BibParser
-from .bibtexparser import BibTexParser
-from .bibwriter import BibWriter
+"""pyBib: bibliography handling
 
-from .filters import authors_filter
-from .filters import first_name_initial_filter
-from .filters import month_filter
+Names are imported from their submodules when first used, so importing
+pybib is quick and, e.g., the HTTP stack used by Figshare and URLChecker
+is only loaded by those that use them."""
 
-from .figshare import Figshare
+import importlib
+
+# Name -> (submodule, name in submodule)
+_EXPORTS = {
+    "Person": ("authors", "Person"),
+    "parse_authors": ("authors", "parse_authors"),
+    "Bib": ("bib", "Bib"),
+    "Entry": ("entry", "Entry"),
+    "CompactEntry": ("entry", "CompactEntry"),
+    "BibParser": ("bibparser", "BibParser"),
+    "ConfParseError": ("bibparser", "ConfParseError"),
+    "BibTexParser": ("bibtexparser", "BibTexParser"),
+    "IncrementalBib": ("incremental", "IncrementalBib"),
+    "BibWriter": ("bibwriter", "BibWriter"),
+    "BibTexWriter": ("bibwriter", "BibTexWriter"),
+    "Columns": ("columns", "Columns"),
+    "Deduplicator": ("dedup", "Deduplicator"),
+
+    "authors_filter": ("filters", "authors_filter"),
+    "first_name_initial_filter": ("filters", "first_name_initial_filter"),
+    "month_filter": ("filters", "month_filter"),
+    "filter_cache_info": ("filters", "cache_info"),
+
+    "Figshare": ("figshare", "Figshare"),
+    "Renderer": ("renderer", "Renderer"),
+    "RenderService": ("server", "RenderService"),
+    "SearchIndex": ("search", "SearchIndex"),
+    "URLCache": ("urlchecker", "URLCache"),
+    "URLChecker": ("urlchecker", "URLChecker"),
+}
+
+__all__ = list(_EXPORTS)
+
+def __getattr__(name):
+    try:
+        module, attribute = _EXPORTS[name]
+    except KeyError:
+        raise AttributeError(
+            "module {!r} has no attribute {!r}".format(__name__, name))
+    value = getattr(importlib.import_module("." + module, __name__),
+                    attribute)
+    # Cache so __getattr__ isn't needed next time
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
@@ -0,0 +1,40 @@
+"""Write files atomically, by writing a temporary file and renaming it"""
+
+import contextlib
+import os
+import os.path
+import random
+import stat
+
+@contextlib.contextmanager
+def atomic_write(filename, mode="w", **kwargs):
+    """Return context manager giving a file to write filename's contents
+
+    The file is a temporary one in the same directory, renamed to
+    filename once written, so an error or interruption leaves filename
+    as it was. Unlike tempfile.mkstemp(), whose files are only readable
+    by their owner, the file gets the mode of any existing filename, or
+    else the umask's default for new files. mode and kwargs are passed
+    to open()."""
+    directory, basename = os.path.split(os.path.abspath(filename))
+    while True:
+        tmp_filename = os.path.join(directory, ".{}.{:08x}.tmp".format(
+            basename, random.getrandbits(32)))
+        try:
+            # 0o666 as open() uses, the umask is applied to it
+            fd = os.open(tmp_filename,
+                         os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+            break
+        except FileExistsError:
+            continue
+    try:
+        with os.fdopen(fd, mode, **kwargs) as f:
+            yield f
+        try:
+            os.chmod(tmp_filename, stat.S_IMODE(os.stat(filename).st_mode))
+        except FileNotFoundError:
+            pass
+        os.replace(tmp_filename, filename)
+    except BaseException:
+        os.remove(tmp_filename)
+        raise
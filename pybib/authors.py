@@ -0,0 +1,141 @@
+"""Person class and parsing of author lists
+
+Author lists are parsed once per distinct string and each distinct name
+becomes a single, shared Person instance, so templates, sorting and
+indexes can all use them without splitting the strings again."""
+
+import functools
+import re
+import sys
+
+# Authors are separated by "and" and, outside BibTeX, commas
+AND_RE = re.compile(r"\s+and\s+")
+
+# Name suffixes, lower case
+SUFFIXES = {"jr", "jr.", "sr", "sr.", "ii", "iii", "iv"}
+ET_AL = "et al."
+
+# Maximum number of author lists and names cached
+AUTHORS_CACHE_SIZE = 16384
+
+class Person(object):
+    """A person's name: given names, family name and any suffix
+
+    e.g. "Ludwig van Beethoven" has given "Ludwig" and family "van
+    Beethoven". Instances are interned, use Person.get() to create one."""
+
+    __slots__ = ("given", "family", "suffix", "name", "initials")
+
+    # (given, family, suffix) -> Person
+    _interned = {}
+
+    def __init__(self, given, family, suffix=""):
+        self.given = given
+        self.family = family
+        self.suffix = suffix
+        # Name in "First Last" order
+        self.name = " ".join(p for p in (given, family, suffix) if p)
+        # e.g. "J. P." for "John Paul"
+        self.initials = " ".join(g[0].upper() + "." for g in given.split())
+
+    @classmethod
+    def get(cls, given, family, suffix=""):
+        """Return the Person with the given names"""
+        key = (given, family, suffix)
+        person = cls._interned.get(key)
+        if person is None:
+            person = cls._interned[key] = cls(*(sys.intern(s) for s in key))
+        return person
+
+    def initial_name(self):
+        """Return name with first given name as an initial
+
+        e.g. "J. Paul Smith" for "John Paul Smith"."""
+        given = self.given.split()
+        if given:
+            given[0] = given[0][0].upper() + "."
+        return " ".join(given + [p for p in (self.family, self.suffix) if p])
+
+    def sort_key(self):
+        """Return key sorting people by family then given names"""
+        return (self.family.casefold(), self.given.casefold())
+
+    def __str__(self):
+        return self.name
+
+    def __repr__(self):
+        return "Person({!r}, {!r}, {!r})".format(
+            self.given, self.family, self.suffix)
+
+    def __reduce__(self):
+        # Unpickle as the interned instance
+        return (self.__class__.get, (self.given, self.family, self.suffix))
+
+def is_suffix(s):
+    """Is s a name suffix, such as "Jr."?"""
+    return s.lower() in SUFFIXES or s == ET_AL
+
+def split_first_last(name):
+    """Return (given, family) from name in "First von Last" order
+
+    The family name is the last word, along with any lower case words,
+    such as "van" or "de", before it."""
+    words = name.split()
+    if len(words) <= 1:
+        return "", name
+    start = len(words) - 1
+    while start > 1 and words[start - 1][:1].islower():
+        start -= 1
+    return " ".join(words[:start]), " ".join(words[start:])
+
+@functools.lru_cache(maxsize=AUTHORS_CACHE_SIZE)
+def parse_name(name):
+    """Return Person from name in "First Last", "Last, First" or "Last,
+    Jr., First" form"""
+    pieces = [p.strip() for p in name.split(",")]
+    suffix = ""
+    if len(pieces) == 3:
+        family, suffix, given = pieces
+    elif len(pieces) == 2 and is_suffix(pieces[1]):
+        (given, family), suffix = split_first_last(pieces[0]), pieces[1]
+    elif len(pieces) == 2:
+        family, given = pieces
+    else:
+        if name.endswith(" " + ET_AL):
+            name, suffix = name[:-len(ET_AL)].strip(), ET_AL
+        given, family = split_first_last(name.strip())
+    return Person.get(given, family, suffix)
+
+def is_last_first(pieces):
+    """Are the comma separated pieces of a name "Last, First" form?
+
+    Otherwise they are a list of names. Only a single word, perhaps
+    after lower case words like "van", can be a family name before a
+    comma."""
+    if len(pieces) == 2 and is_suffix(pieces[1]):
+        return True
+    if len(pieces) == 3 and is_suffix(pieces[1]):
+        return True
+    if len(pieces) != 2 or not pieces[1]:
+        return False
+    words = pieces[0].split()
+    return len(words) >= 1 and all(w[:1].islower() for w in words[:-1])
+
+@functools.lru_cache(maxsize=AUTHORS_CACHE_SIZE)
+def parse_authors(s):
+    """Return tuple of Persons from list of authors
+
+    Authors may be separated by "and", as in BibTeX, or commas, e.g.
+    "Jim Basney, Terry Fleury and Von Welch". Names may be in "Last,
+    First" form, which is told apart from a list of two names by having
+    a single word before the comma, e.g. "Welch, Von and Basney, Jim"."""
+    if not s:
+        return ()
+    people = []
+    for part in AND_RE.split(s.strip()):
+        pieces = [p.strip() for p in part.split(",")]
+        if is_last_first(pieces):
+            people.append(parse_name(part))
+        else:
+            people.extend(parse_name(p) for p in pieces if p)
+    return tuple(people)
@@ -1,17 +1,185 @@
 """Bib class: represents a bibliography"""
 
+def field_sort_key(field):
+    """Return function giving the sort key for field of an entry
+
+    "date" is publication date and "author" sorts by family then given
+    names of each author. Missing fields sort as empty strings."""
+    if field == "date":
+        return lambda e: e.date_key()
+    if field == "author":
+        return lambda e: tuple(p.sort_key() for p in e.authors())
+    return lambda e: e.get(field) or ""
+
+def index_values(entry, field):
+    """Return values entry is indexed under for field
+
+    Authors are indexed individually, by name in "First Last" order."""
+    if field == "author":
+        return [person.name for person in entry.authors()]
+    value = entry.get(field)
+    if value is None:
+        return ()
+    return (value,)
+
+def entry_matches(entry, criteria):
+    """Does entry have the field values in criteria, as Bib.where()?"""
+    for field, value in criteria.items():
+        if value not in index_values(entry, field):
+            return False
+    return True
+
 class Bib(list):
-    """Class representing a bliography"""
+    """Class representing a bliography
+
+    Entries can be looked up by key with get() and filtered by field
+    values with where(). Both use indexes, mapping field values to
+    entries, which are built the first time a field is queried. Appending
+    or extending updates any built indexes, while other changes to the
+    list discard them to be rebuilt when next needed. Changes to the
+    entries themselves are not tracked, call reindex() after any."""
 
     def __init__(self, entries=None):
         """Initialize Bib instance
 
         If entries is not None, it must be Bib instance or list of entries."""
+        # Field name -> {value -> [entries]}
+        self._indexes = {}
         if entries is not None:
             self.extend(entries)
 
+    def __reduce__(self):
+        # Unpickling a list subclass extends it without calling
+        # __init__, so pickle just the entries and rebuild indexes when
+        # next needed.
+        return (self.__class__, (list(self),))
+
+    def field_index(self, field):
+        """Return index mapping values of field to entries
+
+        The index is built if needed and should not be modified."""
+        index = self._indexes.get(field)
+        if index is None:
+            index = {}
+            for entry in self:
+                for value in index_values(entry, field):
+                    index.setdefault(value, []).append(entry)
+            self._indexes[field] = index
+        return index
+
+    def reindex(self):
+        """Discard all indexes, to be rebuilt when next needed"""
+        self._indexes = {}
+
+    def get(self, key, default=None):
+        """Return first entry with the given key, default if none"""
+        entries = self.field_index("key").get(key)
+        return entries[0] if entries else default
+
+    def distinct(self, field):
+        """Return values of field in order of first appearance
+
+        Each author is a separate value for "author"."""
+        return list(self.field_index(field))
+
+    def where(self, **criteria):
+        """Return a Bib of entries whose fields have the given values
+
+        e.g. bib.where(project="TeraGrid", year="2010"). A value matches
+        "author" if it is one of the entry's authors. The returned Bib
+        shares entries with this one and keeps their order."""
+        if not criteria:
+            return Bib(self)
+        # Start with the field with the fewest matches and filter by the rest
+        criteria = sorted(criteria.items(), key=lambda c: len(
+            self.field_index(c[0]).get(c[1], ())))
+        field, value = criteria[0]
+        entries = self.field_index(field).get(value, [])
+        rest = dict(criteria[1:])
+        return Bib(e for e in entries if entry_matches(e, rest))
+
+    def append(self, entry):
+        super(Bib, self).append(entry)
+        for field, index in self._indexes.items():
+            for value in index_values(entry, field):
+                index.setdefault(value, []).append(entry)
+
+    def extend(self, entries):
+        if not self._indexes:
+            super(Bib, self).extend(entries)
+        else:
+            for entry in entries:
+                self.append(entry)
+
+    def __iadd__(self, entries):
+        self.extend(entries)
+        return self
+
+    # Anything else changing the list discards indexes, as it may change
+    # the order of or remove entries.
+
+    def insert(self, i, entry):
+        self.reindex()
+        super(Bib, self).insert(i, entry)
+
+    def remove(self, entry):
+        self.reindex()
+        super(Bib, self).remove(entry)
+
+    def pop(self, *args):
+        self.reindex()
+        return super(Bib, self).pop(*args)
+
+    def clear(self):
+        self.reindex()
+        super(Bib, self).clear()
+
+    def reverse(self):
+        self.reindex()
+        super(Bib, self).reverse()
+
+    def sort(self, *args, **kwargs):
+        self.reindex()
+        super(Bib, self).sort(*args, **kwargs)
+
+    def __setitem__(self, i, value):
+        self.reindex()
+        super(Bib, self).__setitem__(i, value)
+
+    def __delitem__(self, i):
+        self.reindex()
+        super(Bib, self).__delitem__(i)
+
+    def normalize(self, field, filter_func):
+        """Replace field of every entry having it with filter_func(value)
+
+        e.g. bib.normalize("month", month_filter). Each distinct value is
+        filtered only once."""
+        results = {}
+        for entry in self:
+            value = entry.get(field)
+            if value is None:
+                continue
+            result = results.get(value)
+            if result is None:
+                result = results[value] = filter_func(value)
+            entry[field] = result
+        self._indexes.pop(field, None)
+
+    def sort_by(self, *fields, reverse=False):
+        """Sort entries in place by the given fields
+
+        Later fields break ties in earlier ones. "date" may be given to
+        sort by publication date, e.g. sort_by("project", "date")."""
+        keys = [field_sort_key(field) for field in fields]
+        if len(keys) == 1:
+            key = keys[0]
+        else:
+            key = lambda e: tuple(k(e) for k in keys)
+        self.sort(key=key, reverse=reverse)
+
     def sort_by_date(self, reverse=True):
         """Sort entries by date in place
 
         If reverse == True, then will be newest to older."""
-        self.sort(key = lambda e: e.datetime(), reverse=reverse)
+        self.sort_by("date", reverse=reverse)
@@ -1,30 +1,309 @@
 """BibParser: Parse a bibliography from a conf file"""
 
-from configparser import SafeConfigParser
+import io
+import re
 
 from .bib import Bib
 from .entry import Entry
+from .parallel import decode
+from .parallel import parse_parallel
+from .snapshot import iter_snapshot
+
+# Same syntax as ConfigParser
+SECTION_RE = re.compile(r"\[(.+)\]")
+OPTION_RE = re.compile(r"(.*?)\s*[=:]\s*(.*)$")
+INTERPOLATION_RE = re.compile(r"%(?:(%)|\(([^)]+)\)s)")
+MAX_INTERPOLATION_DEPTH = 10
+
+DEFAULT_SECTION = "DEFAULT"
+
+# For parse_parallel(): a line that is a section header
+BOUNDARY_RE = re.compile(rb"\n(?=\[[^\n]+\])")
+DEFAULT_SECTION_RE = re.compile(rb"^\s*\[DEFAULT\]", re.MULTILINE)
+
+class ConfParseError(Exception):
+    """Error parsing a conf file"""
+
+    def __init__(self, filename, lineno, message):
+        self.filename = filename
+        self.lineno = lineno
+        self.message = message
+        super(ConfParseError, self).__init__(
+            "{}:{}: {}".format(filename, lineno, message))
+
+    def __reduce__(self):
+        # So errors can be passed back from parse_parallel() workers
+        return (self.__class__, (self.filename, self.lineno, self.message))
+
+class ConfReader(object):
+    """Read entries from a pyBib conf file object
+
+    Understands the same syntax as ConfigParser(strict=False): sections,
+    "name = value" or "name: value" options, indented continuation lines,
+    "#" and ";" comments, a DEFAULT section and %(name)s interpolation.
+    Iterating over an instance yields an Entry for each section as soon
+    as it has been read. Unlike ConfigParser, duplicate sections are
+    yielded separately rather than merged.
+
+    defaults may be a dictionary of DEFAULT values to share between
+    instances. On its own, a reader can only apply DEFAULT values to the
+    sections following them. If skip_defaults is True, DEFAULT sections
+    are skipped instead, defaults already holding their values: BibParser
+    reads them from all files first, so that, as with ConfigParser, they
+    apply to every section. entry_class is the class of entries to
+    create, e.g. CompactEntry."""
+
+    def __init__(self, fileobject, filename="<conf>", defaults=None,
+                 entry_class=Entry, lineno=1, skip_defaults=False):
+        self.fileobject = fileobject
+        self.filename = filename
+        self.defaults = defaults if defaults is not None else {}
+        self.entry_class = entry_class
+        # Line number of first line, for errors
+        self.lineno = lineno
+        self.skip_defaults = skip_defaults
+
+    def __iter__(self):
+        section = None
+        fields = None
+        in_default = False
+        # Line numbers of options in current section, for errors
+        linenos = {}
+        optname = None
+        indent = 0
+        blank_lines = 0
+        for lineno, line in enumerate(self.fileobject, self.lineno):
+            value = line.strip()
+            if not value:
+                if optname is not None:
+                    blank_lines += 1
+                continue
+            if value[0] in "#;":
+                continue
+            cur_indent = len(line) - len(line.lstrip())
+            if optname is not None and cur_indent > indent:
+                # Continuation line
+                fields[optname] += "\n" * (blank_lines + 1) + value
+                blank_lines = 0
+                continue
+            indent = cur_indent
+            blank_lines = 0
+            match = SECTION_RE.match(value)
+            if match:
+                if section is not None and not in_default:
+                    yield self._make_entry(section, fields, linenos)
+                section = match.group(1)
+                in_default = section == DEFAULT_SECTION
+                if not in_default:
+                    fields = self.entry_class()
+                elif self.skip_defaults:
+                    # Read, to check the syntax, but thrown away
+                    fields = {}
+                else:
+                    fields = self.defaults
+                linenos = {}
+                optname = None
+                continue
+            if fields is None:
+                raise ConfParseError(self.filename, lineno,
+                                     "No section header before " + repr(value))
+            match = OPTION_RE.match(value)
+            if match is None or not match.group(1):
+                raise ConfParseError(self.filename, lineno,
+                                     "Could not parse " + repr(value))
+            optname = match.group(1).lower()
+            fields[optname] = match.group(2)
+            linenos[optname] = lineno
+        if section is not None and not in_default:
+            yield self._make_entry(section, fields, linenos)
+
+    def _make_entry(self, section, entry, linenos):
+        """Finish entry read from section and return it"""
+        for name, value in self.defaults.items():
+            entry.setdefault(name, value)
+        # Expand references from the raw values, as ConfigParser does,
+        # not from values already expanded
+        raw = dict(entry.items())
+        for name, value in raw.items():
+            if "%" in value:
+                entry[name] = self._interpolate(
+                    value, raw, linenos.get(name, 0))
+        entry["key"] = section
+        entry.setdefault("month", None)
+        entry.setdefault("howpublished", None)
+        return entry
+
+    def _interpolate(self, value, fields, lineno, depth=1):
+        """Expand %(name)s references and %% escapes in value"""
+        if "%" not in value:
+            return value
+        if depth > MAX_INTERPOLATION_DEPTH:
+            raise ConfParseError(self.filename, lineno,
+                                 "Interpolation too deep in " + repr(value))
+        if "%" in INTERPOLATION_RE.sub("", value):
+            raise ConfParseError(self.filename, lineno,
+                                 "'%' must be followed by '%' or '(' in "
+                                 + repr(value))
+        def expand(match):
+            if match.group(1):
+                return "%"
+            reference = fields.get(match.group(2).lower())
+            if reference is None:
+                raise ConfParseError(self.filename, lineno,
+                                     "Bad interpolation reference in "
+                                     + repr(value))
+            return self._interpolate(reference, fields, lineno, depth + 1)
+        return INTERPOLATION_RE.sub(expand, value)
+
+def default_lines(fileobject):
+    """Yield lines of fileobject in DEFAULT sections, blanking the rest
+
+    Blank lines keep line numbers the same for errors."""
+    in_default = False
+    for line in fileobject:
+        if line[:1] == "[":
+            match = SECTION_RE.match(line.strip())
+            if match:
+                in_default = match.group(1) == DEFAULT_SECTION
+        yield line if in_default else "\n"
 
 class BibParser(object):
 
-    def __init__(self):
-        """Initialize ConfigParser instance"""
-        pass
+    # For parse_parallel()
+    BOUNDARY_RE = BOUNDARY_RE
+
+    def __init__(self, entry_class=Entry, snapshots=False):
+        """Initialize BibParser instance
+
+        entry_class is the class of entries to create, e.g. CompactEntry
+        to save memory with large bibliographies. If snapshots is True,
+        parsed entries are cached in snapshots (see pybib.snapshot),
+        which are used instead of parsing while files are unchanged."""
+        self.entry_class = entry_class
+        self.snapshots = snapshots
 
-    def parse_bib(self, filenames, append_to=None):
+    def iter_entries(self, filenames, processes=1):
+        """Generate entries from files as they are read.
+
+        As with ConfigParser, DEFAULT values apply to every section, so
+        files are first read for them. Unlike parse_bib(), entries with
+        the same key are not merged. Files that cannot be opened are
+        skipped, as ConfigParser does. If processes is more than one,
+        files are parsed in parallel by that many processes (see
+        pybib.parallel) and entries are only generated once all are
+        parsed."""
+        return self._entries(filenames, processes)
+
+    def _entries(self, filenames, processes=1, defaults=None):
+        """Generate entries from a snapshot or by parsing files
+
+        defaults are the DEFAULT values of all files, if already read."""
+        if self.snapshots:
+            return iter_snapshot(
+                filenames, "BibParser", self.entry_class,
+                lambda f: self._iter_entries(f, processes, defaults))
+        return self._iter_entries(filenames, processes, defaults)
+
+    def _iter_entries(self, filenames, processes=1, defaults=None):
+        """Generate entries by parsing files"""
+        if defaults is None:
+            defaults = self.initial_context(filenames)
+        if processes > 1:
+            yield from parse_parallel(self, filenames, processes,
+                                      skip_unreadable=True,
+                                      context=defaults)
+            return
+        for filename in filenames:
+            yield from self.iter_file(filename, defaults)
+
+    def iter_file(self, filename, defaults):
+        """Generate entries from filename, with the DEFAULT values of all
+        files being parsed
+
+        Nothing is generated if filename cannot be opened."""
+        try:
+            f = open(filename)
+        except OSError:
+            return
+        with f:
+            yield from ConfReader(f, filename, defaults, self.entry_class,
+                                  skip_defaults=True)
+
+    def parse_bib(self, filenames, append_to=None, processes=1):
         """Parse files and create Bib instance.
 
         If append_to is not None, it should be an existing Bib instance
-        that will be appended to."""
+        that will be appended to. If processes is more than one, files
+        are parsed in parallel by that many processes."""
         bib = append_to if append_to else Bib()
-        # Strict=False is pre-3.2 behavior and allows for duplicate keys
-        config = SafeConfigParser(strict=False)
-        config.read(filenames)
-        sections = config.sections()
-        for section in sections:
-            entry = Entry(config.items(section))
-            entry["key"] = section
-            entry.setdefault("month", None)
-            entry.setdefault("howpublished", None)
-            bib.append(entry)
+        defaults = self.initial_context(filenames)
+        self.add_entries(bib, self._entries(filenames, processes, defaults),
+                         defaults)
         return bib
+
+    def add_entries(self, bib, entries, defaults=None):
+        """Append entries to bib, merging those with the same key.
+
+        Entries with the same key are merged, with later values winning,
+        as ConfigParser does for duplicate sections. The merged entry is
+        a copy, so entries themselves are not changed.
+
+        defaults are the DEFAULT values the entries were parsed with. As
+        with ConfigParser, a value a later entry only has from DEFAULT
+        doesn't replace an earlier entry's own value. A value equal to
+        the DEFAULT value is taken to be from DEFAULT."""
+        defaults = defaults or {}
+        merged = {}
+        positions = {}
+        for entry in entries:
+            key = entry.key
+            existing = merged.get(key)
+            if existing is None:
+                merged[key] = entry
+                positions[key] = len(bib)
+                bib.append(entry)
+                continue
+            if positions[key] is not None:
+                existing = merged[key] = self.entry_class(existing)
+                bib[positions[key]] = existing
+                positions[key] = None
+            for name, value in entry.items():
+                if value is None:
+                    continue
+                if name in existing and name in defaults and \
+                   value == defaults[name]:
+                    continue
+                existing[name] = value
+
+    # Hooks for parse_parallel() and IncrementalBib, where the context is
+    # the DEFAULT values of all files
+
+    def initial_context(self, filenames):
+        """Return DEFAULT values of filenames
+
+        Later values win, as with ConfigParser. Files that cannot be
+        opened are skipped."""
+        defaults = {}
+        for filename in filenames:
+            try:
+                with open(filename, "rb") as f:
+                    data = f.read()
+            except OSError:
+                continue
+            if DEFAULT_SECTION_RE.search(data):
+                self.scan_context(decode(data), defaults, filename, 1)
+        return defaults
+
+    def needs_scan(self, data):
+        # initial_context() has already read all DEFAULT values
+        return False
+
+    def scan_context(self, text, defaults, filename, lineno):
+        for _ in ConfReader(default_lines(io.StringIO(text)), filename,
+                            defaults, self.entry_class, lineno):
+            pass
+
+    def parse_chunk(self, text, filename, lineno, defaults):
+        reader = ConfReader(io.StringIO(text), filename, defaults,
+                            self.entry_class, lineno, skip_defaults=True)
+        return list(reader), True
@@ -1,67 +1,303 @@
 """BibTexParser: Parse a BibTex file"""
 
+import io
 import re
 
 from .bib import Bib
 from .entry import Entry
+from .parallel import parse_parallel
+from .snapshot import iter_snapshot
 
-EMPTY_STRING_RE = re.compile("^\s*$")
-ENTRY_START_RE = re.compile("@\w+[{(](\S+),")
-ENTRY_LINE_RE = re.compile("^(\w+)\s*=\s*(.*?),?\s*$")
-ENTRY_END_RE = re.compile("^[})]$")
+# Amount of input read at a time by BibTexTokenizer
+CHUNK_SIZE = 64 * 1024
 
-def remove_quotes(s):
-    """Remove quote or curley brackets around string"""
-    return s.strip("\"{}\"")
+# Start of a record: "@type{" or "@type("
+RECORD_START_RE = re.compile(r"@\s*(\w+)\s*([{(])")
+# Entry key, up to and including following comma
+KEY_RE = re.compile(r"\s*([^,\s]*)\s*,?")
+# Field name, up to and including the equals sign
+FIELD_RE = re.compile(r"\s*([^\s=,{}\"#]+)\s*=\s*")
+# Bare value: a number or a macro name
+BARE_RE = re.compile(r"[^\s,#{}\"]+")
+# Whitespace and optional comma following a value
+SEPARATOR_RE = re.compile(r"\s*,?")
+WHITESPACE_RE = re.compile(r"\s*")
 
-def remove_curly_brackets(s):
-    """Remove curly brackets around characters in string"""
-    return re.sub("\{(?P<char>\S+?)\}", "\g<char>", s)
+# For parse_parallel(): a line starting with what may be a record
+BOUNDARY_RE = re.compile(rb"\n(?=@)")
+STRING_RECORD_RE = re.compile(rb"@\s*string", re.IGNORECASE)
 
-def unescape_chars(s):
-    """Unescape any characters"""
-    return re.sub("\\\\&", "&", s) # "\\\\" matches single "\"
+# Regexes for finding the delimiter closing a record or value, indexed
+# by that delimiter. Escaped curly brackets, "\{" and "\}", are matched
+# so they can be skipped, and "\\" so "\\{" isn't taken as one.
+CLOSE_RES = {
+    "}": re.compile(r"\\[\\{}]|[{}]"),
+    ")": re.compile(r"\\[\\{}]|[{})\"]"),
+    "\"": re.compile(r"\\[\\{}]|[{}\"]"),
+}
 
-def escape_chars(s):
-    """Escape any characters that need to be"""
-    return re.sub("%", "%%", s)
+# Everything clean_value() has to change, handled in a single pass
+CLEAN_RE = re.compile(r"\s{2,}|[\t\r\n]|\\[\\&%{}]|[{}]")
+CLEAN_SUBS = {
+    "\\\\": "\\",
+    "\\&": "&",
+    "\\%": "%",
+    "\\{": "{",
+    "\\}": "}",
+    "{": "",
+    "}": "",
+}
+
+# Macros predefined by BibTeX
+MONTH_MACROS = {
+    "jan": "January",
+    "feb": "February",
+    "mar": "March",
+    "apr": "April",
+    "may": "May",
+    "jun": "June",
+    "jul": "July",
+    "aug": "August",
+    "sep": "September",
+    "oct": "October",
+    "nov": "November",
+    "dec": "December",
+}
+
+def clean_value(s):
+    """Normalize a raw field value.
+
+    Collapses whitespace, removes curly brackets and unescapes
+    characters, including escaped curly brackets, all in one pass.
+    BibTexWriter escapes them again."""
+    return CLEAN_RE.sub(lambda m: CLEAN_SUBS.get(m.group(), " "), s).strip()
+
+def find_close(s, pos, close, state=(0, False)):
+    """Find the delimiter close, ignoring any inside curly brackets.
+
+    A ")" closing a record is also ignored inside a quoted value.
+    Escaped curly brackets are not counted.
+    Scanning starts at pos in the given state, (curly bracket depth,
+    whether inside quotes). Returns (index, state), where index is -1 if
+    close was not found, in which case state may be passed back in to
+    resume scanning more input."""
+    depth, quoted = state
+    for match in CLOSE_RES[close].finditer(s, pos):
+        c = match.group()
+        if c == close and depth == 0 and not quoted:
+            return match.start(), (depth, quoted)
+        if c[0] == "\\":
+            continue
+        if c == "{":
+            depth += 1
+        elif c == "}":
+            depth -= 1
+        elif c == "\"" and depth == 0:
+            quoted = not quoted
+    return -1, (depth, quoted)
+
+class BibTexTokenizer(object):
+    """Incrementally read entries from a BibTex file object
+
+    Input is read CHUNK_SIZE characters at a time and only the record
+    currently being parsed is kept in memory. Iterating over an instance
+    yields an Entry for each entry in the input. @string macros are
+    expanded and stored in macros, which may be shared between instances
+    so macros carry over from one file to the next. entry_class is the
+    class of entries to create, e.g. CompactEntry. truncated is set if
+    the input ends part way through a record."""
+
+    def __init__(self, fileobject, macros=None, chunk_size=CHUNK_SIZE,
+                 entry_class=Entry):
+        self.fileobject = fileobject
+        self.macros = macros if macros is not None else dict(MONTH_MACROS)
+        self.chunk_size = chunk_size
+        self.entry_class = entry_class
+        self.truncated = False
+
+    def __iter__(self):
+        for record_type, body in self.records():
+            if record_type == "string":
+                for name, value in self.parse_fields(body, 0):
+                    self.macros[name] = value
+            elif record_type in ("comment", "preamble"):
+                continue
+            else:
+                yield self.parse_entry(body)
+
+    def records(self):
+        """Yield (type, body) for each @type{body} record in input
+
+        Any text outside of records is ignored, as BibTex does."""
+        buf = ""
+        pos = 0
+        while True:
+            start = RECORD_START_RE.search(buf, pos)
+            if start is None:
+                # Keep any partial record start for next time around
+                at = buf.rfind("@", pos)
+                buf = buf[at:] if at >= 0 else ""
+                pos = 0
+                chunk = self.fileobject.read(self.chunk_size)
+                if not chunk:
+                    return
+                buf += chunk
+                continue
+            record_type = start.group(1).lower()
+            close = "}" if start.group(2) == "{" else ")"
+            begin = start.end()
+            end, state = find_close(buf, begin, close)
+            while end < 0:
+                # Record continues past end of buffer. Discard everything
+                # before its body and read more.
+                buf = buf[begin:]
+                begin = 0
+                # A backslash at the end may escape what is read next
+                backslashes = len(buf) - len(buf.rstrip("\\"))
+                scan = len(buf) - backslashes % 2
+                chunk = self.fileobject.read(self.chunk_size)
+                if not chunk:
+                    # Unterminated record, take what we have.
+                    self.truncated = True
+                    end = len(buf)
+                    break
+                buf += chunk
+                end, state = find_close(buf, scan, close, state)
+            yield record_type, buf[begin:end]
+            pos = end + 1
+
+    def parse_entry(self, body):
+        """Return Entry parsed from body of an entry record"""
+        entry = self.entry_class()
+        match = KEY_RE.match(body)
+        entry["key"] = match.group(1)
+        for name, value in self.parse_fields(body, match.end()):
+            value = clean_value(value)
+            if value:
+                entry[name] = value
+        return entry
+
+    def parse_fields(self, body, pos):
+        """Yield (name, raw value) for each field in body starting at pos
+
+        Parsing stops at the first thing that doesn't look like a field."""
+        while True:
+            match = FIELD_RE.match(body, pos)
+            if match is None:
+                return
+            name = match.group(1).lower()
+            value, pos = self.parse_value(body, match.end())
+            if value is None:
+                return
+            yield name, value
+            pos = SEPARATOR_RE.match(body, pos).end()
+
+    def parse_value(self, body, pos):
+        """Parse value, which may be a concatenation, starting at pos.
+
+        Returns (value, position after value). value is None if one
+        could not be parsed."""
+        parts = []
+        while True:
+            c = body[pos:pos+1]
+            if c == "{" or c == "\"":
+                end, _ = find_close(body, pos + 1, "}" if c == "{" else c)
+                if end < 0:
+                    end = len(body)
+                parts.append(body[pos+1:end])
+                pos = end + 1
+            else:
+                match = BARE_RE.match(body, pos)
+                if match is None:
+                    return None, pos
+                word = match.group()
+                # Unknown macros are kept as-is
+                parts.append(self.macros.get(word.lower(), word))
+                pos = match.end()
+            pos = WHITESPACE_RE.match(body, pos).end()
+            if body[pos:pos+1] != "#":
+                return "".join(parts), pos
+            pos = WHITESPACE_RE.match(body, pos + 1).end()
 
 class BibTexParser(object):
 
-    def parse_bib(self, filenames, append_to=None):
+    # For parse_parallel()
+    BOUNDARY_RE = BOUNDARY_RE
+
+    def __init__(self, entry_class=Entry, snapshots=False):
+        """Initialize BibTexParser instance
+
+        entry_class is the class of entries to create, e.g. CompactEntry
+        to save memory with large bibliographies. If snapshots is True,
+        parsed entries are cached in snapshots (see pybib.snapshot),
+        which are used instead of parsing while files are unchanged."""
+        self.entry_class = entry_class
+        self.snapshots = snapshots
+
+    def iter_entries(self, filenames, processes=1):
+        """Generate entries from bibtexfiles as they are parsed.
+
+        Files are read incrementally, so memory use does not grow with
+        the size of the input, unless snapshots are enabled and one has
+        to be made. If processes is more than one, files are parsed in
+        parallel by that many processes (see pybib.parallel) and entries
+        are only generated once all are parsed."""
+        if self.snapshots:
+            return iter_snapshot(filenames, "BibTexParser", self.entry_class,
+                                 lambda f: self._iter_entries(f, processes))
+        return self._iter_entries(filenames, processes)
+
+    def _iter_entries(self, filenames, processes=1):
+        """Generate entries by parsing bibtexfiles"""
+        if processes > 1:
+            yield from parse_parallel(self, filenames, processes)
+            return
+        # Macros defined in one file are visible in those following
+        macros = self.initial_context(filenames)
+        for file in filenames:
+            yield from self.iter_file(file, macros)
+
+    def iter_file(self, filename, macros):
+        """Generate entries from filename, expanding macros
+
+        Macros filename defines are added to macros."""
+        with open(filename) as f:
+            yield from BibTexTokenizer(f, macros,
+                                       entry_class=self.entry_class)
+
+    def parse_bib(self, filenames, append_to=None, processes=1):
         """Parse bibtexfiles and create Bib instance.
 
         If append_to is not None, it should be an existing Bib instance
-        that will be appended to."""
+        that will be appended to. If processes is more than one, files
+        are parsed in parallel by that many processes."""
         bib = append_to if append_to else Bib()
-        entry = None
-        for file in filenames:
-            with open(file) as f:
-                for line in f.readlines():
-                    match = EMPTY_STRING_RE.match(line)
-                    if match:
-                        continue
-                    match = ENTRY_START_RE.match(line)
-                    if match:
-                        entry = Entry()
-                        bib.append(entry)
-                        entry["key"] = match.group(1)
-                        continue
-                    match = ENTRY_LINE_RE.match(line)
-                    if match:
-                        var = match.group(1)
-                        value = match.group(2)
-                        value = remove_curly_brackets(value)
-                        value = remove_quotes(value)
-                        value = unescape_chars(value)
-                        value = escape_chars(value)
-                        if EMPTY_STRING_RE.match(value):
-                            continue
-                        entry[var] = value
-                        continue
-                    match = ENTRY_END_RE.match(line)
-                    if match:
-                        entry = None
-                        continue
-                    # unrecognized line
+        self.add_entries(bib, self.iter_entries(filenames, processes))
         return bib
+
+    def add_entries(self, bib, entries, macros=None):
+        """Append entries to bib
+
+        macros, those entries were parsed with, are not needed."""
+        bib.extend(entries)
+
+    # Hooks for parse_parallel() and IncrementalBib, where the context is
+    # the macros
+
+    def initial_context(self, filenames):
+        return dict(MONTH_MACROS)
+
+    def needs_scan(self, data):
+        return STRING_RECORD_RE.search(data) is not None
+
+    def scan_context(self, text, macros, filename, lineno):
+        tokenizer = BibTexTokenizer(io.StringIO(text), macros)
+        for record_type, body in tokenizer.records():
+            if record_type == "string":
+                for name, value in tokenizer.parse_fields(body, 0):
+                    macros[name] = value
+
+    def parse_chunk(self, text, filename, lineno, macros):
+        tokenizer = BibTexTokenizer(io.StringIO(text), macros,
+                                    entry_class=self.entry_class)
+        return list(tokenizer), not tokenizer.truncated
@@ -1,18 +1,79 @@
 """BibWriter.py: Write out a Bibliography"""
 
-from configparser import RawConfigParser
+import re
+
+# Characters escaped in BibTeX values, the reverse of BibTexParser.
+# Curly brackets in pyBib values are text, not BibTeX grouping, and
+# escaping them means one without a partner can't end the value. A
+# backslash is escaped where it would otherwise escape what follows.
+BIBTEX_ESCAPE_RE = re.compile(r"\\(?=[\\{}]|\Z)|[&%{}]")
+BIBTEX_ESCAPES = {
+    "\\": "\\\\",
+    "&": "\\&",
+    "%": "\\%",
+    "{": "\\{",
+    "}": "\\}",
+}
+
+def escape_bibtex(value):
+    """Return value escaped for writing as a BibTeX value"""
+    return BIBTEX_ESCAPE_RE.sub(lambda m: BIBTEX_ESCAPES[m.group()], value)
 
 class BibWriter(object):
-    """Write a Bib object out to a file object"""
+    """Write a Bib object out to a file object as a pyBib conf file"""
 
     def write(self, bib, fileobject):
         """Write the given Bib instance to the given fileobject"""
         if bib is None:
             return
-        parser = RawConfigParser()
-        for entry in bib:
-            key = entry.key
-            parser.add_section(key)
-            for item,value in list(entry.items()):
-                parser.set(key, item, value)
-        parser.write(fileobject)
+        self.write_iter(bib, fileobject)
+
+    def write_iter(self, entries, fileobject):
+        """Write entries to the given fileobject as they are generated
+
+        entries may be any iterable, such as the generator returned by
+        a parser's iter_entries(), and is only iterated over once.
+        Fields with a value of None are omitted."""
+        for entry in entries:
+            fileobject.write(self.format_entry(entry))
+
+    def format_entry(self, entry):
+        """Return entry formatted for writing"""
+        lines = ["[{}]\n".format(entry.key)]
+        for item, value in entry.items():
+            if value is None:
+                continue
+            # Same format as RawConfigParser.write(), with "%" escaped
+            # for BibParser's interpolation.
+            lines.append("{} = {}\n".format(
+                item.lower(),
+                str(value).replace("%", "%%").replace("\n", "\n\t")))
+        lines.append("\n")
+        return "".join(lines)
+
+class BibTexWriter(BibWriter):
+    """Write a Bib object out to a file object as BibTeX
+
+    The entry type is taken from a "bibtex_type" field if there is one,
+    otherwise it is "inproceedings" for entries with a booktitle,
+    "article" for those with a journal and "misc" for the rest."""
+
+    def format_entry(self, entry):
+        lines = ["@{}{{{},\n".format(self.entry_type(entry), entry.key)]
+        for item, value in entry.items():
+            if value is None or item in ("key", "bibtex_type"):
+                continue
+            lines.append("  {} = {{{}}},\n".format(
+                item.lower(), escape_bibtex(str(value))))
+        lines.append("}\n\n")
+        return "".join(lines)
+
+    def entry_type(self, entry):
+        """Return BibTeX type of entry"""
+        if entry.get("bibtex_type"):
+            return entry["bibtex_type"]
+        if entry.get("booktitle"):
+            return "inproceedings"
+        if entry.get("journal"):
+            return "article"
+        return "misc"
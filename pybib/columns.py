@@ -0,0 +1,335 @@
+"""Columns: a bibliography as arrays of field values, for counting entries
+
+Each field is a column holding a value per entry (row). Year and month
+are integers. Fields with few distinct values, such as project and type,
+are dictionary encoded: the column is an array of integer codes indexing
+a list of the distinct values. Authors are encoded the same way but as
+there are any number per entry, their column also has an array of the
+row of each code. Missing values are MISSING.
+
+Counting then works on arrays of small integers rather than entries,
+e.g. publications per project per year of an author:
+
+    columns = Columns.from_entries(bib)
+    columns.count("project", "year", author="Von Welch")
+
+Columns can be saved to a file, which is memory mapped on loading so
+arrays are used in place rather than read, and loading takes about the
+same time however many entries there are.
+"""
+
+import array
+import bisect
+import collections
+import itertools
+import re
+import sys
+
+from . import datafile
+from .entry import MONTHS
+
+# Code or integer value of a missing field
+MISSING = -1
+
+# Fields dictionary encoded by default
+CATEGORICAL_FIELDS = ("project", "type", "booktitle", "journal",
+                      "publisher")
+
+MAGIC = b"pyBib columns 2\n"
+
+YEAR_RE = re.compile(r"[0-9]{1,9}")
+
+def parse_year(year):
+    """Return year as an integer, MISSING if it is missing or not a year
+
+    Only digits are allowed, and few enough to fit in an array of "i"."""
+    if not year:
+        return MISSING
+    match = YEAR_RE.fullmatch(year.strip())
+    return int(match.group()) if match else MISSING
+
+def parse_month(month):
+    """Return number of month given its name or number, else MISSING"""
+    if not month:
+        return MISSING
+    if month.isdigit():
+        number = int(month)
+        return number if 1 <= number <= 12 else MISSING
+    return MONTHS.get(month.lower(), MISSING)
+
+# Integer fields and functions parsing their values
+INTEGER_FIELDS = {
+    "year": parse_year,
+    "month": parse_month,
+}
+
+class IntegerColumn(object):
+    """Column of integers, e.g. years
+
+    parse returns the integer for a field value."""
+
+    kind = "integer"
+
+    def __init__(self, parse, codes=None):
+        self.parse = parse
+        # Values, used as codes so all columns are counted the same way
+        self.codes = codes if codes is not None else array.array("i")
+
+    def extend(self, values):
+        self.codes.extend(map(self.parse, values))
+
+    def encode(self, value):
+        """Return code of value, None if it is not valid"""
+        if not isinstance(value, int):
+            value = self.parse(value)
+        return None if value == MISSING else value
+
+    def decode(self, code):
+        """Return value of code, None for MISSING"""
+        return None if code == MISSING else code
+
+class CategoricalColumn(object):
+    """Dictionary encoded column of strings"""
+
+    kind = "categorical"
+
+    def __init__(self, values=None, codes=None):
+        # Distinct values, indexed by code
+        self.values = values if values is not None else []
+        self.codes = codes if codes is not None else array.array("i")
+        self._lookup = {value: code for code, value in enumerate(self.values)}
+
+    def code(self, value):
+        """Return code of value, adding it if new"""
+        if value is None:
+            return MISSING
+        code = self._lookup.get(value)
+        if code is None:
+            code = self._lookup[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def extend(self, values):
+        self.codes.extend(map(self.code, values))
+
+    def encode(self, value):
+        """Return code of value, None if no row has it"""
+        return self._lookup.get(value)
+
+    def decode(self, code):
+        """Return value of code, None for MISSING"""
+        return None if code == MISSING else self.values[code]
+
+class MultiColumn(CategoricalColumn):
+    """Dictionary encoded column of any number of strings per row
+
+    codes holds the codes of all rows' values in order and rows the row
+    of each."""
+
+    kind = "multi"
+
+    def __init__(self, values=None, codes=None, rows=None):
+        super().__init__(values, codes)
+        self.rows = rows if rows is not None else array.array("I")
+
+    def extend_rows(self, start, values):
+        """Add rows from start, each with the list of values given"""
+        code = self.code
+        for row, row_values in enumerate(values, start):
+            self.codes.extend(map(code, row_values))
+            self.rows.extend([row] * len(row_values))
+
+class Columns(object):
+    """Bibliography as columns of field values
+
+    Has the key, year, month and author of each entry and the fields
+    in categorical. Columns of instances returned by load() are read
+    only."""
+
+    def __init__(self, categorical=CATEGORICAL_FIELDS):
+        self.keys = []
+        # Field name -> column, or (kind, values, arrays) to load from
+        # self._map
+        self._columns = {field: IntegerColumn(parse)
+                         for field, parse in INTEGER_FIELDS.items()}
+        for field in categorical:
+            self._columns[field] = CategoricalColumn()
+        self._columns["author"] = MultiColumn()
+        self._map = None
+        self._byteorder = sys.byteorder
+
+    @classmethod
+    def from_entries(cls, entries, categorical=CATEGORICAL_FIELDS):
+        """Return Columns holding entries"""
+        columns = cls(categorical)
+        columns.extend(entries)
+        return columns
+
+    def __len__(self):
+        return len(self.keys)
+
+    @property
+    def fields(self):
+        """Names of fields with columns"""
+        return list(self._columns)
+
+    def extend(self, entries):
+        """Add a row for each of entries"""
+        # A column at a time, rather than an entry at a time, is faster.
+        # get() rather than [], which would add missing fields to Entry
+        entries = list(entries)
+        start = len(self.keys)
+        self.keys.extend(entry.get("key") for entry in entries)
+        for field in self.fields:
+            if field == "author":
+                self.column(field).extend_rows(
+                    start, ([person.name for person in entry.authors()]
+                            for entry in entries))
+            else:
+                self.column(field).extend(entry.get(field)
+                                          for entry in entries)
+
+    def column(self, field):
+        """Return column of field, raising KeyError if there is none"""
+        column = self._columns[field]
+        if isinstance(column, tuple):
+            column = self._columns[field] = self._load_column(field,
+                                                              *column)
+        return column
+
+    def value(self, field, row):
+        """Return value of field in row, a list for "author" """
+        column = self.column(field)
+        if column.kind == "multi":
+            # Rows are in order
+            start = bisect.bisect_left(column.rows, row)
+            end = bisect.bisect_right(column.rows, row, start)
+            return [column.decode(code) for code in column.codes[start:end]]
+        return column.decode(column.codes[row])
+
+    def select(self, **criteria):
+        """Return mask of rows with the field values in criteria
+
+        The mask has a byte per row, 1 if it matches, else 0. As with
+        Bib.where(), a value matches "author" if it is one of the row's
+        authors."""
+        mask = None
+        for field, value in criteria.items():
+            column = self.column(field)
+            code = column.encode(value)
+            if code is None:
+                return bytes(len(self))
+            if column.kind == "multi":
+                matches = bytearray(len(self))
+                for row in itertools.compress(column.rows,
+                                              map(code.__eq__, column.codes)):
+                    matches[row] = 1
+            else:
+                matches = bytes(map(code.__eq__, column.codes))
+            mask = matches if mask is None else \
+                bytes(map(int.__and__, mask, matches))
+        return mask if mask is not None else b"\x01" * len(self)
+
+    def rows(self, **criteria):
+        """Return list of rows with the field values in criteria"""
+        return list(itertools.compress(range(len(self)),
+                                       self.select(**criteria)))
+
+    def count(self, *fields, **criteria):
+        """Return Counter of rows with each value of fields
+
+        Counts are keyed by value for a single field, by tuple of values
+        for more, with None for missing values. Only rows with the
+        field values in criteria, as select(), are counted. Each author
+        of a row is counted, but only one field may be "author"."""
+        if not fields:
+            raise ValueError("No fields to count")
+        columns = [self.column(field) for field in fields]
+        multi = [column for column in columns if column.kind == "multi"]
+        if len(multi) > 1:
+            raise ValueError("Can only count one field with multiple values")
+        mask = self.select(**criteria) if criteria else None
+        if multi:
+            # A code for each value of the multi column, with the row's
+            # code for the other columns
+            rows = multi[0].rows
+            codes = [column.codes if column is multi[0] else
+                     map(column.codes.__getitem__, rows)
+                     for column in columns]
+            if mask is not None:
+                mask = map(mask.__getitem__, rows)
+        else:
+            codes = [column.codes for column in columns]
+        codes = codes[0] if len(codes) == 1 else zip(*codes)
+        if mask is not None:
+            codes = itertools.compress(codes, mask)
+        # Counting is done on codes, which are only decoded once each
+        counts = collections.Counter(codes)
+        if len(columns) == 1:
+            decode = columns[0].decode
+            return collections.Counter({decode(code): n
+                                        for code, n in counts.items()})
+        return collections.Counter(
+            {tuple(column.decode(code) for column, code
+                   in zip(columns, key)): n
+             for key, n in counts.items()})
+
+    def save(self, filename):
+        """Write columns to filename, as a data file (see pybib.datafile)"""
+        def write(writer):
+            header = {
+                "byteorder": sys.byteorder,
+                "count": len(self),
+                "keys": writer.write_json(self.keys),
+                "columns": {},
+            }
+            for field in self.fields:
+                column = self.column(field)
+                arrays = [("codes", column.codes)]
+                if column.kind == "multi":
+                    arrays.append(("rows", column.rows))
+                header["columns"][field] = (
+                    column.kind,
+                    getattr(column, "values", None),
+                    {name: (data.typecode if isinstance(data, array.array)
+                            else data.format,
+                            writer.write(data))
+                     for name, data in arrays})
+            return header
+        datafile.save(filename, MAGIC, write)
+
+    @classmethod
+    def load(cls, filename):
+        """Return columns from filename written by save()
+
+        The file is memory mapped and columns are only read when needed,
+        so it should not be changed while in use. Loading runs nothing
+        from the file, so it may come from anywhere."""
+        header, data = datafile.load(filename, MAGIC, "columns file")
+        columns = cls(categorical=())
+        columns._map = data
+        columns._byteorder = header["byteorder"]
+        columns.keys = datafile.read_json(data, header["keys"])
+        # Tuples, as column() tells columns to load from those
+        columns._columns = {field: tuple(column) for field, column
+                            in header["columns"].items()}
+        return columns
+
+    def _load_column(self, field, kind, values, arrays):
+        """Return column of field from arrays in file
+
+        arrays is {name: (typecode, (offset, length))}"""
+        loaded = {}
+        for name, (typecode, (offset, length)) in arrays.items():
+            view = memoryview(self._map)[offset:offset + length]
+            if self._byteorder == sys.byteorder:
+                # Used in place
+                loaded[name] = view.cast(typecode)
+            else:
+                loaded[name] = array.array(typecode, view.tobytes())
+                loaded[name].byteswap()
+        if kind == "integer":
+            return IntegerColumn(INTEGER_FIELDS[field], loaded["codes"])
+        if kind == "categorical":
+            return CategoricalColumn(values, loaded["codes"])
+        return MultiColumn(values, loaded["codes"], loaded["rows"])
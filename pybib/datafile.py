@@ -0,0 +1,82 @@
+"""Data files: arrays and other data with a JSON header, memory mapped
+
+SearchIndex and Columns save themselves as data files. A file is a
+magic string identifying its kind, then the data, each piece starting
+on a multiple of ALIGNMENT bytes, then a JSON header saying where the
+data is, then the header's offset. Nothing in a file is unpickled or
+otherwise run, so loading one from an untrusted source is safe.
+"""
+
+import json
+import mmap
+import struct
+
+from .atomic import atomic_write
+
+HEADER_OFFSET = struct.Struct("<Q")
+
+# Data in files starts on multiples of this
+ALIGNMENT = 8
+
+class DataWriter(object):
+    """Write pieces of data to a data file"""
+
+    def __init__(self, fileobject):
+        self.fileobject = fileobject
+
+    def write(self, data):
+        """Write bytes-like data, returning its [offset, length]"""
+        f = self.fileobject
+        f.write(bytes(-f.tell() % ALIGNMENT))
+        offset = f.tell()
+        data = memoryview(data).cast("B")
+        f.write(data)
+        return [offset, len(data)]
+
+    def write_json(self, value):
+        """Write value as JSON text, returning its [offset, length]"""
+        return self.write(json.dumps(value).encode("utf-8"))
+
+def save(filename, magic, write):
+    """Write a data file to filename
+
+    write(writer) writes the data with writer, a DataWriter, and returns
+    the header, which must be serializable as JSON."""
+    with atomic_write(filename, "wb") as f:
+        f.write(magic)
+        header = write(DataWriter(f))
+        start = f.tell()
+        f.write(json.dumps(header).encode("utf-8"))
+        f.write(HEADER_OFFSET.pack(start))
+
+def load(filename, magic, kind):
+    """Return (header, data) of data file filename
+
+    data is the memory mapped file, from which read_json() and slices
+    read the data. Raises ValueError, naming kind, if filename is not a
+    data file starting with magic."""
+    with open(filename, "rb") as f:
+        try:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty file
+            raise ValueError("Not a {}: {}".format(kind, filename))
+    try:
+        if len(data) < len(magic) + HEADER_OFFSET.size or \
+           data[:len(magic)] != magic:
+            raise ValueError("Not a {}: {}".format(kind, filename))
+        start, = HEADER_OFFSET.unpack(data[-HEADER_OFFSET.size:])
+        try:
+            header = json.loads(
+                data[start:-HEADER_OFFSET.size].decode("utf-8"))
+        except ValueError:
+            raise ValueError("Corrupt {}: {}".format(kind, filename))
+    except BaseException:
+        data.close()
+        raise
+    return header, data
+
+def read_json(data, location):
+    """Return value written by DataWriter.write_json() at location"""
+    offset, length = location
+    return json.loads(data[offset:offset + length].decode("utf-8"))
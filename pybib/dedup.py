@@ -0,0 +1,197 @@
+"""Find and merge duplicate entries in a bibliography
+
+Entries are duplicates if they share a normalized DOI, URL, or title and
+year. Optionally, entries with the same author surnames and year are
+also compared by title similarity. Entries are only compared within
+these groups, so the time taken grows about linearly with the number of
+entries."""
+
+import difflib
+import re
+import urllib.parse
+
+from .bib import Bib
+
+DOI_PREFIX_RE = re.compile(r"^(?:doi:|https?://(?:dx\.)?doi\.org/)\s*",
+                           re.IGNORECASE)
+NON_WORD_RE = re.compile(r"[\W_]+")
+
+# Groups larger than this are not compared by title similarity, as they
+# are more likely common names than duplicates.
+MAX_FUZZY_BLOCK = 50
+
+def doi_key(entry):
+    """Return normalized DOI of entry, None if it has none"""
+    doi = entry.get("doi")
+    if not doi:
+        return None
+    return DOI_PREFIX_RE.sub("", doi.strip()).lower() or None
+
+def url_key(entry):
+    """Return normalized URL of entry, None if it has none
+
+    The scheme, any "www." and a trailing slash are ignored."""
+    url = entry.get("url")
+    if not url:
+        return None
+    parts = urllib.parse.urlsplit(url.strip())
+    host = parts.netloc.lower()
+    if host.startswith("www."):
+        host = host[4:]
+    path = parts.path.rstrip("/")
+    if parts.query:
+        path += "?" + parts.query
+    return (host + path) or None
+
+def title_words(entry):
+    """Return entry's title case-folded without punctuation"""
+    title = entry.get("title")
+    if not title:
+        return ""
+    return NON_WORD_RE.sub(" ", title.casefold()).strip()
+
+def title_key(entry):
+    """Return (title words, year) of entry, None if it has no title"""
+    title = title_words(entry)
+    if not title:
+        return None
+    return (title, entry.get("year"))
+
+def author_key(entry):
+    """Return (set of author surnames, year), None if it has no authors"""
+    authors = entry.authors()
+    if not authors:
+        return None
+    surnames = frozenset(person.family.casefold() for person in authors)
+    return (surnames, entry.get("year"))
+
+# Functions giving keys on which entries with equal values are duplicates
+DEFAULT_KEYS = [doi_key, url_key, title_key]
+
+def longest(values):
+    """Field precedence choosing the longest value"""
+    return max(values, key=len)
+
+class Deduplicator(object):
+    """Find clusters of duplicate entries and merge them
+
+    keys is list of functions returning a key for an entry, or None, on
+    which entries with equal keys are duplicates. If fuzzy is True,
+    entries with the same author_key() are also duplicates if their
+    titles are at least threshold similar (0 to 1).
+
+    Merging keeps the key of the first entry in a cluster and, for each
+    field, the value from the first entry having it. rank, if given, is
+    a sort key function ordering entries by preference instead.
+    precedence maps field names to functions choosing a value from the
+    list of values of that field, in order of preference, e.g.
+    {"title": longest}."""
+
+    def __init__(self, keys=None, fuzzy=False, threshold=0.9, rank=None,
+                 precedence=None):
+        self.keys = keys if keys is not None else DEFAULT_KEYS
+        self.fuzzy = fuzzy
+        self.threshold = threshold
+        self.rank = rank
+        self.precedence = precedence or {}
+
+    def clusters(self, entries):
+        """Return list of clusters of duplicates in entries
+
+        Each cluster is a list of two or more entries, in the order they
+        appear in entries."""
+        entries = list(entries)
+        # Union-find over entry positions
+        parents = list(range(len(entries)))
+
+        def find(i):
+            while parents[i] != i:
+                parents[i] = parents[parents[i]]
+                i = parents[i]
+            return i
+
+        def union(i, j):
+            i, j = find(i), find(j)
+            if i != j:
+                # Lowest position is root, keeping clusters in order
+                if j < i:
+                    i, j = j, i
+                parents[j] = i
+
+        for key_func in self.keys:
+            first = {}
+            for i, entry in enumerate(entries):
+                key = key_func(entry)
+                if key is None:
+                    continue
+                j = first.setdefault(key, i)
+                if j != i:
+                    union(j, i)
+        if self.fuzzy:
+            blocks = {}
+            for i, entry in enumerate(entries):
+                key = author_key(entry)
+                if key is not None:
+                    blocks.setdefault(key, []).append(i)
+            for block in blocks.values():
+                if 1 < len(block) <= MAX_FUZZY_BLOCK:
+                    self._compare_titles(entries, block, find, union)
+
+        clusters = {}
+        for i in range(len(entries)):
+            clusters.setdefault(find(i), []).append(entries[i])
+        return [c for c in clusters.values() if len(c) > 1]
+
+    def _compare_titles(self, entries, block, find, union):
+        """Join entries in block with similar titles"""
+        titles = [title_words(entries[i]) for i in block]
+        matcher = difflib.SequenceMatcher(autojunk=False)
+        for a in range(len(block)):
+            if not titles[a]:
+                continue
+            matcher.set_seq2(titles[a])
+            for b in range(a + 1, len(block)):
+                if not titles[b] or find(block[a]) == find(block[b]):
+                    continue
+                matcher.set_seq1(titles[b])
+                # Cheap upper bounds first
+                if matcher.real_quick_ratio() < self.threshold or \
+                   matcher.quick_ratio() < self.threshold or \
+                   matcher.ratio() < self.threshold:
+                    continue
+                union(block[a], block[b])
+
+    def merge(self, cluster):
+        """Return a new entry merging the entries in cluster"""
+        if self.rank is not None:
+            ranked = sorted(cluster, key=self.rank)
+        else:
+            ranked = cluster
+        merged = type(cluster[0])()
+        names = []
+        for entry in ranked:
+            names.extend(name for name in entry.keys() if name not in names)
+        for name in names:
+            values = [e[name] for e in ranked if e.get(name) is not None]
+            if not values:
+                merged[name] = None
+            elif name in self.precedence:
+                merged[name] = self.precedence[name](values)
+            else:
+                merged[name] = values[0]
+        merged["key"] = cluster[0]["key"]
+        return merged
+
+    def dedup(self, bib, clusters=None):
+        """Return new Bib with each cluster of duplicates merged
+
+        The merged entry takes the place of the first in its cluster.
+        clusters, if given, are those returned by clusters(bib)."""
+        if clusters is None:
+            clusters = self.clusters(bib)
+        merged = {}
+        dropped = set()
+        for cluster in clusters:
+            merged[id(cluster[0])] = self.merge(cluster)
+            dropped.update(id(e) for e in cluster[1:])
+        return Bib(merged.get(id(e), e) for e in bib if id(e) not in dropped)
@@ -5,25 +5,64 @@ https://docs.figshare.com/
 Kudos: https://github.com/makkus/pigshare
 """
 
+import concurrent.futures
 import hashlib
+import json
+import os
 import os.path
+import threading
+import time
 
 import requests
+import requests.adapters
 
 
 FIGSHARE_BASE_URL = 'https://api.figshare.com/v2'
 
+# Suffix of file recording progress of an upload, so it can be resumed
+UPLOAD_STATE_SUFFIX = '.figshare-upload'
+
+
+class RateLimiter:
+    """Limit wait() to returning rate times a second, across threads"""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        """Sleep until the next call is allowed"""
+        with self._lock:
+            now = time.monotonic()
+            delay = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
 
 class Figshare:
 
-    def __init__(self, token):
+    def __init__(self, token, url=FIGSHARE_BASE_URL, rate=None,
+                 connections=10):
         """Create an interface to Figshare.
 
         Token is a Figshare Personal Token (not an OAuth token):
         https://help.figshare.com/article/how-to-get-a-personal-token
+
+        If rate is given, at most that many API requests (get(), post()
+        and put()) are made a second. Uploads of parts of files are not
+        limited.
+        connections is the number of connections kept open to each host,
+        which should be at least the number of threads using the
+        instance at once.
         """
-        self.url = FIGSHARE_BASE_URL
+        self.url = url
+        self.limiter = RateLimiter(rate) if rate else None
         self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=connections)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
         self.session.headers = {
             'Content-Type': 'application/json',
             'Authorization': 'token ' + token
@@ -34,16 +73,24 @@ class Figshare:
 
     def get(self, path, **kwargs):
         """Get from given path"""
+        self._wait()
         return self.session.get(self.url + path, **kwargs)
 
     def post(self, path, **kwargs):
         """Post to given path with given data"""
+        self._wait()
         return self.session.post(self.url + path, **kwargs)
 
     def put(self, path, **kwargs):
         """Post to given path with given data"""
+        self._wait()
         return self.session.put(self.url + path, **kwargs)
 
+    def _wait(self):
+        """Wait until an API request is allowed by the rate limit"""
+        if self.limiter is not None:
+            self.limiter.wait()
+
     def create_article(self, article):
         """Create an article from given dictionary and return it's URI"""
         response = self.post("/account/articles", json=article)
@@ -61,16 +108,77 @@ class Figshare:
             raise Exception(json["message"])
         return json["doi"]
 
-    def upload_new_file(self, article_id, file_path):
-        """Upload a new file associated with the given article id"""
+    def list_files(self, article_id):
+        """Return list of dictionaries describing the article's files"""
+        response = self.get("/account/articles/{}/files".format(article_id))
+        json = response.json()
+        if response.status_code != 200:
+            raise Exception(json["message"])
+        return json
+
+    def upload_new_file(self, article_id, file_path, workers=4, retries=3,
+                        resume=True):
+        """Upload a new file associated with the given article id
+
+        Parts of the file are uploaded in parallel by up to workers
+        threads, each part being retried up to retries times. If resume
+        is True, progress is recorded in file_path + UPLOAD_STATE_SUFFIX
+        so that calling this again after a failure only uploads the
+        parts that are missing, provided the file hasn't changed."""
+        state_path = file_path + UPLOAD_STATE_SUFFIX
+        stat = os.stat(file_path)
+        state = None
+        if resume:
+            state = self._load_upload_state(state_path, article_id, stat)
+        if state is None:
+            state = self._start_upload(article_id, file_path, stat)
+            if resume:
+                self._save_upload_state(state_path, state)
+        location = state["location"]
+        upload_url = state["upload_url"]
+
+        response = self.session.get(upload_url)
+        json = response.json()
+        completed = set(state["completed"])
+        parts = [part for part in json["parts"]
+                 if part["partNo"] not in completed
+                 and part.get("status") != "COMPLETE"]
+        error = None
+        with concurrent.futures.ThreadPoolExecutor(workers) as executor:
+            futures = [executor.submit(self._upload_part, upload_url,
+                                       file_path, part, retries)
+                       for part in parts]
+            # Record each part as it completes, even after another has
+            # failed, so a retry only uploads the parts still missing.
+            for future in concurrent.futures.as_completed(futures):
+                try:
+                    state["completed"].append(future.result())
+                except Exception as ex:
+                    error = error or ex
+                    continue
+                if resume:
+                    self._save_upload_state(state_path, state)
+        if error:
+            raise error
+
+        response = self.session.post(location)
+        if response.status_code != 202:
+            json = response.json()
+            raise Exception(json["message"])
+        if resume:
+            os.remove(state_path)
+        return location
+
+    def _start_upload(self, article_id, file_path, stat):
+        """Initiate upload of file_path and return its state"""
         data = {}
         hash = hashlib.md5()
         with open(file_path, "rb") as f:
-            for chunk in iter(lambda: f.read(4096), b""):
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
                 hash.update(chunk)
         data['md5'] = hash.hexdigest()
         data['name'] = os.path.basename(file_path)
-        data['size'] = os.path.getsize(file_path)
+        data['size'] = stat.st_size
 
         response = self.post('/account/articles/{}/files'.format(article_id),
                              json=data)
@@ -81,23 +189,54 @@ class Figshare:
 
         response = self.session.get(location)
         json = response.json()
-        upload_url = json["upload_url"]
+        return {
+            "article_id": str(article_id),
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+            "location": location,
+            "upload_url": json["upload_url"],
+            "completed": [],
+        }
 
-        response = self.session.get(upload_url)
-        json = response.json()
+    def _load_upload_state(self, state_path, article_id, stat):
+        """Return state of an earlier upload of the same file, if any"""
+        try:
+            with open(state_path) as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if (state.get("article_id") != str(article_id)
+                or state.get("size") != stat.st_size
+                or state.get("mtime") != stat.st_mtime):
+            return None
+        return state
+
+    def _save_upload_state(self, state_path, state):
+        """Record state of upload in state_path"""
+        tmp_path = state_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, state_path)
+
+    def _upload_part(self, upload_url, file_path, part, retries):
+        """Upload one part of file, returning its part number"""
+        size = part['endOffset'] - part['startOffset'] + 1
+        # Each part is read from its offset, so only the parts being
+        # uploaded at the moment are in memory.
         with open(file_path, 'rb') as file_input:
-            for part in json["parts"]:
-                size = part['endOffset'] - part['startOffset'] + 1
+            file_input.seek(part['startOffset'])
+            data = file_input.read(size)
+        for attempt in range(retries + 1):
+            if attempt:
+                time.sleep(2 ** (attempt - 1))
+            try:
                 response = self.session.put(
-                    '{0}/{1}'.format(upload_url, part['partNo']),
-                    data=file_input.read(size))
-                if response.status_code != 200:
-                    raise Exception(
-                        "Error uploading file. "
-                        "Status = {}".format(response.status_code))
-
-        response = self.session.post(location)
-        if response.status_code != 202:
-            json = response.json()
-            raise Exception(json["message"])
-        return location
+                    '{0}/{1}'.format(upload_url, part['partNo']), data=data)
+            except requests.RequestException as ex:
+                error = str(ex)
+                continue
+            if response.status_code == 200:
+                return part['partNo']
+            error = "Status = {}".format(response.status_code)
+        raise Exception(
+            "Error uploading part {} of file. {}".format(part['partNo'], error))
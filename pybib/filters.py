@@ -1,50 +1,69 @@
-"""Filter for use in tempaltes"""
+"""Filter for use in tempaltes
+
+Filters are memoized in bounded LRU caches, as the same authors and
+months turn up over and over. cache_info() reports how well the caches
+are doing."""
 
 import datetime
-import re
-import string
+import functools
+
+from .authors import parse_authors
+from .authors import parse_name
+from .entry import MONTHS
 
-AUTHOR_SPLIT_RE = re.compile(",|\sand\s")
+# Maximum number of results cached by each filter
+FILTER_CACHE_SIZE = 4096
 
+# Full month name for each month number
+MONTH_NAMES = [None] + [datetime.date(2000, n, 1).strftime("%B")
+                        for n in range(1, 13)]
+
+@functools.lru_cache(maxsize=FILTER_CACHE_SIZE)
 def authors_filter(s):
     """Given a list of authors, return a nice representation"""
     if s is None:
         return None
-    authors = AUTHOR_SPLIT_RE.split(s)
-    # Clean up whitespace and remove null authors
-    authors = [s.strip() for s in authors if len(s)>0]
+    authors = [person.name for person in parse_authors(s)]
+    if not authors:
+        return s
     if len(authors) > 1:
         authors_string = ", ".join(authors[:-1]) + " and " + authors[len(authors)-1]
     else:
         authors_string = authors[0]
     return authors_string
 
+@functools.lru_cache(maxsize=FILTER_CACHE_SIZE)
 def first_name_initial_filter(s):
     """Make first name an initial and return"""
-    parts = s.split()
-    if len(parts) == 0:
+    if not s.strip():
         return s
-    first_name = parts[0]
-    parts[0] = first_name[0].upper() + "."
-    return " ".join(parts)
+    return parse_name(s.strip()).initial_name()
 
+@functools.lru_cache(maxsize=FILTER_CACHE_SIZE)
 def month_filter(s):
     """Given any reasonable month representation, return a nice string"""
     if s is None:
         return None
-    dt = None
-    try:
-        # Full month name
-        dt = datetime.datetime.strptime(s, "%B")
-    except ValueError:
-        pass
-    if dt is None:
-        try:
-            # Abbreviated month name
-            dt = datetime.datetime.strptime(s, "%b")
-        except ValueError:
-            pass
-    if dt is None:
+    number = MONTHS.get(s.lower())
+    if number is None:
         # Punt
         return s
-    return dt.strftime("%B")
+    return MONTH_NAMES[number]
+
+FILTERS = [
+    authors_filter,
+    first_name_initial_filter,
+    month_filter,
+]
+
+def cache_info():
+    """Return dictionary of filter name to its cache statistics
+
+    Statistics are functools.lru_cache() CacheInfo tuples with hits,
+    misses, maxsize and currsize."""
+    return dict((f.__name__, f.cache_info()) for f in FILTERS)
+
+def cache_clear():
+    """Clear filter caches and their statistics"""
+    for f in FILTERS:
+        f.cache_clear()
@@ -0,0 +1,75 @@
+"""IncrementalBib: a bibliography re-parsing only files that change"""
+
+import os
+
+from .bib import Bib
+
+class IncrementalBib(object):
+    """Bibliography parsed from files, re-parsing only those that change
+
+    The entries parsed from each file are kept, so refresh() only has to
+    parse files modified since they were last parsed. So the result is
+    the same as parsing all the files together, the context each file
+    is parsed with, BibTeX macros or DEFAULT values, is kept too, and
+    files whose context has changed are parsed again as well.
+
+    parser is a BibParser or BibTexParser instance. Its snapshots are
+    not used, as files are parsed one at a time."""
+
+    def __init__(self, parser, filenames):
+        self.parser = parser
+        self.filenames = list(filenames)
+        # filename -> list of entries parsed from it
+        self.entries = {}
+        # filename -> (size, mtime) when parsed
+        self._stats = {}
+        # filename -> (context at start, context at end) when parsed
+        self._contexts = {}
+        self.bib = None
+        self.refresh()
+
+    def _stat(self, filename):
+        try:
+            st = os.stat(filename)
+        except OSError:
+            return None
+        return (st.st_size, st.st_mtime_ns)
+
+    def refresh(self):
+        """Re-parse any files that have changed and update bib
+
+        Returns list of the entries, before and after merging with those
+        from other files, whose keys appear in the changes. It is empty
+        if nothing changed."""
+        stats = [self._stat(filename) for filename in self.filenames]
+        if self.bib is not None and all(
+                self._stats.get(filename) == stat
+                for filename, stat in zip(self.filenames, stats)):
+            return []
+        keys = set()
+        initial = self.parser.initial_context(self.filenames)
+        context = initial
+        for filename, stat in zip(self.filenames, stats):
+            if filename in self._contexts and \
+               self._stats[filename] == stat and \
+               self._contexts[filename][0] == context:
+                context = self._contexts[filename][1]
+                continue
+            start = context
+            context = dict(start)
+            entries = list(self.parser.iter_file(filename, context))
+            for entry in self.entries.get(filename, []) + entries:
+                keys.add(entry.get("key"))
+            self.entries[filename] = entries
+            self._stats[filename] = stat
+            self._contexts[filename] = (start, context)
+        if not keys and self.bib is not None:
+            return []
+        old = self.bib if self.bib is not None else []
+        bib = Bib()
+        self.parser.add_entries(
+            bib, (entry for filename in self.filenames
+                  for entry in self.entries[filename]), initial)
+        self.bib = bib
+        return [e for e in old if e.get("key") in keys] + \
+            [e for e in bib if e.get("key") in keys]
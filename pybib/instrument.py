@@ -0,0 +1,151 @@
+"""Instrumentation: count and time the stages of building a bibliography
+
+Profiler.install() wraps parsing, entry creation, sorting, filters and
+template rendering with counters and timers, and uninstall() restores
+them, so there is no cost when not profiling. Times include those of
+any instrumented stages called within, e.g. parse_bib includes entry
+creation. Only the current process is measured.
+
+The scripts profile if given --profile or if the PYBIB_PROFILE
+environment variable is set to the file to write the report to.
+"""
+
+import functools
+import json
+import os
+import time
+
+from . import filters
+from .bib import Bib
+from .bibparser import BibParser
+from .bibtexparser import BibTexParser
+from .entry import CompactEntry
+from .entry import Entry
+from .renderer import Renderer
+
+def profile_filename():
+    """Return file to write profile report to from environment, or None"""
+    return os.environ.get("PYBIB_PROFILE") or None
+
+class Profiler(object):
+    """Count and time calls to stages of building a bibliography"""
+
+    # (owner, attribute, stage name) of functions timed
+    TIMED = [
+        (BibParser, "parse_bib", "BibParser.parse_bib"),
+        (BibTexParser, "parse_bib", "BibTexParser.parse_bib"),
+        (Bib, "sort", "Bib.sort"),
+        (Bib, "sort_by", "Bib.sort_by"),
+        (Bib, "sort_by_date", "Bib.sort_by_date"),
+        (Renderer, "get_template", "template.compile"),
+        (Renderer, "render", "template.render"),
+    ] + [(filters, f.__name__, "filters." + f.__name__)
+         for f in filters.FILTERS]
+
+    # (owner, attribute, stage name) of functions only counted, as they
+    # are called too often to time
+    COUNTED = [
+        (Entry, "__init__", "Entry"),
+        (CompactEntry, "__init__", "CompactEntry"),
+    ]
+
+    def __init__(self):
+        # Stage name -> [calls, seconds]
+        self.stats = {}
+        # (owner, attribute, original) for uninstall()
+        self._originals = []
+        self._start = None
+
+    def install(self):
+        """Start counting and timing"""
+        if self._originals:
+            return
+        self._start = time.perf_counter()
+        for owner, attribute, name in self.TIMED:
+            self._replace(owner, attribute, self.timed(
+                name, getattr(owner, attribute)))
+        for owner, attribute, name in self.COUNTED:
+            self._replace(owner, attribute, self.counted(
+                name, getattr(owner, attribute)))
+
+    def _replace(self, owner, attribute, wrapper):
+        original = getattr(owner, attribute)
+        self._originals.append((owner, attribute, original))
+        setattr(owner, attribute, wrapper)
+        if owner is filters:
+            # Filters are also imported into the package
+            import pybib
+            if getattr(pybib, attribute, None) is original:
+                self._originals.append((pybib, attribute, original))
+                setattr(pybib, attribute, wrapper)
+
+    def uninstall(self):
+        """Stop counting and timing"""
+        for owner, attribute, original in reversed(self._originals):
+            setattr(owner, attribute, original)
+        self._originals = []
+
+    def timed(self, name, func):
+        """Return func wrapped to count and time calls as stage name"""
+        stat = self.stats.setdefault(name, [0, 0.0])
+        clock = time.perf_counter
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = clock()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                stat[0] += 1
+                stat[1] += clock() - start
+        return wrapper
+
+    def counted(self, name, func):
+        """Return func wrapped to count calls as stage name"""
+        stat = self.stats.setdefault(name, [0, None])
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            stat[0] += 1
+            return func(*args, **kwargs)
+        return wrapper
+
+    def timer(self, name):
+        """Return context manager timing a block of code as stage name"""
+        return Timer(self.stats.setdefault(name, [0, 0.0]))
+
+    def report(self):
+        """Return dictionary reporting counts and times"""
+        stages = {}
+        for name, (calls, seconds) in self.stats.items():
+            if not calls:
+                continue
+            stage = {"calls": calls}
+            if seconds is not None:
+                stage["seconds"] = seconds
+                stage["mean_us"] = seconds / calls * 1e6
+            stages[name] = stage
+        return {
+            "total_seconds": (time.perf_counter() - self._start
+                              if self._start is not None else 0.0),
+            "stages": stages,
+        }
+
+    def write(self, filename):
+        """Write report to filename as JSON"""
+        with open(filename, "w") as f:
+            json.dump(self.report(), f, indent=2, sort_keys=True)
+            f.write("\n")
+
+class Timer(object):
+    """Context manager adding a call and its time to a stat"""
+
+    def __init__(self, stat):
+        self.stat = stat
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stat[0] += 1
+        self.stat[1] += time.perf_counter() - self.start
+        return False
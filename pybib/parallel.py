@@ -0,0 +1,126 @@
+"""Parse bibliography files in parallel
+
+Files are split into chunks, large files at entry boundaries, which are
+parsed by a pool of processes. The entries are put back together in the
+order of the chunks, so the result is the same as parsing the files one
+after another.
+
+Parsers provide hooks for this:
+
+    BOUNDARY_RE: bytes regular expression matching the newline before a
+        line at which a file may be split.
+    initial_context(filenames): state at the start of the first file,
+        carried from one chunk to the next, e.g. BibTeX macros.
+    needs_scan(data): might chunk bytes data change the context?
+    scan_context(text, context, filename, lineno): update context with
+        any state changed by chunk text.
+    parse_chunk(text, filename, lineno, context): return (entries, ok),
+        where ok is False if the chunk ended part way through an entry.
+"""
+
+import io
+import os
+
+# Files larger than this are split into chunks about this size
+CHUNK_SIZE = 1024 * 1024
+# Amount read at a time looking for a boundary
+BOUNDARY_WINDOW = 64 * 1024
+
+def decode(data):
+    """Decode data read from a file as open() would in text mode"""
+    return io.TextIOWrapper(io.BytesIO(data)).read()
+
+def find_boundary(f, pos, boundary_re, size):
+    """Return offset of first line matching boundary_re after pos
+
+    Returns size if there is none."""
+    f.seek(pos)
+    data = b""
+    while True:
+        window = f.read(BOUNDARY_WINDOW)
+        if not window:
+            return size
+        data += window
+        match = boundary_re.search(data)
+        if match:
+            return pos + match.start() + 1
+        # Keep any partial line for next time around
+        keep = data.rfind(b"\n")
+        if keep > 0:
+            pos += keep
+            data = data[keep:]
+
+def split_file(filename, boundary_re, chunk_size=CHUNK_SIZE):
+    """Yield (start, end, lineno, data) for chunks of filename
+
+    lineno is the line number chunk starts on and data its contents."""
+    with open(filename, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        start = 0
+        lineno = 1
+        while start < size:
+            end = size
+            if start + chunk_size < size:
+                end = find_boundary(f, start + chunk_size, boundary_re,
+                                    size)
+            f.seek(start)
+            data = f.read(end - start)
+            yield start, end, lineno, data
+            lineno += data.count(b"\n")
+            start = end
+
+def parse_chunk(job):
+    """Parse a chunk of a file in a worker process"""
+    parser, filename, start, end, lineno, context = job
+    with open(filename, "rb") as f:
+        f.seek(start)
+        text = decode(f.read(end - start))
+    return parser.parse_chunk(text, filename, lineno, context)
+
+def parse_parallel(parser, filenames, processes=None, skip_unreadable=False,
+                   chunk_size=CHUNK_SIZE, context=None):
+    """Return list of entries parsed from filenames by processes workers
+
+    processes defaults to the number of CPUs. If skip_unreadable is
+    True, files that cannot be opened are skipped, otherwise the error
+    is raised. context is the parser's initial_context(filenames), if
+    the caller already has it."""
+    # Imported here as the parsers import this module, and it isn't
+    # needed unless parsing in parallel
+    import concurrent.futures
+    # Each job is a chunk and the context at its start, which depends on
+    # the chunks before it, so is found by scanning them here.
+    jobs = []
+    # (filename, index of its first job, index after its last job)
+    files = []
+    if context is None:
+        context = parser.initial_context(filenames)
+    context = dict(context)
+    for filename in filenames:
+        try:
+            chunks = list(split_file(filename, parser.BOUNDARY_RE,
+                                     chunk_size))
+        except OSError:
+            if skip_unreadable:
+                continue
+            raise
+        files.append((filename, len(jobs), len(jobs) + len(chunks)))
+        for start, end, lineno, data in chunks:
+            jobs.append((parser, filename, start, end, lineno, dict(context)))
+            if parser.needs_scan(data):
+                parser.scan_context(decode(data), context, filename, lineno)
+    with concurrent.futures.ProcessPoolExecutor(processes) as executor:
+        results = list(executor.map(parse_chunk, jobs))
+    entries = []
+    for filename, first, last in files:
+        if all(ok for _, ok in results[first:last - 1]):
+            for chunk_entries, _ in results[first:last]:
+                entries.extend(chunk_entries)
+            continue
+        # A split fell inside an entry, parse the whole file instead
+        with open(filename, "rb") as f:
+            text = decode(f.read())
+        chunk_entries, _ = parser.parse_chunk(text, filename, 1,
+                                              jobs[first][5])
+        entries.extend(chunk_entries)
+    return entries
@@ -0,0 +1,74 @@
+"""Renderer: fill in Mako templates with a bibliography"""
+
+import hashlib
+import os
+import os.path
+
+# Mako is imported when first needed, so that using this module for
+# default_cache_dir() doesn't load it.
+
+# Options used for all templates
+TEMPLATE_OPTIONS = {
+    "default_filters": ["decode.utf8"],
+    "input_encoding": "utf-8",
+    "output_encoding": "utf-8",
+}
+
+def default_cache_dir():
+    """Return default directory for caching compiled templates"""
+    cache_home = os.environ.get("XDG_CACHE_HOME",
+                                os.path.expanduser("~/.cache"))
+    return os.path.join(cache_home, "pyBib", "templates")
+
+class Renderer(object):
+    """Render Mako templates, caching the compiled templates
+
+    If cache_dir is not None, compiled templates are kept there, named by
+    a hash of the template's contents, so they are only compiled again
+    when a template changes. Templates included from template_path, a
+    list of directories, are cached in the same directory. Compiled
+    templates are also kept in memory for the life of the instance."""
+
+    def __init__(self, template_path=None, cache_dir=None):
+        from mako.lookup import TemplateLookup
+        self.template_path = template_path
+        self.cache_dir = cache_dir
+        self.lookup = TemplateLookup(directories=template_path,
+                                     module_directory=cache_dir,
+                                     **TEMPLATE_OPTIONS)
+        # filename -> (hash, Template)
+        self._templates = {}
+
+    def get_template(self, filename):
+        """Return compiled template from filename"""
+        import mako
+        from mako.template import Template
+        with open(filename, "rb") as f:
+            data = f.read()
+        # Compiled template depends on options and Mako version as well
+        digest = hashlib.sha1(data)
+        digest.update(repr(sorted(TEMPLATE_OPTIONS.items())).encode())
+        digest.update(mako.__version__.encode())
+        digest = digest.hexdigest()
+        cached = self._templates.get(filename)
+        if cached is not None and cached[0] == digest:
+            return cached[1]
+        module_filename = None
+        if self.cache_dir is not None:
+            module_filename = os.path.join(self.cache_dir, digest + ".py")
+        # A uri at the top of the lookup keeps include paths relative to
+        # template_path.
+        template = Template(filename=filename,
+                            uri="/" + os.path.basename(filename),
+                            module_filename=module_filename,
+                            lookup=self.lookup,
+                            **TEMPLATE_OPTIONS)
+        self._templates[filename] = (digest, template)
+        return template
+
+    def render(self, filename, fileobject, **substitutions):
+        """Render template from filename to fileobject as it is generated"""
+        import mako.runtime
+        template = self.get_template(filename)
+        context = mako.runtime.Context(fileobject, **substitutions)
+        template.render_context(context)
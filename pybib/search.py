@@ -0,0 +1,298 @@
+"""SearchIndex: full-text search over bibliography entries
+
+Queries are words, all of which must match, e.g.
+
+    federated identity author:welch year:2005..2010
+
+A word matches any indexed field unless prefixed with the name of one.
+"year:" takes a year or an inclusive range, either end of which may be
+left out. Results are ranked by how often words occur in each field,
+weighted by field, and how rare the words are (Okapi BM25 without length
+normalization).
+
+An index can be saved to a file, which is memory mapped on loading and
+only read as far as queries need, so loading takes about the same time
+however many entries there are.
+"""
+
+import array
+import bisect
+import heapq
+import math
+import re
+
+from . import datafile
+from .columns import MISSING
+from .columns import parse_year
+from .entry import Entry
+
+TOKEN_RE = re.compile(r"\w+")
+YEAR_RANGE_RE = re.compile(r"^(\d*)(?:\.\.(\d*))?$")
+
+# Fields indexed by default and their weights in ranking
+FIELD_WEIGHTS = {
+    "title": 3.0,
+    "author": 2.0,
+    "keywords": 2.0,
+    "abstract": 1.0,
+    "booktitle": 1.0,
+    "journal": 1.0,
+    "howpublished": 1.0,
+    "publisher": 1.0,
+    "project": 1.0,
+}
+
+# BM25 term frequency saturation
+K1 = 1.2
+
+# Entries are stored in chunks of this many, loaded as needed
+DOC_CHUNK = 1024
+
+MAGIC = b"pyBib search index 2\n"
+
+# Year of entries without one
+NO_YEAR = -2 ** 31
+
+def tokenize(text):
+    """Return list of case-folded words in text"""
+    return TOKEN_RE.findall(text.casefold())
+
+def entry_year(entry):
+    """Return entry's year as an integer, None if it has no valid one"""
+    year = parse_year(entry.get("year"))
+    return None if year == MISSING else year
+
+class SearchIndex(object):
+    """Inverted index of words in bibliography entries
+
+    entries, e.g. a Bib, are added to the index. fields maps the names
+    of fields to index to their weights, by default FIELD_WEIGHTS."""
+
+    def __init__(self, entries=None, fields=None):
+        self.fields = dict(fields or FIELD_WEIGHTS)
+        # (field, word) -> (array of entry numbers, array of counts)
+        self._postings = {}
+        # (field, word) -> (offset, length) of postings in _map
+        self._stored = {}
+        # Year of each entry, NO_YEAR if it has none
+        self._years = array.array("i")
+        # Lists of DOC_CHUNK entries, or (offset, length) if not loaded
+        self._chunks = []
+        self._count = 0
+        self._map = None
+        # Class of entries loaded from _map
+        self._entry_class = Entry
+        if entries is not None:
+            self.update(entries)
+
+    def __len__(self):
+        return self._count
+
+    def add(self, entry):
+        """Add entry to the index"""
+        if self._chunks and isinstance(self._chunks[-1], tuple):
+            self._load_chunk(len(self._chunks) - 1)
+        if not self._chunks or len(self._chunks[-1]) == DOC_CHUNK:
+            self._chunks.append([])
+        self._chunks[-1].append(entry)
+        doc = self._count
+        self._count += 1
+        for field in self.fields:
+            value = entry.get(field)
+            if not value:
+                continue
+            counts = {}
+            for word in tokenize(value):
+                counts[word] = counts.get(word, 0) + 1
+            for word, count in counts.items():
+                docs, tfs = self._get_postings((field, word), create=True)
+                docs.append(doc)
+                tfs.append(count)
+        year = entry_year(entry)
+        self._years.append(NO_YEAR if year is None else year)
+
+    def update(self, entries):
+        """Add entries to the index"""
+        for entry in entries:
+            self.add(entry)
+
+    def entry(self, doc):
+        """Return entry with the given number"""
+        chunk = doc // DOC_CHUNK
+        if isinstance(self._chunks[chunk], tuple):
+            self._load_chunk(chunk)
+        return self._chunks[chunk][doc % DOC_CHUNK]
+
+    def search(self, query, limit=None):
+        """Return list of (score, entry) matching query, best first
+
+        Entries with equal scores are in the order they were added.
+        Raises ValueError if a year range cannot be parsed."""
+        words = []
+        years = None
+        for term in query.split():
+            field, sep, text = term.partition(":")
+            if field == "year":
+                years = self._parse_year_range(text)
+                continue
+            if field not in self.fields:
+                field, text = None, term
+            for word in tokenize(text):
+                words.append((field, word))
+        if not words and years is None:
+            return []
+        # Rarest words first, so later ones only need to be looked up for
+        # the few entries matching so far.
+        words.sort(key=lambda w: self._frequency(*w))
+        scores = None
+        for field, word in words:
+            word_scores = self._word_scores(field, word, scores)
+            if scores is None:
+                scores = word_scores
+            else:
+                scores = {doc: score + word_scores[doc]
+                          for doc, score in scores.items()
+                          if doc in word_scores}
+            if not scores:
+                return []
+        if years is not None:
+            low, high = years
+            years = self._years
+            if scores is None:
+                scores = dict.fromkeys(
+                    (doc for doc, year in enumerate(years)
+                     if year != NO_YEAR and low <= year <= high), 0.0)
+            else:
+                scores = {doc: score for doc, score in scores.items()
+                          if years[doc] != NO_YEAR
+                          and low <= years[doc] <= high}
+        key = lambda item: (-item[1], item[0])
+        if limit is None:
+            ranked = sorted(scores.items(), key=key)
+        else:
+            ranked = heapq.nsmallest(limit, scores.items(), key=key)
+        return [(score, self.entry(doc)) for doc, score in ranked]
+
+    def _parse_year_range(self, text):
+        """Return (low, high) years from "2005", "2005..2010", "..2010" etc."""
+        match = YEAR_RANGE_RE.match(text)
+        if match is None or not (match.group(1) or match.group(2)):
+            raise ValueError("Bad year range: {}".format(text))
+        low, high = match.group(1), match.group(2)
+        if match.group(2) is None:
+            # Single year
+            high = low
+        low = int(low) if low else -math.inf
+        high = int(high) if high else math.inf
+        return low, high
+
+    def _frequency(self, field, word):
+        """Return number of entries word occurs in, counted per field"""
+        fields = [field] if field else self.fields
+        total = 0
+        for field in fields:
+            postings = self._get_postings((field, word))
+            if postings is not None:
+                total += len(postings[0])
+        return total
+
+    def _word_scores(self, field, word, candidates=None):
+        """Return dictionary of entry number -> score for word
+
+        If field is None, scores are summed over all indexed fields. If
+        candidates is not None, only entries in it are scored."""
+        fields = [field] if field else self.fields
+        scores = {}
+        for field in fields:
+            postings = self._get_postings((field, word))
+            if postings is None:
+                continue
+            docs, tfs = postings
+            idf = math.log(1 + (self._count - len(docs) + 0.5)
+                           / (len(docs) + 0.5))
+            weight = self.fields[field] * idf * (K1 + 1)
+            if candidates is not None and len(candidates) < len(docs) // 8:
+                # Entry numbers are in order, so look up candidates
+                pairs = []
+                for doc in candidates:
+                    i = bisect.bisect_left(docs, doc)
+                    if i < len(docs) and docs[i] == doc:
+                        pairs.append((doc, tfs[i]))
+            else:
+                pairs = zip(docs, tfs)
+            for doc, tf in pairs:
+                scores[doc] = scores.get(doc, 0.0) + weight * tf / (tf + K1)
+        return scores
+
+    def _get_postings(self, term, create=False):
+        """Return postings for term, loading them if needed
+
+        If there are none, returns None, or creates them if create."""
+        postings = self._postings.get(term)
+        if postings is not None:
+            return postings
+        location = self._stored.pop(term, None)
+        if location is not None:
+            offset, length = location
+            docs = array.array("I")
+            docs.frombytes(self._map[offset:offset + length // 2])
+            tfs = array.array("I")
+            tfs.frombytes(self._map[offset + length // 2:offset + length])
+            postings = self._postings[term] = (docs, tfs)
+        elif create:
+            postings = self._postings[term] = (array.array("I"),
+                                               array.array("I"))
+        return postings
+
+    def _load_chunk(self, chunk):
+        """Load entries in chunk from file"""
+        self._chunks[chunk] = [
+            self._entry_class(fields)
+            for fields in datafile.read_json(self._map, self._chunks[chunk])]
+
+    def save(self, filename):
+        """Write index to filename, as a data file (see pybib.datafile)
+
+        Entries are saved as their fields, so are loaded as instances of
+        the entry class given to load()."""
+        def write(writer):
+            header = {
+                "fields": self.fields,
+                "count": self._count,
+                "years": writer.write(self._years),
+                "terms": {},
+                "chunks": [],
+            }
+            for i in range(len(self._chunks)):
+                if isinstance(self._chunks[i], tuple):
+                    self._load_chunk(i)
+                header["chunks"].append(writer.write_json(
+                    [dict(entry.items()) for entry in self._chunks[i]]))
+            for term in list(self._postings) + list(self._stored):
+                docs, tfs = self._get_postings(term)
+                field, word = term
+                header["terms"].setdefault(field, {})[word] = \
+                    writer.write(docs + tfs)
+            return header
+        datafile.save(filename, MAGIC, write)
+
+    @classmethod
+    def load(cls, filename, entry_class=Entry):
+        """Return index from filename written by save()
+
+        The file is memory mapped and postings and entries are only read
+        when needed, so it should not be changed while in use. Entries
+        are instances of entry_class. Loading runs nothing from the
+        file, so it may come from anywhere."""
+        header, data = datafile.load(filename, MAGIC, "search index")
+        index = cls(fields=header["fields"])
+        index._map = data
+        index._entry_class = entry_class
+        index._count = header["count"]
+        offset, length = header["years"]
+        index._years.frombytes(data[offset:offset + length])
+        index._stored = {(field, word): tuple(location)
+                         for field, words in header["terms"].items()
+                         for word, location in words.items()}
+        index._chunks = [tuple(location) for location in header["chunks"]]
+        return index
@@ -0,0 +1,175 @@
+"""RenderService: render templates on request from an in-memory bibliography
+
+A RenderService keeps the parsed bibliography and compiled templates
+between requests, parsing again only bib files that have changed (see
+IncrementalBib) and compiling again only templates that have changed
+(see Renderer). make_server() serves it over HTTP, on a TCP port or a
+Unix socket, with a thread per request:
+
+    GET /pubs.html.mako?project=TeraGrid&year=2012
+
+renders pubs.html.mako, found in the template directories, with the
+entries selected by the query, as Bib.where() does.
+"""
+
+import http.server
+import io
+import mimetypes
+import os
+import os.path
+import socketserver
+import stat
+import threading
+import time
+import urllib.parse
+
+class TemplateNotFound(Exception):
+    """Requested template is not in any template directory"""
+    pass
+
+class RenderService(object):
+    """Render templates with entries from bibliography files on demand
+
+    incremental is an IncrementalBib and renderer a Renderer. Templates
+    are named relative to one of template_dirs, and can't be outside
+    them. Bib files are checked for changes at most every interval
+    seconds. Methods may be called from multiple threads."""
+
+    def __init__(self, incremental, renderer, template_dirs, interval=1.0):
+        self.incremental = incremental
+        self.renderer = renderer
+        self.template_dirs = [os.path.realpath(d) for d in template_dirs]
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._checked = time.monotonic()
+
+    def bib(self):
+        """Return bibliography, parsing again any files that have changed
+
+        If parsing fails, the exception is raised and the last
+        bibliography is kept, to be returned until it succeeds."""
+        with self._lock:
+            now = time.monotonic()
+            if now - self._checked >= self.interval:
+                self._checked = now
+                self.incremental.refresh()
+            return self.incremental.bib
+
+    def template_filename(self, name):
+        """Return filename of template name, raising TemplateNotFound"""
+        for directory in self.template_dirs:
+            filename = os.path.realpath(os.path.join(directory, name))
+            if os.path.commonpath([directory, filename]) != directory:
+                continue
+            if os.path.isfile(filename):
+                return filename
+        raise TemplateNotFound(name)
+
+    def render(self, name, criteria=None):
+        """Return template name rendered with entries matching criteria"""
+        filename = self.template_filename(name)
+        # A copy, as templates may sort entries
+        entries = self.bib().where(**(criteria or {}))
+        output = io.StringIO()
+        self.renderer.render(filename, output, entries=entries)
+        return output.getvalue()
+
+class RenderRequestHandler(http.server.BaseHTTPRequestHandler):
+    """Handle GET requests for rendered templates
+
+    The path names the template and each query parameter selects entries
+    by the value of a field."""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        url = urllib.parse.urlsplit(self.path)
+        name = urllib.parse.unquote(url.path).lstrip("/")
+        criteria = {}
+        for field, values in urllib.parse.parse_qs(
+                url.query, keep_blank_values=True).items():
+            if len(values) > 1:
+                self.send_text(400, "{} given more than once\n".format(field))
+                return
+            criteria[field] = values[0]
+        service = self.server.service
+        try:
+            body = service.render(name, criteria)
+        except TemplateNotFound:
+            self.send_text(404, "No template {}\n".format(name))
+            return
+        except Exception as e:
+            import mako.exceptions
+            self.log_error("Error rendering %s: %s\n%s", name, e,
+                           mako.exceptions.text_error_template().render())
+            self.send_text(500, "Error rendering {}: {}\n".format(name, e))
+            return
+        content_type, _ = mimetypes.guess_type(
+            name[:-len(".mako")] if name.endswith(".mako") else name)
+        self.send_text(200, body, content_type or "text/plain")
+
+    def send_text(self, code, text, content_type="text/plain"):
+        """Send response with text as body"""
+        body = text.encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type",
+                         "{}; charset=utf-8".format(content_type))
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def address_string(self):
+        # Clients of Unix sockets have no address
+        return self.client_address[0] if self.client_address else "-"
+
+    def log_message(self, format, *args):
+        output = self.server.output
+        if output is not None:
+            output.info("%s %s", self.address_string(), format % args)
+
+    def log_error(self, format, *args):
+        output = self.server.output
+        if output is not None:
+            output.error("%s %s", self.address_string(), format % args)
+
+class RenderHTTPServer(http.server.ThreadingHTTPServer):
+    """HTTP server handling each request in a thread"""
+
+    daemon_threads = True
+
+    def __init__(self, address, service, output=None):
+        self.service = service
+        # logging.Logger for requests and errors, or None
+        self.output = output
+        super().__init__(address, RenderRequestHandler)
+
+class RenderUnixServer(socketserver.ThreadingUnixStreamServer):
+    """HTTP server on a Unix socket, handling each request in a thread"""
+
+    daemon_threads = True
+
+    def __init__(self, path, service, output=None):
+        self.service = service
+        self.output = output
+        # Remove socket left by a server that has stopped
+        try:
+            if stat.S_ISSOCK(os.stat(path).st_mode):
+                os.remove(path)
+        except FileNotFoundError:
+            pass
+        super().__init__(path, RenderRequestHandler)
+
+    def server_close(self):
+        super().server_close()
+        try:
+            os.remove(self.server_address)
+        except OSError:
+            pass
+
+def make_server(address, service, output=None):
+    """Return server for service at address
+
+    address is a (host, port) tuple or, to use a Unix socket, its path."""
+    if isinstance(address, str):
+        return RenderUnixServer(address, service, output)
+    return RenderHTTPServer(address, service, output)
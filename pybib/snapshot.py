@@ -0,0 +1,251 @@
+"""Snapshots: cache entries parsed from bibliography files
+
+A snapshot is stored in the user's cache directory (see snapshot_dir()).
+It records the size, modification time and hash of each source file, and
+is used in place of parsing as long as they still match. The entries are
+stored as rows against a shared table of field names and are unpickled
+straight from a memory map of the file.
+
+As unpickling can run arbitrary code, each snapshot is authenticated
+with an HMAC keyed by a secret kept in the cache directory, which is
+checked before anything is unpickled, and the directory is not used if
+anyone else could write to it.
+
+The scripts that keep the whole bibliography in memory use snapshots if
+the PYBIB_SNAPSHOTS environment variable is "1".
+"""
+
+import hashlib
+import hmac
+import mmap
+import os
+import os.path
+import pickle
+import stat
+import struct
+import tempfile
+
+MAGIC = b"pyBib snapshot 3\n"
+# HMAC of everything following it
+MAC_LENGTH = hashlib.sha256().digest_size
+# Length of header following MAC
+HEADER_LENGTH = struct.Struct("<Q")
+
+KEY_FILENAME = "key"
+KEY_LENGTH = 32
+
+def snapshots_enabled():
+    """Should the scripts use snapshots?"""
+    return os.environ.get("PYBIB_SNAPSHOTS", "0") == "1"
+
+def snapshot_dir():
+    """Return directory to keep snapshots in, None if it can't be used
+
+    The directory is created, only accessible by the user, if needed. It
+    is not used if it belongs to someone else or others can write to
+    it."""
+    cache_home = os.environ.get("XDG_CACHE_HOME",
+                                os.path.expanduser("~/.cache"))
+    directory = os.path.join(cache_home, "pyBib", "snapshots")
+    try:
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        st = os.stat(directory)
+    except OSError:
+        return None
+    if (hasattr(os, "getuid") and st.st_uid != os.getuid()) \
+       or st.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+        return None
+    return directory
+
+def snapshot_key(directory):
+    """Return secret key for authenticating snapshots in directory
+
+    It is created, only readable by the user, if needed. Returns None if
+    it can't be read or created."""
+    path = os.path.join(directory, KEY_FILENAME)
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        pass
+    except OSError:
+        return None
+    else:
+        with os.fdopen(fd, "wb") as f:
+            f.write(os.urandom(KEY_LENGTH))
+    try:
+        with open(path, "rb") as f:
+            key = f.read()
+    except OSError:
+        return None
+    # Another process may be part way through creating it
+    return key if len(key) == KEY_LENGTH else None
+
+def file_hash(filename):
+    """Return SHA1 hash of file's contents"""
+    digest = hashlib.sha1()
+    with open(filename, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class Snapshot(object):
+    """Snapshot of entries parsed from filenames
+
+    kind distinguishes snapshots of the same files made by different
+    parsers. The snapshot is kept in directory, by default snapshot_dir(),
+    and authenticated with key, by default snapshot_key(directory). If
+    there is no usable directory or key, path is None and snapshots are
+    neither loaded nor saved."""
+
+    def __init__(self, filenames, kind, directory=None, key=None):
+        self.filenames = [os.path.abspath(f) for f in filenames]
+        if directory is None:
+            directory = snapshot_dir()
+        if key is None and directory is not None:
+            key = snapshot_key(directory)
+        self.key = key
+        self.path = None
+        if directory is not None and key is not None:
+            name = hashlib.sha1(
+                "\0".join([kind] + self.filenames).encode()).hexdigest()
+            self.path = os.path.join(directory, name + ".snapshot")
+
+    def stat_sources(self):
+        """Return list of (size, mtime) of sources, None for missing ones"""
+        stats = []
+        for filename in self.filenames:
+            try:
+                st = os.stat(filename)
+            except OSError:
+                stats.append(None)
+            else:
+                stats.append((st.st_size, st.st_mtime_ns))
+        return stats
+
+    def load(self, entry_class):
+        """Return list of entries from snapshot, None if it is not valid"""
+        if self.path is None:
+            return None
+        try:
+            f = open(self.path, "rb")
+        except OSError:
+            return None
+        try:
+            with f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                view = memoryview(data)
+                try:
+                    if view[:len(MAGIC)] != MAGIC:
+                        return None
+                    # Nothing is unpickled unless we wrote it
+                    mac_end = len(MAGIC) + MAC_LENGTH
+                    mac = hmac.new(self.key, view[mac_end:], "sha256")
+                    if not hmac.compare_digest(mac.digest(),
+                                               view[len(MAGIC):mac_end]):
+                        return None
+                    start = mac_end + HEADER_LENGTH.size
+                    length, = HEADER_LENGTH.unpack(view[mac_end:start])
+                    sources = pickle.loads(view[start:start + length])
+                    if not self._valid(sources):
+                        return None
+                    fields, rows = pickle.loads(view[start + length:])
+                finally:
+                    view.release()
+        except (ValueError, EOFError, struct.error, pickle.UnpicklingError):
+            # Empty or corrupt snapshot
+            return None
+        names = fields.__getitem__
+        return [entry_class(zip(map(names, row[0::2]), row[1::2]))
+                for row in rows]
+
+    def _valid(self, sources):
+        """Are the sources recorded in a snapshot unchanged?"""
+        if len(sources) != len(self.filenames):
+            return False
+        for filename, stat, source in zip(self.filenames,
+                                          self.stat_sources(), sources):
+            if stat is None or source is None:
+                if stat != source:
+                    return False
+            elif stat != source[0]:
+                # Modified (or just touched), check contents
+                if stat[0] != source[0][0] or file_hash(filename) != source[1]:
+                    return False
+        return True
+
+    def save(self, rows, fields, stats):
+        """Write snapshot of entries
+
+        rows and fields are from a Recorder. stats are from stat_sources()
+        before the sources were parsed. The snapshot is not written if
+        sources have changed since then or it cannot be written."""
+        if self.path is None:
+            return
+        sources = []
+        for filename, stat in zip(self.filenames, stats):
+            sources.append(None if stat is None
+                           else (stat, file_hash(filename)))
+        if self.stat_sources() != stats:
+            return
+        header = pickle.dumps(sources, pickle.HIGHEST_PROTOCOL)
+        body = pickle.dumps((fields, rows), pickle.HIGHEST_PROTOCOL)
+        mac = hmac.new(self.key, HEADER_LENGTH.pack(len(header)), "sha256")
+        mac.update(header)
+        mac.update(body)
+        try:
+            fd, tmp_path = tempfile.mkstemp(
+                dir=os.path.dirname(self.path))
+        except OSError:
+            return
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(MAGIC)
+                f.write(mac.digest())
+                f.write(HEADER_LENGTH.pack(len(header)))
+                f.write(header)
+                f.write(body)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            os.remove(tmp_path)
+
+class Recorder(object):
+    """Record entries as rows for a snapshot"""
+
+    def __init__(self):
+        self.fields = []
+        self.positions = {}
+        self.rows = []
+
+    def record(self, entry):
+        """Record entry as a row of alternating field positions and values"""
+        row = []
+        for name, value in entry.items():
+            position = self.positions.get(name)
+            if position is None:
+                position = self.positions[name] = len(self.fields)
+                self.fields.append(name)
+            row.append(position)
+            row.append(value)
+        self.rows.append(tuple(row))
+
+def iter_snapshot(filenames, kind, entry_class, iter_entries):
+    """Generate entries from a snapshot of filenames if valid
+
+    Otherwise, generate them with iter_entries(filenames) and, if they
+    are all consumed, save a snapshot of them."""
+    if not filenames:
+        return
+    snapshot = Snapshot(filenames, kind)
+    if snapshot.path is None:
+        yield from iter_entries(filenames)
+        return
+    entries = snapshot.load(entry_class)
+    if entries is not None:
+        yield from entries
+        return
+    stats = snapshot.stat_sources()
+    recorder = Recorder()
+    for entry in iter_entries(filenames):
+        # Record now, before whoever we yield to changes the entry
+        recorder.record(entry)
+        yield entry
+    snapshot.save(recorder.rows, recorder.fields, stats)
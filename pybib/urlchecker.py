@@ -0,0 +1,226 @@
+"""URLChecker: check URLs concurrently"""
+
+import collections
+import concurrent.futures
+import json
+import os
+import tempfile
+import threading
+import time
+import urllib.parse
+
+import requests
+import requests.adapters
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def normalize_url(url):
+    """Return url normalized for use as a cache key
+
+    The scheme and host are lower cased, default ports and the fragment
+    removed and an empty path made "/". A url that can't be parsed, e.g.
+    with a bad port, is returned as it is, to fail when checked."""
+    try:
+        parts = urllib.parse.urlsplit(url)
+        port = parts.port
+    except ValueError:
+        return url
+    scheme = parts.scheme.lower()
+    netloc = parts.netloc.lower()
+    if port is not None and port == DEFAULT_PORTS.get(scheme):
+        netloc = netloc.rsplit(":", 1)[0]
+    return urllib.parse.urlunsplit(
+        (scheme, netloc, parts.path or "/", parts.query, ""))
+
+
+class URLCache(object):
+    """On-disk cache of good URL check results
+
+    Results are stored as JSON in filename, keyed by normalized URL,
+    with the ETag and Last-Modified headers of the response and when the
+    URL was checked. Results younger than ttl seconds are fresh and may
+    be used without checking the URL again. Older ones may be
+    revalidated with a conditional request. Only good results are
+    cached, so bad URLs are always checked again.
+    """
+
+    def __init__(self, filename, ttl=7*24*60*60):
+        self.filename = filename
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        # A missing, unreadable or corrupt cache is treated as empty and
+        # replaced when saved
+        try:
+            with open(filename) as f:
+                self.results = json.load(f)
+        except (OSError, ValueError):
+            self.results = {}
+        if not isinstance(self.results, dict):
+            self.results = {}
+
+    def get(self, url):
+        """Return (fresh, result) for url, result being None if none"""
+        result = self.results.get(normalize_url(url))
+        if result is None:
+            return False, None
+        return time.time() - result["checked"] < self.ttl, result
+
+    def set(self, url, response):
+        """Record good response for url"""
+        result = {
+            "status": response.status_code,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "checked": time.time(),
+        }
+        with self._lock:
+            self.results[normalize_url(url)] = result
+
+    def refresh(self, url):
+        """Mark result for url as checked now"""
+        with self._lock:
+            self.results[normalize_url(url)]["checked"] = time.time()
+
+    def remove(self, url):
+        """Remove any result for url"""
+        with self._lock:
+            self.results.pop(normalize_url(url), None)
+
+    def save(self):
+        """Write cache back to its file"""
+        directory = os.path.dirname(os.path.abspath(self.filename))
+        with self._lock:
+            # Write to a temporary file and rename so an interrupted
+            # save doesn't lose the cache.
+            fd, tmp = tempfile.mkstemp(dir=directory)
+            with os.fdopen(fd, "w") as f:
+                json.dump(self.results, f)
+            os.replace(tmp, self.filename)
+
+
+class URLChecker(object):
+    """Check URLs from a pool of worker threads
+
+    Connections are reused through a single requests.Session, with at
+    most per_host requests to any one host at a time. Each URL is first
+    checked with a HEAD request and, if that fails or doesn't return 200
+    (some servers don't handle HEAD properly), with a GET that only reads
+    the response headers. Requests that fail outright (connection
+    errors, timeouts) are retried up to retries times.
+
+    If a URLCache is given, fresh good results from it are used without
+    any request and stale ones are revalidated with conditional requests.
+    """
+
+    def __init__(self, workers=16, per_host=4, timeout=10, retries=2,
+                 verify=False, cache=None):
+        """Create URL checker
+
+        timeout is in seconds. If verify is False, https certificates are
+        not checked. cache is a URLCache instance."""
+        self.cache = cache
+        self.workers = workers
+        self.per_host = per_host
+        self.timeout = timeout
+        self.retries = retries
+        self.verify = verify
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=workers,
+                                                pool_maxsize=per_host)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._host_semaphores = {}
+        self._lock = threading.Lock()
+
+    def _host_semaphore(self, url):
+        """Return semaphore limiting concurrent requests to url's host"""
+        host = urllib.parse.urlparse(url).netloc.lower()
+        with self._lock:
+            semaphore = self._host_semaphores.get(host)
+            if semaphore is None:
+                semaphore = threading.BoundedSemaphore(self.per_host)
+                self._host_semaphores[host] = semaphore
+        return semaphore
+
+    def _request(self, method, url, **kwargs):
+        """Make request, retrying on failure, and return response"""
+        for attempt in range(self.retries + 1):
+            try:
+                response = self.session.request(method, url,
+                                                timeout=self.timeout,
+                                                verify=self.verify,
+                                                allow_redirects=True,
+                                                **kwargs)
+                # Don't download the body
+                response.close()
+                return response
+            except requests.RequestException:
+                if attempt == self.retries:
+                    raise
+
+    def check(self, url):
+        """Check url and return (good, status)
+
+        status is the HTTP status code, or a description of the error
+        if the request failed. Errors are not raised, so that one URL,
+        e.g. one that can't be parsed, doesn't stop others being
+        checked."""
+        try:
+            return self._check(url)
+        except Exception as ex:
+            return False, str(ex)
+
+    def _check(self, url):
+        """Check url and return (good, status), raising any unexpected
+        errors"""
+        headers = {}
+        result = None
+        if self.cache is not None:
+            fresh, result = self.cache.get(url)
+            if fresh:
+                return True, result["status"]
+            if result:
+                if result["etag"]:
+                    headers["If-None-Match"] = result["etag"]
+                if result["last_modified"]:
+                    headers["If-Modified-Since"] = result["last_modified"]
+        with self._host_semaphore(url):
+            try:
+                response = self._request("HEAD", url, headers=headers)
+            except requests.RequestException:
+                # Some servers time out or drop the connection on HEAD
+                response = None
+            if response is None or response.status_code not in (200, 304):
+                try:
+                    response = self._request("GET", url, headers=headers,
+                                             stream=True)
+                except requests.RequestException as ex:
+                    return False, str(ex)
+        if response.status_code == 304 and result:
+            # Not modified since it was last checked and found good
+            self.cache.refresh(url)
+            return True, result["status"]
+        good = response.status_code == 200
+        if self.cache is not None:
+            if good:
+                self.cache.set(url, response)
+            else:
+                self.cache.remove(url)
+        return good, response.status_code
+
+    def check_all(self, urls):
+        """Check urls concurrently, yielding (url, good, status) tuples
+
+        Results are yielded in the same order as urls, which may be any
+        iterable and is consumed only a little ahead of the results."""
+        with concurrent.futures.ThreadPoolExecutor(self.workers) as executor:
+            pending = collections.deque()
+            for url in urls:
+                pending.append((url, executor.submit(self.check, url)))
+                if len(pending) >= self.workers * 4:
+                    url, future = pending.popleft()
+                    yield (url,) + future.result()
+            while pending:
+                url, future = pending.popleft()
+                yield (url,) + future.result()
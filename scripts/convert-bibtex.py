@@ -1,9 +1,17 @@
 #!/usr/bin/env python
-"""Convert a bibtex file to a pyBib file"""
+"""Convert a bibtex file to a pyBib file
 
+With --reverse, convert pyBib files to bibtex instead. BibTeX entries
+are written as they are parsed, so inputs may be of any size. pyBib
+files are parsed whole, so entries with the same key are merged into
+one, as pyBib does elsewhere, rather than repeating the key."""
+
+import argparse
 import sys
 
+from pybib import BibParser
 from pybib import BibTexParser
+from pybib import BibTexWriter
 from pybib import BibWriter
 
 def main(argv=None):
@@ -12,11 +20,30 @@ def main(argv=None):
     if argv is None:
         argv = sys.argv
 
-    parser = BibTexParser()
-    bib = parser.parse_bib(argv[1:])
+    # Argument parsing
+    parser = argparse.ArgumentParser(
+        description=__doc__,  # printed with -h/--help
+        # Don't mess with format of description
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("-r", "--reverse",
+                        action="store_true", default=False,
+                        help="convert pyBib files to bibtex")
+    parser.add_argument('bibs', metavar='args', type=str, nargs='+',
+                        help='files to convert')
+    args = parser.parse_args(argv[1:])
+
+    if args.reverse:
+        # Duplicate sections have to be merged, which needs them all
+        BibTexWriter().write(BibParser().parse_bib(args.bibs), sys.stdout)
+        return 0
 
-    writer = BibWriter()
-    writer.write(bib, sys.stdout)
+    # Entries are written out as they are parsed, so memory use doesn't
+    # grow with the input. Snapshots aren't used, as making one would
+    # mean keeping every entry.
+    entries = BibTexParser().iter_entries(args.bibs)
+    BibWriter().write_iter(entries, sys.stdout)
+    return 0
 
 if __name__ == "__main__":
     sys.exit(main())
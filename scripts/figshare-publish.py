@@ -7,14 +7,32 @@
 #
 #       [default]
 #       token = xxxxxxxxxxxxxxxxxxxxxxxxxxxxxxx
+#
+# With --batch, publishes entries from a pyBib conf file instead of a
+# single article given on the commandline. Entries that don't already
+# have a "doi" are published (only those given with --key, if any),
+# using their title, description (or abstract), type, project,
+# keywords and file fields, and the reserved DOIs are added to the file.
+# The id of each article is added as "figshare_id" as soon as it is
+# created, so if publishing an entry fails, running again carries on
+# with the same article, rather than creating another.
 
 
 import argparse
+import concurrent.futures
 import configparser
+import os
 import os.path
+import re
 import sys
+import threading
 
+from pybib import BibParser
 from pybib import Figshare
+from pybib.atomic import atomic_write
+from pybib.figshare import UPLOAD_STATE_SUFFIX
+
+SECTION_RE = re.compile(r"\s*\[(.+)\]")
 
 
 def make_parser():
@@ -54,17 +72,46 @@ def make_parser():
                                help="Set project to 'SWIP'")
     parser.add_argument("--file", metavar="filename", type=str, help="Upload file")
     parser.add_argument("--keyword", metavar="keyword", type=str, help="Add keyword")
-    parser.add_argument("title", metavar="title", type=str, help="Title")
-    parser.add_argument("description", metavar="description", type=str, help="Description")
+    batch_group = parser.add_argument_group("batch mode")
+    batch_group.add_argument("--batch", metavar="filename", type=str,
+                             help="Publish entries from pyBib conf file")
+    batch_group.add_argument("--key", metavar="key", action="append",
+                             help="Only publish entry with this key")
+    batch_group.add_argument("-j", "--jobs", metavar="N", type=int, default=4,
+                             help="Publish N entries at once (default 4)")
+    batch_group.add_argument("--rate", metavar="N", type=float, default=5,
+                             help="Make at most N API requests a second, " \
+                             "not counting file uploads (default 5)")
+    parser.add_argument("title", metavar="title", type=str, nargs="?", help="Title")
+    parser.add_argument("description", metavar="description", type=str, nargs="?", help="Description")
     return parser
 
 
 def make_article(args):
     """Return an article as a dictionary."""
+    return make_article_fields(args.title, args.description, args.type,
+                               args.project,
+                               [args.keyword] if args.keyword else [])
+
+
+def make_entry_article(entry):
+    """Return an article for given Entry as a dictionary."""
+    projects = entry.project.split(",") if entry.project else []
+    keywords = entry.keywords.split(",") if entry.keywords else []
+    return make_article_fields(
+        entry.title,
+        entry.description or entry.abstract or entry.title,
+        entry.type or "paper",
+        [project.strip().lower() for project in projects],
+        [keyword.strip() for keyword in keywords])
+
+
+def make_article_fields(title, description, type, projects, keywords):
+    """Return an article with the given fields as a dictionary."""
     article_fields = {
-        "title" : args.title,
-        "description" : args.description,
-        "defined_type" : args.type,
+        "title" : title,
+        "description" : description,
+        "defined_type" : type,
         "funding" : [ ],  # Will convert to string later
         "license" : 1,  # CC BY 4.0
         # 'tags' is an alias for 'keywords'
@@ -74,8 +121,8 @@ def make_article(args):
             77 # Applied Computer Science
         ]
     }
-    if args.project:
-        for project in args.project:
+    if projects:
+        for project in projects:
             if project == "trustedci":
                 article_fields["funding"].append("NSF 1920430")
                 article_fields["tags"].append("trustedci")
@@ -93,20 +140,109 @@ def make_article(args):
     else:
         # Required field, so must have something
         article_fields["funding"] = "None"
-    if args.keyword:
-        article_fields["tags"].extend(args.keyword)
+    if keywords:
+        article_fields["tags"].extend(keywords)
     # A keyword is required for publishing
     if len(article_fields["tags"]) == 0:
         article_fields["tags"].append("iucacr")
     return article_fields
 
 
+def publish_entry(api, entry, directory, record):
+    """Create article for entry, upload its file and return reserved DOI.
+
+    A relative file path is relative to directory. The id of a new
+    article is passed to record(key, field, value) as "figshare_id". If
+    entry already has one, that article is used instead, and its file is
+    only uploaded if the article doesn't have it or the upload was not
+    finished."""
+    id = entry.figshare_id
+    if id:
+        reused = True
+    else:
+        location = api.create_article(make_entry_article(entry))
+        id = location.rsplit('/', 1)[-1]
+        record(entry.key, "figshare_id", id)
+        reused = False
+    if entry.file:
+        path = os.path.join(directory, entry.file)
+        if not (reused and has_file(api, id, path)):
+            api.upload_new_file(id, path)
+    return api.reserve_doi(id)
+
+
+def has_file(api, id, path):
+    """Has article id finished uploading the file at path?"""
+    if os.path.exists(path + UPLOAD_STATE_SUFFIX):
+        # Upload not finished, upload_new_file() resumes it
+        return False
+    name = os.path.basename(path)
+    size = os.path.getsize(path)
+    return any(f.get("name") == name and f.get("size") == size
+               for f in api.list_files(id))
+
+
+def add_fields(filename, fields):
+    """Add fields to entries in pyBib conf file in a single pass.
+
+    fields is a dictionary mapping entry keys to dictionaries of field
+    names and values."""
+    with open(filename) as input, atomic_write(filename) as output:
+        for line in input:
+            output.write(line)
+            match = SECTION_RE.match(line)
+            if match and match.group(1) in fields:
+                for name, value in fields.pop(match.group(1)).items():
+                    output.write("{}: {}\n".format(name, value))
+
+
+def batch_publish(api, args):
+    """Publish entries in args.batch concurrently, returning exit status"""
+    bib = BibParser().parse_bib([args.batch])
+    entries = [entry for entry in bib
+               if not entry.doi and (not args.key or entry.key in args.key)]
+    directory = os.path.dirname(args.batch)
+    # Fields are added as soon as they are known, so an interruption
+    # doesn't lose them, from all threads.
+    lock = threading.Lock()
+    def record(key, field, value):
+        with lock:
+            add_fields(args.batch, {key: {field: value}})
+    status = 0
+    with concurrent.futures.ThreadPoolExecutor(args.jobs) as executor:
+        futures = dict((executor.submit(publish_entry, api, entry, directory,
+                                        record),
+                        entry.key)
+                       for entry in entries)
+        for future in concurrent.futures.as_completed(futures):
+            key = futures[future]
+            try:
+                doi = future.result()
+            except Exception as ex:
+                print("{}: Error publishing: {}".format(key, ex))
+                if args.debug:
+                    raise(ex)
+                status = 1
+                continue
+            record(key, "doi", doi)
+            print("{}: {}".format(key, doi))
+    return(status)
+
+
 def main(argv=None):
     parser = make_parser()
     args = parser.parse_args(argv if argv else sys.argv[1:])
+    if not args.batch and (args.title is None or args.description is None):
+        parser.error("title and description are required without --batch")
 
     config = configparser.ConfigParser()
     config.read([os.path.expanduser('~/.figshare.conf')])
+    if args.batch:
+        # One session shared by all threads, with a connection for each
+        # thread (and the threads each uses to upload files).
+        api = Figshare(config.get("default", "token"), rate=args.rate,
+                       connections=args.jobs * 4)
+        return batch_publish(api, args)
     api = Figshare(config.get("default", "token"))
     article = make_article(args)
     try:
@@ -5,18 +5,32 @@ import argparse
 import sys
 import urllib.parse
 
-import requests
-
 from pybib import BibParser
+from pybib import URLCache
+from pybib import URLChecker
 
 ######################################################################
 
 
-def check_url(url):
-    response = requests.get(url,
-                            verify=False  # Ignore https certificates
-                            )
-    return response.status_code == 200
+def entry_urls(entries, hostname=None):
+    """Generate the URL of each entry that has one
+
+    URLs missing a scheme get 'http' and those missing a host get
+    hostname, if given, else are reported and skipped."""
+    for entry in entries:
+        if "url" in list(entry.keys()):
+            # Use list() here since returned tuple is immutable
+            urlparts = list(urllib.parse.urlparse(entry["url"]))
+            if urlparts[0] == '':
+                urlparts[0] = 'http'
+            if urlparts[1] == '':
+                if hostname:
+                    urlparts[1] = hostname
+                else:
+                    print("{}: URL has no hostname " \
+                        "and none given on commandline.".format(entry["key"]))
+                    continue
+            yield urllib.parse.urlunparse(urlparts)
 
 ######################################################################
 
@@ -39,6 +53,32 @@ def main(argv=None):
                         dest="hostname", default=None,
                         help="Specify hostname for URL if missing",
                         metavar="HOSTNAME")
+    parser.add_argument("-c", "--cache",
+                        default=None,
+                        help="cache good results in FILE",
+                        metavar="FILE")
+    parser.add_argument("--cache-ttl",
+                        type=float, default=7,
+                        help="days before cached results are checked " \
+                        "again (default 7)",
+                        metavar="DAYS")
+    parser.add_argument("-j", "--jobs",
+                        type=int, default=16,
+                        help="number of URLs to check at once (default 16)",
+                        metavar="N")
+    parser.add_argument("--per-host",
+                        type=int, default=4,
+                        help="number of URLs to check at once on any " \
+                        "one host (default 4)",
+                        metavar="N")
+    parser.add_argument("--timeout",
+                        type=float, default=10,
+                        help="seconds to wait for a response (default 10)",
+                        metavar="SECONDS")
+    parser.add_argument("--retries",
+                        type=int, default=2,
+                        help="times to retry failed requests (default 2)",
+                        metavar="N")
     parser.add_argument("-v", "--verbose",
                         action='store_const', dest='verbose',
                         const=True, default=False,
@@ -46,29 +86,31 @@ def main(argv=None):
     parser.add_argument('bibs', metavar='file', type=str, nargs='+',
                         help='bib files to use')
     args = parser.parse_args()
+    # Entries are only needed once, so check them as they are parsed,
+    # without the snapshot that would mean keeping them all
     bib_parser = BibParser()
-    entries = bib_parser.parse_bib(args.bibs)
+    entries = bib_parser.iter_entries(args.bibs)
+    cache = URLCache(args.cache, args.cache_ttl*24*60*60) \
+        if args.cache else None
+    checker = URLChecker(workers=args.jobs,
+                         per_host=args.per_host,
+                         timeout=args.timeout,
+                         retries=args.retries,
+                         verify=False,  # Ignore https certificates
+                         cache=cache)
     status = 0
-    for entry in entries:
-        if "url" in list(entry.keys()):
-            # Use list() here since returned tuple is immutable
-            urlparts = list(urllib.parse.urlparse(entry["url"]))
-            if urlparts[0] == '':
-                urlparts[0] = 'http'
-            if urlparts[1] == '':
-                if args.hostname:
-                    urlparts[1] = args.hostname
-                else:
-                    print("{}: URL has no hostname " \
-                        "and none given on commandline.".format(entry["key"]))
-                    continue
-            url = urllib.parse.urlunparse(urlparts)
-            if check_url(url):
+    try:
+        for url, good, url_status in checker.check_all(
+                entry_urls(entries, args.hostname)):
+            if good:
                 if args.verbose:
                     print("{} ... GOOD".format(url))
             else:
-                print("{} ... BAD".format(url))
+                print("{} ... BAD ({})".format(url, url_status))
                 status = 1
+    finally:
+        if cache:
+            cache.save()
     return(status)
 
 if __name__ == "__main__":
@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+"""Find duplicate entries in pyBib bibliography
+
+Each cluster of duplicates is reported by the keys of its entries. With
+--merge, the bibliography is written to stdout with each cluster merged
+into one entry."""
+
+import argparse
+import sys
+
+from pybib import BibParser
+from pybib import BibWriter
+from pybib import Deduplicator
+from pybib.dedup import longest
+from pybib.snapshot import snapshots_enabled
+
+def main(argv=None):
+    # Do argv default this way, as doing it in the functional
+    # declaration sets it at compile time.
+    if argv is None:
+        argv = sys.argv
+
+    # Argument parsing
+    parser = argparse.ArgumentParser(
+        description=__doc__,  # printed with -h/--help
+        # Don't mess with format of description
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("-f", "--fuzzy",
+                        action="store_true", default=False,
+                        help="also compare titles of entries with the " \
+                        "same authors and year")
+    parser.add_argument("--threshold",
+                        type=float, default=0.9,
+                        help="title similarity, from 0 to 1, of fuzzy " \
+                        "duplicates (default %(default)s)")
+    parser.add_argument("-m", "--merge",
+                        action="store_true", default=False,
+                        help="write merged bibliography to stdout")
+    parser.add_argument("--longest",
+                        action="append", default=[],
+                        help="when merging, keep the longest value of " \
+                        "FIELD rather than the first",
+                        metavar="FIELD")
+    parser.add_argument('bibs', metavar='args', type=str, nargs='+',
+                        help='bib files to use')
+    args = parser.parse_args()
+
+    bib = BibParser(snapshots=snapshots_enabled()).parse_bib(args.bibs)
+    dedup = Deduplicator(fuzzy=args.fuzzy, threshold=args.threshold,
+                         precedence={field: longest
+                                     for field in args.longest})
+    clusters = dedup.clusters(bib)
+    # Report goes to stderr when the merged bibliography goes to stdout
+    report = sys.stderr if args.merge else sys.stdout
+    for cluster in clusters:
+        print(" ".join(entry["key"] for entry in cluster), file=report)
+    print("{} entries, {} clusters of duplicates".format(
+        len(bib), len(clusters)), file=report)
+    if args.merge:
+        BibWriter().write(dedup.dedup(bib, clusters), sys.stdout)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
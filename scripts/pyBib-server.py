@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+"""Serve templates rendered from a bibliography kept in memory
+
+The bib files are parsed once and templates compiled when first used,
+rather than for each page as with pyBib.py. Changed bib files are parsed
+again and changed templates compiled again when next requested. Pages
+are requested over HTTP by template name, with any query parameters
+selecting entries as Bib.where() does:
+
+    curl 'http://localhost:8000/pubs.mako?project=TeraGrid'
+    curl --unix-socket /tmp/pybib.sock 'http://localhost/pubs.mako'
+
+Templates are looked up in the --template_path directories.
+"""
+
+import argparse
+import logging
+import os
+import sys
+
+from pybib import BibParser
+from pybib import IncrementalBib
+from pybib import Renderer
+from pybib.renderer import default_cache_dir
+from pybib.server import RenderService
+from pybib.server import make_server
+from pybib.snapshot import snapshots_enabled
+
+def parse_address(address):
+    """Return (host, port) from "[HOST:]PORT" """
+    host, _, port = address.rpartition(":")
+    return (host or "localhost", int(port))
+
+def main(argv=None):
+    # Do argv default this way, as doing it in the functional
+    # declaration sets it at compile time.
+    if argv is None:
+        argv = sys.argv
+
+    # Set up out output via logging module
+    output = logging.getLogger(argv[0])
+    output.setLevel(logging.DEBUG)
+    output_handler = logging.StreamHandler() # Default is sys.stderr
+    # Set up formatter to just print message without preamble
+    output_handler.setFormatter(logging.Formatter("%(message)s"))
+    output.addHandler(output_handler)
+
+    # Argument parsing
+    parser = argparse.ArgumentParser(
+        description=__doc__, # printed with -h/--help
+        # Don't mess with format of description
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    verbosity_group = parser.add_mutually_exclusive_group()
+    verbosity_group.add_argument("-d", "--debug",
+                                 action='store_const', const=logging.DEBUG,
+                                 dest="output_level", default=logging.INFO,
+                                 help="print debugging")
+    verbosity_group.add_argument("-q", "--quiet",
+                                 action="store_const", const=logging.WARNING,
+                                 dest="output_level",
+                                 help="run quietly, not logging requests")
+    address_group = parser.add_mutually_exclusive_group()
+    address_group.add_argument("-l", "--listen",
+                               default="localhost:8000",
+                               help="listen on [HOST:]PORT " \
+                               "(default %(default)s)", metavar="ADDRESS")
+    address_group.add_argument("-u", "--socket",
+                               help="listen on Unix socket PATH instead",
+                               metavar="PATH")
+    parser.add_argument("-T", "--template_path",
+                        action='append', required=True,
+                        help="serve templates in PATH", metavar="PATH")
+    cache_group = parser.add_mutually_exclusive_group()
+    cache_group.add_argument("--cache-dir",
+                             default=default_cache_dir(),
+                             help="cache compiled templates in DIR " \
+                             "(default %(default)s)", metavar="DIR")
+    cache_group.add_argument("--no-cache",
+                             action="store_const", const=None,
+                             dest="cache_dir",
+                             help="don't cache compiled templates")
+    parser.add_argument("--interval",
+                        type=float, default=1.0,
+                        help="check bib files for changes at most every " \
+                        "SECONDS (default %(default)s)", metavar="SECONDS")
+    parser.add_argument('bibs', metavar='args', type=str, nargs='+',
+                        help='bib files to use')
+    args = parser.parse_args(argv[1:])
+    output_handler.setLevel(args.output_level)
+
+    if args.socket:
+        address = args.socket
+    else:
+        try:
+            address = parse_address(args.listen)
+        except ValueError:
+            parser.error("bad address {}".format(args.listen))
+
+    cache_dir = args.cache_dir
+    if cache_dir is not None:
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+        except OSError as e:
+            output.warning("Not caching compiled templates: {}".format(e))
+            cache_dir = None
+
+    output.info("Parsing bib files")
+    try:
+        incremental = IncrementalBib(BibParser(snapshots=snapshots_enabled()),
+                                     args.bibs)
+    except Exception as e:
+        output.error("Error parsing bibliography files")
+        output.error(str(e))
+        return 1
+    renderer = Renderer(args.template_path, cache_dir)
+    service = RenderService(incremental, renderer, args.template_path,
+                            args.interval)
+
+    try:
+        server = make_server(address, service, output)
+    except OSError as e:
+        output.error("Can't listen on {}: {}".format(
+            args.socket or args.listen, e))
+        return 1
+    output.info("Serving {} entries on {}".format(
+        len(incremental.bib), args.socket or args.listen))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
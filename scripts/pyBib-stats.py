@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+"""Count entries in pyBib bibliography
+
+Counts entries by the values of the --by fields, e.g. per project per
+year with "--by project --by year". Each author of an entry is counted
+for "author". --select counts only entries with a field value, as
+Bib.where() selects them.
+
+The bibliography can be saved in a columnar form with --save and
+counted from that with --columns, which is much faster to load than
+parsing the bib files.
+"""
+
+import argparse
+import sys
+
+from pybib import BibParser
+from pybib import Columns
+from pybib.snapshot import snapshots_enabled
+
+def sort_key(item):
+    """Sort counts by values, missing values last"""
+    values, count = item
+    if not isinstance(values, tuple):
+        values = (values,)
+    # Values of a field are all strings or all integers, besides None
+    return [(value is None, 0 if value is None else value)
+            for value in values]
+
+def main(argv=None):
+    # Do argv default this way, as doing it in the functional
+    # declaration sets it at compile time.
+    if argv is None:
+        argv = sys.argv
+
+    # Argument parsing
+    parser = argparse.ArgumentParser(
+        description=__doc__,  # printed with -h/--help
+        # Don't mess with format of description
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("-b", "--by",
+                        action="append", default=[],
+                        help="count by values of FIELD (default year)",
+                        metavar="FIELD")
+    parser.add_argument("-s", "--select",
+                        action="append", default=[],
+                        help="only count entries with FIELD=VALUE",
+                        metavar="FIELD=VALUE")
+    parser.add_argument("-c", "--columns",
+                        help="count bibliography saved in FILE with " \
+                        "--save rather than parsing bib files",
+                        metavar="FILE")
+    parser.add_argument("--save",
+                        help="save bibliography in columnar form to FILE",
+                        metavar="FILE")
+    parser.add_argument('bibs', metavar='args', type=str, nargs='*',
+                        help='bib files to use')
+    args = parser.parse_args(argv[1:])
+    if bool(args.columns) == bool(args.bibs):
+        parser.error("give either bib files or --columns")
+    criteria = {}
+    for selection in args.select:
+        field, sep, value = selection.partition("=")
+        if not sep:
+            parser.error("bad --select {}".format(selection))
+        criteria[field] = value
+
+    if args.columns:
+        columns = Columns.load(args.columns)
+    else:
+        bib = BibParser(snapshots=snapshots_enabled()).parse_bib(args.bibs)
+        columns = Columns.from_entries(bib)
+    if args.save:
+        columns.save(args.save)
+
+    fields = args.by or ["year"]
+    try:
+        counts = columns.count(*fields, **criteria)
+    except KeyError as e:
+        parser.error("no column for field {}, only {}".format(
+            e, ", ".join(columns.fields)))
+    except ValueError as e:
+        parser.error(str(e))
+    for values, count in sorted(counts.items(), key=sort_key):
+        if not isinstance(values, tuple):
+            values = (values,)
+        print("\t".join("" if value is None else str(value)
+                        for value in values) + "\t{}".format(count))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,19 +1,172 @@
 #!/usr/bin/env python
-"""Bibliography handler"""
+"""Bibliography handler
+
+With --manifest, the bibliography is parsed once and used to render each
+job in the manifest, a conf file with a section for each job:
+
+    [publications]
+    template: pubs.mako
+    output: html/pubs.html
+    # Any other options select entries, as Bib.where() does
+    project: TeraGrid
+
+Relative paths are relative to the manifest. Jobs may be rendered in
+parallel with --jobs.
+
+With --watch, outputs are rendered again whenever the bib files or
+templates change. Only changed bib files are parsed again and only jobs
+whose template changed or which select changed entries are rendered.
+"""
 
 import argparse
-import datetime
 import configparser
 import logging
-import re
-import string
+import os
+import os.path
 import sys
+import time
 
-import mako
-from mako.template import Template
-from mako.lookup import TemplateLookup
+# Mako, and multiprocessing for --jobs, are imported when needed, to
+# start quickly when they're not.
 
 from pybib import BibParser
+from pybib import filter_cache_info
+from pybib import IncrementalBib
+from pybib.bib import entry_matches
+from pybib import Renderer
+from pybib.atomic import atomic_write
+from pybib.instrument import Profiler
+from pybib.instrument import profile_filename
+from pybib.renderer import default_cache_dir
+from pybib.snapshot import snapshots_enabled
+
+def render(renderer, template, fileobject, substitutions):
+    """Render template to fileobject as it is generated"""
+    renderer.render(template, fileobject, **substitutions)
+    # Output used to be print()ed, so keep its trailing newline
+    fileobject.write("\n")
+
+def render_to_file(renderer, template, filename, substitutions):
+    """Render template to filename"""
+    # Render to a temporary file and rename, so an error doesn't
+    # leave a partial output file behind.
+    with atomic_write(filename, encoding="utf-8") as f:
+        render(renderer, template, f, substitutions)
+
+def read_manifest(filename):
+    """Return list of (template, output, criteria) jobs from manifest"""
+    directory = os.path.dirname(filename)
+    config = configparser.RawConfigParser()
+    with open(filename) as f:
+        config.read_file(f)
+    jobs = []
+    for section in config.sections():
+        criteria = dict(config.items(section))
+        try:
+            template = criteria.pop("template")
+            output = criteria.pop("output")
+        except KeyError as e:
+            raise ValueError("{}: [{}]: {} missing".format(
+                filename, section, e))
+        jobs.append((os.path.join(directory, template),
+                     os.path.join(directory, output),
+                     criteria))
+    return jobs
+
+# Bibliography and Renderer used by render_job(), set by init_jobs()
+job_entries = None
+job_renderer = None
+
+def init_jobs(entries, template_path, cache_dir):
+    """Set up for rendering jobs in this process"""
+    global job_entries, job_renderer
+    job_entries = entries
+    # Keep any existing Renderer, and the templates it has compiled
+    if job_renderer is None or (job_renderer.template_path,
+                                job_renderer.cache_dir) != (template_path,
+                                                            cache_dir):
+        job_renderer = Renderer(template_path, cache_dir)
+
+def render_job(job):
+    """Render a manifest job, returning None or an error message"""
+    template, output, criteria = job
+    try:
+        entries = job_entries.where(**criteria)
+        render_to_file(job_renderer, template, output, {"entries": entries})
+    except Exception as e:
+        import mako.exceptions
+        return "{}\n{}".format(
+            e, mako.exceptions.text_error_template().render())
+    return None
+
+def render_jobs(jobs, entries, template_path, cache_dir, processes=1,
+                start_method=None):
+    """Render jobs, yielding (job, error) as each is done.
+
+    error is None if job was rendered successfully. If processes is more
+    than one, jobs are rendered by a pool of that many processes, started
+    with the multiprocessing start_method, by default "fork" where
+    available."""
+    if processes <= 1:
+        init_jobs(entries, template_path, cache_dir)
+        for job in jobs:
+            yield job, render_job(job)
+        return
+    import concurrent.futures
+    import multiprocessing
+    # Where possible, fork so workers inherit entries rather than
+    # having them pickled.
+    if start_method is None and \
+       "fork" in multiprocessing.get_all_start_methods():
+        start_method = "fork"
+    context = multiprocessing.get_context(start_method)
+    with concurrent.futures.ProcessPoolExecutor(
+            processes, mp_context=context, initializer=init_jobs,
+            initargs=(entries, template_path, cache_dir)) as executor:
+        for job, error in zip(jobs, executor.map(render_job, jobs)):
+            yield job, error
+
+def file_mtime(filename):
+    """Return modification time of filename, None if it is missing"""
+    try:
+        return os.stat(filename).st_mtime_ns
+    except OSError:
+        return None
+
+def watch(incremental, jobs, template_path, cache_dir, processes, output,
+          interval=1.0):
+    """Render jobs again as bib files and templates change
+
+    Polls files every interval seconds until interrupted."""
+    mtimes = {job[0]: file_mtime(job[0]) for job in jobs}
+    output.info("Watching for changes")
+    while True:
+        time.sleep(interval)
+        changed_templates = set()
+        for template in mtimes:
+            mtime = file_mtime(template)
+            if mtime != mtimes[template]:
+                mtimes[template] = mtime
+                changed_templates.add(template)
+        try:
+            changed = incremental.refresh()
+        except Exception as e:
+            output.error("Error parsing bibliography files")
+            output.error(str(e))
+            continue
+        affected = [job for job in jobs
+                    if job[0] in changed_templates
+                    or any(entry_matches(e, job[2]) for e in changed)]
+        if not affected:
+            continue
+        for job, error in render_jobs(affected, incremental.bib,
+                                      template_path, cache_dir, processes):
+            if error:
+                output.error("Error rendering {} from {}".format(job[1],
+                                                                 job[0]))
+                output.error(error)
+            else:
+                output.info("Rendered {}".format(job[1]))
 
 def main(argv=None):
     # Do argv default this way, as doing it in the functional
@@ -47,52 +200,139 @@ def main(argv=None):
                                  action="store_const", const=logging.WARNING,
                                  dest="output_level",
                                  help="run quietly")
-    parser.add_argument("-t", "--template", required=True,
-                        help="template file", metavar="FILE")
+    mode_group = parser.add_mutually_exclusive_group(required=True)
+    mode_group.add_argument("-t", "--template",
+                            help="template file", metavar="FILE")
+    mode_group.add_argument("-m", "--manifest",
+                            help="render jobs listed in FILE", metavar="FILE")
+    parser.add_argument("-j", "--jobs",
+                        type=int, default=1,
+                        help="parse bib files and, with --manifest, " \
+                        "render jobs with N processes",
+                        metavar="N")
     parser.add_argument("-T", "--template_path",
                         action='append',
                         help="search PATH for templates", metavar="PATH")
+    parser.add_argument("-o", "--output",
+                        help="write output to FILE instead of stdout",
+                        metavar="FILE")
+    cache_group = parser.add_mutually_exclusive_group()
+    cache_group.add_argument("--cache-dir",
+                             default=default_cache_dir(),
+                             help="cache compiled templates in DIR " \
+                             "(default %(default)s)", metavar="DIR")
+    cache_group.add_argument("--no-cache",
+                             action="store_const", const=None,
+                             dest="cache_dir",
+                             help="don't cache compiled templates")
+    parser.add_argument("-w", "--watch",
+                        action="store_true", default=False,
+                        help="render again when files change")
+    parser.add_argument("--interval",
+                        type=float, default=1.0,
+                        help="with --watch, check for changes every " \
+                        "SECONDS (default %(default)s)", metavar="SECONDS")
+    parser.add_argument("--profile",
+                        default=profile_filename(),
+                        help="write JSON report of time spent in each " \
+                        "stage to FILE", metavar="FILE")
     parser.add_argument("--version", action="version", version="%(prog)s 1.0")
     parser.add_argument('bibs', metavar='args', type=str, nargs='+',
                         help='bib files to use')
     args = parser.parse_args()
     output_handler.setLevel(args.output_level)
+    if args.watch and args.template and not args.output:
+        parser.error("--watch requires --output or --manifest")
+
+    profiler = None
+    if args.profile:
+        profiler = Profiler()
+        profiler.install()
+    try:
+        return build(args, output)
+    finally:
+        if profiler:
+            profiler.uninstall()
+            profiler.write(args.profile)
+            output.info("Wrote profile to {}".format(args.profile))
 
-    output.info("Reading template from {}".format(args.template))
-    mylookup = TemplateLookup(directories=args.template_path,
-                              input_encoding='utf-8',
-                              output_encoding='utf-8')
-    with open(args.template) as f:
-        template_string = "".join(f.readlines())
-        template = Template(template_string,
-                            lookup=mylookup,
-                            default_filters=['decode.utf8'],
-                            input_encoding='utf-8',
-                            output_encoding='utf-8')
+def build(args, output):
+    """Parse bibliography and render templates as given by args"""
+    cache_dir = args.cache_dir
+    if cache_dir is not None:
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+        except OSError as e:
+            output.warning("Not caching compiled templates: {}".format(e))
+            cache_dir = None
+    if args.manifest:
+        output.info("Reading manifest from {}".format(args.manifest))
+        try:
+            jobs = read_manifest(args.manifest)
+        except Exception as e:
+            output.error("Error reading manifest")
+            output.error(str(e))
+            return 1
+    elif args.watch:
+        jobs = [(args.template, args.output, {})]
+    else:
+        output.info("Reading template from {}".format(args.template))
+        renderer = Renderer(args.template_path, cache_dir)
+        renderer.get_template(args.template)
 
     output.info("Parsing bib files")
     try:
-        bib_parser = BibParser()
-        entries = bib_parser.parse_bib(args.bibs)
+        bib_parser = BibParser(snapshots=snapshots_enabled())
+        if args.watch:
+            incremental = IncrementalBib(bib_parser, args.bibs)
+            entries = incremental.bib
+        else:
+            entries = bib_parser.parse_bib(args.bibs, processes=args.jobs)
     except Exception as e:
         output.error("Error parsing bibliography files")
         output.error(str(e))
         return 1
 
+    if args.manifest or args.watch:
+        status = 0
+        for job, error in render_jobs(jobs, entries, args.template_path,
+                                      cache_dir, args.jobs):
+            if error:
+                output.error("Error rendering {} from {}".format(job[1],
+                                                                 job[0]))
+                output.error(error)
+                status = 1
+            else:
+                output.debug("Rendered {}".format(job[1]))
+        if args.watch:
+            try:
+                watch(incremental, jobs, args.template_path, cache_dir,
+                      args.jobs, output, args.interval)
+            except KeyboardInterrupt:
+                pass
+        return status
+
     substitutions = {
         "entries" : entries,
     }
 
     try:
-        # Mako doesn't seem to be rendering into utf-8
-        # hance decode() here
-        print(template.render(**substitutions).decode())
+        if args.output:
+            render_to_file(renderer, args.template, args.output,
+                           substitutions)
+        else:
+            render(renderer, args.template, sys.stdout, substitutions)
     except Exception as e:
         output.error("Error filling in template")
         output.error(str(e))
+        import mako.exceptions
         output.error(mako.exceptions.text_error_template().render())
         return 1
 
+    for name, info in filter_cache_info().items():
+        output.debug("{}: {} cache hits, {} misses".format(
+            name, info.hits, info.misses))
+
     return(0)
 
 if __name__ == "__main__":
@@ -12,6 +12,9 @@ setup(
         'scripts/figshare-publish.py',
         'scripts/pyBib.py',
         'scripts/pyBib-check-urls.py',
+        'scripts/pyBib-dedup.py',
+        'scripts/pyBib-server.py',
+        'scripts/pyBib-stats.py',
         ],
     install_requires=[
         'mako >= 0.7.0', # May work with earlier version
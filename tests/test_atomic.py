@@ -0,0 +1,44 @@
+"""Tests of pybib.atomic"""
+
+import os
+import stat
+
+import pytest
+
+from pybib.atomic import atomic_write
+
+@pytest.fixture
+def umask():
+    old = os.umask(0o022)
+    yield 0o022
+    os.umask(old)
+
+def mode(path):
+    return stat.S_IMODE(os.stat(str(path)).st_mode)
+
+def test_new_file_gets_umask_mode(tmp_path, umask):
+    path = tmp_path / "out.html"
+    with atomic_write(str(path)) as f:
+        f.write("new")
+    assert path.read_text() == "new"
+    assert mode(path) == 0o644
+    assert os.listdir(str(tmp_path)) == ["out.html"]
+
+def test_existing_file_keeps_mode(tmp_path, umask):
+    path = tmp_path / "papers.conf"
+    path.write_text("old")
+    os.chmod(str(path), 0o640)
+    with atomic_write(str(path)) as f:
+        f.write("new")
+    assert path.read_text() == "new"
+    assert mode(path) == 0o640
+
+def test_error_leaves_file(tmp_path, umask):
+    path = tmp_path / "out.html"
+    path.write_text("old")
+    with pytest.raises(ValueError):
+        with atomic_write(str(path)) as f:
+            f.write("partial")
+            raise ValueError("failed")
+    assert path.read_text() == "old"
+    assert os.listdir(str(tmp_path)) == ["out.html"]
@@ -0,0 +1,72 @@
+"""Tests of pybib.bib"""
+
+import pickle
+
+from pybib import Bib
+from pybib import CompactEntry
+from pybib import Entry
+
+def make_bib(entry_class):
+    return Bib([
+        entry_class({"key": "a", "author": "Jim Basney and Von Welch",
+                     "year": "2010"}),
+        entry_class({"key": "b", "author": "Von Welch", "year": "2011"}),
+    ])
+
+def test_pickle_round_trip():
+    for entry_class in (Entry, CompactEntry):
+        bib = make_bib(entry_class)
+        # With indexes built, which aren't pickled
+        assert [e["key"] for e in bib.where(author="Von Welch")] == ["a", "b"]
+        for protocol in range(pickle.HIGHEST_PROTOCOL + 1):
+            copy = pickle.loads(pickle.dumps(bib, protocol))
+            assert type(copy) is Bib
+            assert [dict(e.items()) for e in copy] == \
+                [dict(e.items()) for e in bib]
+            assert copy.get("b")["year"] == "2011"
+            assert [e["key"] for e in copy.where(year="2010")] == ["a"]
+            copy.append(entry_class({"key": "c", "year": "2010"}))
+            assert [e["key"] for e in copy.where(year="2010")] == ["a", "c"]
+
+def keys(bib):
+    return [e["key"] for e in bib]
+
+def test_indexes_follow_changes():
+    bib = make_bib(Entry)
+    assert keys(bib.where(year="2011")) == ["b"]
+    assert bib.get("c") is None
+    # Appending and extending update built indexes
+    bib.append(Entry({"key": "c", "author": "Von Welch", "year": "2011"}))
+    bib += [Entry({"key": "d", "year": "2010"})]
+    bib.extend([Entry({"key": "e", "year": "2011"})])
+    assert bib.get("c")["year"] == "2011"
+    assert keys(bib.where(year="2011")) == ["b", "c", "e"]
+    assert keys(bib.where(author="Von Welch", year="2011")) == ["b", "c"]
+    assert bib.distinct("year") == ["2010", "2011"]
+    # Sorting and other changes rebuild them in the new order
+    bib.sort_by("key", reverse=True)
+    assert keys(bib.where(year="2011")) == ["e", "c", "b"]
+    bib.sort_by("year", "key")
+    assert keys(bib) == ["a", "d", "b", "c", "e"]
+    assert keys(bib.where(year="2010")) == ["a", "d"]
+    bib.remove(bib.get("d"))
+    assert bib.get("d") is None
+    del bib[0]
+    assert keys(bib.where(author="Von Welch")) == ["b", "c"]
+    bib[0] = Entry({"key": "f", "year": "2012"})
+    assert keys(bib.where(year="2012")) == ["f"]
+    assert bib.get("b") is None
+    bib.pop()
+    bib.insert(0, Entry({"key": "g", "year": "2011"}))
+    assert keys(bib.where(year="2011")) == ["g", "c"]
+
+def test_reindex_after_changing_entries():
+    bib = make_bib(Entry)
+    assert keys(bib.where(year="2010")) == ["a"]
+    bib[1]["year"] = "2010"
+    bib.reindex()
+    assert keys(bib.where(year="2010")) == ["a", "b"]
+    bib.normalize("year", lambda year: "'" + year[2:])
+    assert keys(bib.where(year="'10")) == ["a", "b"]
+    assert bib.where(year="2010") == []
+    assert keys(bib.where()) == ["a", "b"]
@@ -0,0 +1,84 @@
+"""Tests of pybib.bibparser"""
+
+import configparser
+import io
+
+import pytest
+
+from pybib import BibParser
+from pybib.bibparser import ConfReader
+
+def read_entries(text):
+    return list(ConfReader(io.StringIO(text)))
+
+def configparser_parse(filenames):
+    """Entries as the original ConfigParser-based BibParser parsed them"""
+    config = configparser.ConfigParser(strict=False)
+    config.read(filenames)
+    entries = []
+    for section in config.sections():
+        entry = dict(config.items(section))
+        entry["key"] = section
+        entry.setdefault("month", None)
+        entry.setdefault("howpublished", None)
+        entries.append(entry)
+    return entries
+
+def write_files(tmp_path, *texts):
+    filenames = []
+    for n, text in enumerate(texts):
+        path = tmp_path / "{}.conf".format(n)
+        path.write_text(text)
+        filenames.append(str(path))
+    return filenames
+
+DEFAULT_CASES = {
+    "after section": [
+        "[a]\ntitle: A\n[DEFAULT]\nproject: TeraGrid\n[b]\ntitle: B\n"],
+    "in earlier file": [
+        "[DEFAULT]\nproject: TeraGrid\n[a]\ntitle: A\n",
+        "[b]\ntitle: B\n"],
+    "in later file": [
+        "[a]\ntitle: A\n", "[DEFAULT]\nproject: TeraGrid\n"],
+    "overridden": [
+        "[DEFAULT]\nproject: TeraGrid\ntype: paper\n[a]\ntitle: A\n",
+        "[DEFAULT]\nproject: XSEDE\n[b]\ntitle: B\nproject: CTSC\n"],
+    "referenced before defined": [
+        "[a]\ntitle: %(project)s paper\n",
+        "[DEFAULT]\nproject: TeraGrid\n"],
+    "duplicate sections": [
+        "[a]\ntitle: A\nproject: CTSC\n",
+        "[DEFAULT]\nproject: TeraGrid\n[a]\nnote: Again\n"],
+}
+
+@pytest.mark.parametrize("texts", DEFAULT_CASES.values(),
+                         ids=list(DEFAULT_CASES))
+def test_defaults_as_configparser(tmp_path, texts):
+    filenames = write_files(tmp_path, *texts)
+    expected = configparser_parse(filenames)
+    for processes in (1, 2):
+        bib = BibParser().parse_bib(filenames, processes=processes)
+        assert [dict(entry) for entry in bib] == expected
+
+def test_iter_entries_applies_later_defaults(tmp_path):
+    filenames = write_files(tmp_path, *DEFAULT_CASES["after section"])
+    entries = list(BibParser().iter_entries(filenames))
+    assert [(e["key"], e["project"]) for e in entries] == \
+        [("a", "TeraGrid"), ("b", "TeraGrid")]
+
+def test_reference_to_field_with_escaped_percent():
+    text = "[paper]\npct: 100%% pure\ntitle: %(pct)s and more\n"
+    config = configparser.ConfigParser()
+    config.read_string(text)
+    entry, = read_entries(text)
+    assert entry["title"] == config.get("paper", "title") == \
+        "100% pure and more"
+    assert entry["pct"] == config.get("paper", "pct") == "100% pure"
+
+def test_reference_to_earlier_and_later_fields():
+    text = ("[DEFAULT]\nproject: TeraGrid\n"
+            "[paper]\na: %(b)s-%(project)s\nb: %(c)s\nc: 50%%\n")
+    entry, = read_entries(text)
+    assert entry["a"] == "50%-TeraGrid"
+    assert entry["b"] == "50%"
+    assert entry["c"] == "50%"
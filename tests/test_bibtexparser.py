@@ -0,0 +1,26 @@
+"""Tests of pybib.bibtexparser"""
+
+import io
+
+import pytest
+
+from pybib.bibtexparser import BibTexTokenizer
+
+PAREN_RECORD = """@article(paren,
+  title = "Results (preliminary) and {more)}",
+  note = {a ) in braces},
+  year = 2010
+)
+@misc{after, title = {After}}
+"""
+
+@pytest.mark.parametrize("chunk_size", [3, 7, 64 * 1024])
+def test_paren_record_with_paren_in_quoted_value(chunk_size):
+    tokenizer = BibTexTokenizer(io.StringIO(PAREN_RECORD),
+                                chunk_size=chunk_size)
+    entries = list(tokenizer)
+    assert [e["key"] for e in entries] == ["paren", "after"]
+    assert entries[0]["title"] == "Results (preliminary) and more)"
+    assert entries[0]["note"] == "a ) in braces"
+    assert entries[0]["year"] == "2010"
+    assert not tokenizer.truncated
@@ -0,0 +1,69 @@
+"""Tests of pybib.bibwriter"""
+
+import io
+import os
+import os.path
+import subprocess
+import sys
+
+import pytest
+
+from pybib import BibParser
+from pybib import BibTexWriter
+from pybib import BibWriter
+from pybib import Entry
+from pybib.bibtexparser import BibTexTokenizer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+VALUES = {
+    "unbalanced": "Unbalanced } brace",
+    "open": "{Braced} and { open",
+    "escapes": "R&D at 100% \\& 50\\%",
+    "backslashes": "C:\\temp\\{x} \\\\ends\\",
+}
+
+def entries():
+    return [Entry(dict(VALUES, key="escaped", title="Title",
+                       author="Von Welch", note="Kept")),
+            Entry({"key": "plain", "title": "Plain", "year": "2010"})]
+
+def fields(entry):
+    return {k: v for k, v in entry.items() if v is not None}
+
+@pytest.mark.parametrize("chunk_size", [3, 7, 64 * 1024])
+def test_conf_to_bibtex_and_back(tmp_path, chunk_size):
+    conf = tmp_path / "papers.conf"
+    with open(str(conf), "w") as f:
+        BibWriter().write(entries(), f)
+    bib = BibParser().parse_bib([str(conf)])
+    assert [fields(e) for e in bib] == [fields(e) for e in entries()]
+
+    bibtex = io.StringIO()
+    BibTexWriter().write(bib, bibtex)
+    # The record isn't ended early by the unbalanced bracket
+    assert "note = {Kept}" in bibtex.getvalue()
+    parsed = list(BibTexTokenizer(io.StringIO(bibtex.getvalue()),
+                                  chunk_size=chunk_size))
+    assert [fields(e) for e in parsed] == [fields(e) for e in entries()]
+
+    # And back to conf
+    back = io.StringIO()
+    BibWriter().write_iter(parsed, back)
+    conf.write_text(back.getvalue())
+    assert [fields(e) for e in BibParser().parse_bib([str(conf)])] == \
+        [fields(e) for e in entries()]
+
+def test_reverse_merges_duplicates(tmp_path):
+    conf = tmp_path / "papers.conf"
+    conf.write_text("[a]\ntitle: First\n\n[b]\ntitle: B\n\n"
+                    "[a]\nnote: Again\n")
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    result = subprocess.run(
+        [sys.executable, os.path.join(ROOT, "scripts", "convert-bibtex.py"),
+         "--reverse", str(conf)],
+        env=env, check=True, stdout=subprocess.PIPE, universal_newlines=True)
+    entries = list(BibTexTokenizer(io.StringIO(result.stdout)))
+    assert [e["key"] for e in entries] == ["a", "b"]
+    assert entries[0]["title"] == "First"
+    assert entries[0]["note"] == "Again"
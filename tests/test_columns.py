@@ -0,0 +1,72 @@
+"""Tests of pybib.columns"""
+
+import pickle
+import struct
+
+import pytest
+
+from pybib import Columns
+from pybib import Entry
+from pybib.columns import MISSING
+from pybib.columns import parse_year
+
+def test_parse_year():
+    assert parse_year("2010") == 2010
+    assert parse_year(" 2010 ") == 2010
+    for year in (None, "", "n.d.", "2_010", "-5", "99999999999", "２０１０"):
+        assert parse_year(year) == MISSING, year
+
+def test_bad_years():
+    columns = Columns.from_entries([
+        Entry({"key": "a", "year": "2010"}),
+        Entry({"key": "b", "year": "99999999999"}),
+        Entry({"key": "c", "year": "2010a"}),
+    ])
+    assert columns.count("year") == {2010: 1, None: 2}
+
+def test_entries_not_changed():
+    entries = [
+        Entry({"key": "a", "title": "No Fields"}),
+        Entry({"key": "b", "year": "2012", "project": "TeraGrid",
+               "author": "Von Welch"}),
+    ]
+    fields = [sorted(entry.keys()) for entry in entries]
+    columns = Columns.from_entries(entries)
+    assert [sorted(entry.keys()) for entry in entries] == fields
+    assert columns.value("project", 0) is None
+    assert columns.value("author", 1) == ["Von Welch"]
+
+def test_save_and_load(tmp_path):
+    columns = Columns.from_entries([
+        Entry({"key": "a", "year": "2010", "month": "March",
+               "project": "TeraGrid", "author": "Jim Basney and Von Welch"}),
+        Entry({"key": "b", "year": "2012", "project": "XSEDE",
+               "author": "Von Welch"}),
+        Entry({"key": "c", "type": "paper"}),
+    ])
+    filename = str(tmp_path / "columns")
+    columns.save(filename)
+    loaded = Columns.load(filename)
+    assert loaded.keys == ["a", "b", "c"]
+    for fields in (["year"], ["project", "year"], ["author"],
+                   ["author", "project"], ["month"], ["type"]):
+        assert loaded.count(*fields) == columns.count(*fields)
+    assert loaded.count("year", author="Von Welch") == {2010: 1, 2012: 1}
+    assert loaded.value("author", 0) == ["Jim Basney", "Von Welch"]
+
+class Exploit(object):
+    ran = False
+
+    def __reduce__(self):
+        return (setattr, (Exploit, "ran", True))
+
+def test_load_does_not_unpickle(tmp_path):
+    filename = tmp_path / "columns"
+    Columns.from_entries([Entry({"key": "a"})]).save(str(filename))
+    data = filename.read_bytes()
+    header = pickle.dumps({"keys": Exploit()})
+    filename.write_bytes(data[:-8] + header +
+                         struct.pack("<Q", len(data) - 8))
+    with pytest.raises(ValueError):
+        Columns.load(str(filename))
+    assert not Exploit.ran
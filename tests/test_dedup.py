@@ -0,0 +1,78 @@
+"""Tests of pybib.dedup"""
+
+from pybib import Bib
+from pybib import Deduplicator
+from pybib import Entry
+from pybib.dedup import longest
+
+def make_bib():
+    return Bib([
+        Entry({"key": "a", "title": "Grid Security", "year": "2010",
+               "doi": "10.1000/ABC"}),
+        Entry({"key": "b", "title": "Unrelated", "year": "2010",
+               "url": "http://www.example.com/paper/"}),
+        Entry({"key": "c", "title": "Grid security!", "year": "2010",
+               "doi": "https://doi.org/10.1000/abc",
+               "pages": "1-10"}),
+        Entry({"key": "d", "title": "Also Unrelated", "year": "2011",
+               "url": "https://example.com/paper"}),
+        # Same title as a, but a different year
+        Entry({"key": "e", "title": "Grid Security", "year": "2012"}),
+        # Same title and year as a, ignoring case
+        Entry({"key": "f", "title": "GRID SECURITY", "year": "2010",
+               "pages": "1--10, extended"}),
+    ])
+
+def keys(clusters):
+    return [[e["key"] for e in cluster] for cluster in clusters]
+
+def test_clusters():
+    bib = make_bib()
+    assert keys(Deduplicator().clusters(bib)) == [["a", "c", "f"],
+                                                  ["b", "d"]]
+    assert keys(Deduplicator(keys=[]).clusters(bib)) == []
+
+def test_fuzzy_clusters():
+    bib = Bib([
+        Entry({"key": "a", "author": "Von Welch and Jim Basney",
+               "title": "Security for Grids", "year": "2005"}),
+        Entry({"key": "b", "author": "Jim Basney and Von Welch",
+               "title": "Security for Grid", "year": "2005"}),
+        Entry({"key": "c", "author": "Jim Basney and Von Welch",
+               "title": "Something Else Entirely", "year": "2005"}),
+        Entry({"key": "d", "author": "Von Welch",
+               "title": "Security for Grids.", "year": "2005"}),
+    ])
+    assert keys(Deduplicator().clusters(bib)) == [["a", "d"]]
+    assert keys(Deduplicator(fuzzy=True).clusters(bib)) == [["a", "b", "d"]]
+    assert keys(Deduplicator(fuzzy=True, threshold=1).clusters(bib)) == \
+        [["a", "d"]]
+
+def test_merge_precedence():
+    bib = make_bib()
+    a, c, f = Deduplicator().clusters(bib)[0]
+    # First entry having a field wins by default
+    merged = Deduplicator().merge([a, c, f])
+    assert merged["key"] == "a"
+    assert merged["title"] == "Grid Security"
+    assert merged["doi"] == "10.1000/ABC"
+    assert merged["pages"] == "1-10"
+    # rank orders entries by preference, but the key is kept
+    merged = Deduplicator(rank=lambda e: e["key"] != "f").merge([a, c, f])
+    assert merged["key"] == "a"
+    assert merged["title"] == "GRID SECURITY"
+    assert merged["pages"] == "1--10, extended"
+    assert merged["doi"] == "10.1000/ABC"
+    merged = Deduplicator(precedence={"title": longest}).merge([a, c, f])
+    assert merged["title"] == "Grid security!"
+    assert merged["pages"] == "1-10"
+
+def test_dedup():
+    bib = make_bib()
+    deduped = Deduplicator().dedup(bib)
+    assert [e["key"] for e in deduped] == ["a", "b", "e"]
+    assert deduped.get("a")["pages"] == "1-10"
+    assert deduped.get("b")["url"] == "http://www.example.com/paper/"
+    # The original is unchanged
+    assert len(bib) == 6
+    assert "pages" not in bib.get("a")
@@ -0,0 +1,79 @@
+"""Tests of pybib.entry"""
+
+import pytest
+
+from pybib import CompactEntry
+from pybib import Entry
+
+def test_authors_does_not_add_field():
+    for entry_class in (Entry, CompactEntry):
+        entry = entry_class({"key": "a", "title": "No Authors"})
+        assert entry.authors() == ()
+        assert "author" not in entry
+        assert sorted(entry.keys()) == ["key", "title"]
+
+def test_authors():
+    entry = Entry({"author": "Basney, Jim and Von Welch"})
+    assert [p.name for p in entry.authors()] == ["Jim Basney", "Von Welch"]
+
+def test_no_instance_dict():
+    # The date key cache is a slot, not in a __dict__ of every entry
+    entry = Entry({"key": "a", "year": "2010", "month": "March"})
+    with pytest.raises(AttributeError):
+        object.__getattribute__(entry, "__dict__")
+    assert entry.date_key() == 2010 * 12 + 2
+    entry["month"] = "May"
+    assert entry.date_key() == 2010 * 12 + 4
+
+def test_compact_entry():
+    entry = CompactEntry({"key": "a", "title": "Grid Security",
+                          "year": "2010"})
+    assert entry["title"] == entry.title == "Grid Security"
+    # Missing fields are None, and not added
+    assert entry["no_such_field"] is None
+    assert entry.no_such_field is None
+    assert "no_such_field" not in entry
+    assert len(entry) == 3
+    assert dict(entry) == {"key": "a", "title": "Grid Security",
+                           "year": "2010"}
+    assert entry.get("month", "none") == "none"
+    # None is a value, unlike a missing field
+    entry["note"] = None
+    assert "note" in entry
+    assert entry.get("note", "none") is None
+    assert entry.setdefault("month", "March") == "March"
+    assert entry.setdefault("month", "May") == "March"
+    assert entry.date_key() == 2010 * 12 + 2
+    assert entry.pop("month") == "March"
+    assert entry.pop("month", "none") == "none"
+    with pytest.raises(KeyError):
+        entry.pop("month")
+    with pytest.raises(KeyError):
+        del entry["month"]
+    assert entry.date_key() == 2010 * 12
+    del entry["note"]
+    assert sorted(entry) == ["key", "title", "year"]
+    with pytest.raises(AttributeError):
+        entry._private
+
+def test_compact_entry_copy_and_equality():
+    entry = CompactEntry({"key": "a", "year": "2010"})
+    copy = entry.copy()
+    assert type(copy) is CompactEntry
+    copy["year"] = "2011"
+    assert entry["year"] == "2010"
+    assert entry == CompactEntry({"year": "2010", "key": "a"})
+    assert entry == {"key": "a", "year": "2010"}
+    assert entry != copy
+    assert eval(repr(entry)) == entry
+
+def test_compact_entry_shares_field_names():
+    a = CompactEntry({"key": "a", "title": "A"})
+    b = CompactEntry({"title": "B", "key": "b"})
+    assert list(a) == list(b)
+    assert a.fields is b.fields
+    names = a.fields.names
+    assert names[a.fields.position("title")] is \
+        names[b.fields.position("title")]
+    with pytest.raises(AttributeError):
+        object.__getattribute__(a, "__dict__")
@@ -0,0 +1,233 @@
+"""Tests of pybib.figshare against a mock Figshare server"""
+
+import argparse
+import http.server
+import importlib.util
+import json
+import os
+import os.path
+import stat
+import threading
+import time
+
+import pytest
+
+from pybib import Figshare
+from pybib.figshare import UPLOAD_STATE_SUFFIX
+
+PART_SIZE = 3
+
+def load_script():
+    """Return scripts/figshare-publish.py as a module"""
+    filename = os.path.join(os.path.dirname(os.path.dirname(
+        os.path.abspath(__file__))), "scripts", "figshare-publish.py")
+    spec = importlib.util.spec_from_file_location("figshare_publish",
+                                                  filename)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+class MockFigshareHandler(http.server.BaseHTTPRequestHandler):
+    """Just enough of the Figshare API to upload a file in parts
+
+    Files are uploaded to /files/<article id>, so an article can only
+    have one being uploaded at a time."""
+
+    def do_POST(self):
+        server = self.server
+        body = self.read_body()
+        if self.path.startswith("/account/articles?"):
+            with server.lock:
+                server.articles += 1
+                article_id = server.articles
+            self.send_json(201, {"location": "{}/account/articles/{}".format(
+                server.url, article_id)})
+        elif "/reserve_doi" in self.path:
+            article_id = int(self.path.split("/")[3])
+            if article_id in server.failing_dois:
+                self.send_json(500, {"message": "Can't reserve DOI"})
+            else:
+                self.send_json(200, {"doi": "10.1234/{}".format(article_id)})
+        elif self.path.split("?")[0].endswith("/files"):
+            article_id = int(self.path.split("/")[3])
+            with server.lock:
+                server.uploads += 1
+                server.pending[article_id] = json.loads(body.decode())
+            self.send_json(201, {"location": "{}/files/{}".format(
+                server.url, article_id)})
+        elif self.path.startswith("/files/"):
+            article_id = int(self.path.split("?")[0].split("/")[2])
+            with server.lock:
+                server.files.setdefault(article_id, []).append(
+                    server.pending.pop(article_id))
+            self.send_json(202, {})
+        else:
+            self.send_json(404, {"message": "Not found"})
+
+    def do_GET(self):
+        server = self.server
+        if self.path.split("?")[0].endswith("/files"):
+            article_id = int(self.path.split("/")[3])
+            self.send_json(200, [dict(f, status="available") for f in
+                                 server.files.get(article_id, [])])
+        elif self.path.startswith("/files/"):
+            self.send_json(200, {"upload_url": server.url + "/upload"})
+        elif self.path.startswith("/upload"):
+            parts = [{"partNo": n + 1,
+                      "startOffset": start,
+                      "endOffset": min(start + PART_SIZE, server.size) - 1,
+                      "status": "PENDING"}
+                     for n, start in enumerate(range(0, server.size,
+                                                     PART_SIZE))]
+            self.send_json(200, {"parts": parts})
+        else:
+            self.send_json(404, {"message": "Not found"})
+
+    def do_PUT(self):
+        server = self.server
+        part = int(self.path.split("?")[0].rsplit("/", 1)[-1])
+        data = self.read_body()
+        with server.lock:
+            server.puts.append(part)
+        if part in server.failing:
+            self.send_json(500, {"message": "Failed"})
+            return
+        with server.lock:
+            server.parts[part] = data
+        self.send_json(200, {})
+
+    def read_body(self):
+        return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+    def send_json(self, code, data):
+        body = json.dumps(data).encode()
+        self.send_response(code)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+@pytest.fixture
+def server(monkeypatch):
+    monkeypatch.setenv("NO_PROXY", "127.0.0.1")
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0),
+                                             MockFigshareHandler)
+    server.daemon_threads = True
+    server.url = "http://127.0.0.1:{}".format(server.server_address[1])
+    server.lock = threading.Lock()
+    server.uploads = 0
+    server.puts = []
+    server.parts = {}
+    server.pending = {}
+    server.files = {}
+    server.failing = set()
+    server.articles = 0
+    server.failing_dois = set()
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,),
+                              daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def test_upload_failure_resume_and_reassembly(server, tmp_path):
+    data = b"0123456789abcd"
+    filename = tmp_path / "paper.pdf"
+    filename.write_bytes(data)
+    server.size = len(data)
+    state_path = str(filename) + UPLOAD_STATE_SUFFIX
+    api = Figshare("token", url=server.url)
+
+    # Part 2 fails, after which the rest are still uploaded
+    server.failing = {2}
+    with pytest.raises(Exception, match="part 2"):
+        api.upload_new_file(1, str(filename), workers=1, retries=0)
+    assert sorted(server.puts) == [1, 2, 3, 4, 5]
+    with open(state_path) as f:
+        assert sorted(json.load(f)["completed"]) == [1, 3, 4, 5]
+
+    # Resuming only uploads the missing part, with the same upload
+    server.failing = set()
+    server.puts = []
+    location = api.upload_new_file(1, str(filename), workers=2, retries=0)
+    assert location == server.url + "/files/1"
+    assert server.puts == [2]
+    assert server.uploads == 1
+    assert not os.path.exists(state_path)
+    assert b"".join(server.parts[n] for n in sorted(server.parts)) == data
+
+def test_rate_limits_api_requests_only(server, tmp_path):
+    data = b"x" * (PART_SIZE * 8)
+    filename = tmp_path / "paper.pdf"
+    filename.write_bytes(data)
+    server.size = len(data)
+    api = Figshare("token", url=server.url, rate=10)
+    start = time.monotonic()
+    for _ in range(4):
+        api.create_article({"title": "Title"})
+    # The first request isn't delayed
+    assert time.monotonic() - start >= 0.3
+    # Only starting the upload is an API request, not the 8 parts
+    api = Figshare("token", url=server.url, rate=2)
+    start = time.monotonic()
+    api.upload_new_file(1, str(filename), resume=False)
+    assert time.monotonic() - start < 0.5
+    assert len(server.parts) == 8
+
+def test_batch_writes_each_doi_as_reserved(server, tmp_path):
+    script = load_script()
+    batch = tmp_path / "papers.conf"
+    batch.write_text("[first]\ntitle: First\n\n[second]\ntitle: Second\n")
+    os.chmod(str(batch), 0o644)
+    # Publishing the second fails as if interrupted
+    server.failing_dois = {2}
+    args = argparse.Namespace(batch=str(batch), key=None, jobs=1, debug=True)
+    api = Figshare("token", url=server.url)
+    with pytest.raises(Exception, match="reserve DOI"):
+        script.batch_publish(api, args)
+    assert batch.read_text() == (
+        "[first]\ndoi: 10.1234/1\nfigshare_id: 1\ntitle: First\n\n"
+        "[second]\nfigshare_id: 2\ntitle: Second\n")
+    assert stat.S_IMODE(os.stat(str(batch)).st_mode) == 0o644
+
+    # The second's article is reused rather than another created
+    server.failing_dois = set()
+    args.debug = False
+    assert script.batch_publish(api, args) == 0
+    assert "[second]\ndoi: 10.1234/2\nfigshare_id: 2\n" in batch.read_text()
+    assert server.articles == 2
+
+def test_batch_resumes_upload_in_same_article(server, tmp_path):
+    script = load_script()
+    data = b"0123456789abcd"
+    (tmp_path / "paper.pdf").write_bytes(data)
+    server.size = len(data)
+    batch = tmp_path / "papers.conf"
+    batch.write_text("[paper]\ntitle: Paper\nfile: paper.pdf\n")
+    args = argparse.Namespace(batch=str(batch), key=None, jobs=1, debug=False)
+    api = Figshare("token", url=server.url)
+
+    # Uploading part 2 fails
+    server.failing = {2}
+    assert script.batch_publish(api, args) == 1
+    assert "figshare_id: 1\n" in batch.read_text()
+    assert "doi" not in batch.read_text()
+
+    # Then reserving the DOI fails
+    server.failing = set()
+    server.failing_dois = {1}
+    server.puts = []
+    assert script.batch_publish(api, args) == 1
+    assert server.puts == [2]
+    assert [(f["name"], f["size"]) for f in server.files[1]] == \
+        [("paper.pdf", len(data))]
+
+    # The file isn't uploaded again
+    server.failing_dois = set()
+    assert script.batch_publish(api, args) == 0
+    assert "doi: 10.1234/1\n" in batch.read_text()
+    assert server.articles == 1
+    assert server.uploads == 1
+    assert b"".join(server.parts[n] for n in sorted(server.parts)) == data
@@ -0,0 +1,56 @@
+"""Tests of pybib.filters"""
+
+from pybib import Bib
+from pybib import Entry
+from pybib.filters import authors_filter
+from pybib.filters import cache_clear
+from pybib.filters import cache_info
+from pybib.filters import first_name_initial_filter
+from pybib.filters import month_filter
+
+def test_authors_filter():
+    assert authors_filter(None) is None
+    assert authors_filter("") == ""
+    assert authors_filter("Von Welch") == "Von Welch"
+    assert authors_filter("Jim Basney and Von Welch") == \
+        "Jim Basney and Von Welch"
+    assert authors_filter("Basney, Jim and Welch, Von and Randy Butler") == \
+        "Jim Basney, Von Welch and Randy Butler"
+
+def test_first_name_initial_filter():
+    assert first_name_initial_filter("Von Welch") == "V. Welch"
+    assert first_name_initial_filter("Ludwig van Beethoven") == \
+        "L. van Beethoven"
+    assert first_name_initial_filter("von Neumann, John") == "J. von Neumann"
+    assert first_name_initial_filter("  ") == "  "
+
+def test_month_filter():
+    assert month_filter(None) is None
+    assert month_filter("") == ""
+    for month in ("March", "march", "Mar", "MAR"):
+        assert month_filter(month) == "March"
+    assert month_filter("sep") == "September"
+    # Anything else is returned as it is
+    assert month_filter("Sept") == "Sept"
+    assert month_filter("Spring") == "Spring"
+
+def test_cache_info():
+    cache_clear()
+    for _ in range(3):
+        assert month_filter("may") == "May"
+    info = cache_info()
+    assert sorted(info) == ["authors_filter", "first_name_initial_filter",
+                            "month_filter"]
+    assert (info["month_filter"].hits, info["month_filter"].misses) == (2, 1)
+    assert info["authors_filter"].currsize == 0
+    cache_clear()
+    assert cache_info()["month_filter"].currsize == 0
+
+def test_normalize():
+    bib = Bib([Entry({"key": "a", "month": "mar"}),
+               Entry({"key": "b"}),
+               Entry({"key": "c", "month": "March"})])
+    assert [e["key"] for e in bib.where(month="March")] == ["c"]
+    bib.normalize("month", month_filter)
+    assert [e.get("month") for e in bib] == ["March", None, "March"]
+    assert [e["key"] for e in bib.where(month="March")] == ["a", "c"]
@@ -0,0 +1,92 @@
+"""Tests of pybib.incremental"""
+
+import os
+
+from pybib import BibParser
+from pybib import BibTexParser
+from pybib import IncrementalBib
+
+def write(path, text):
+    """Write text to path, making sure its modification time changes"""
+    mtime = os.stat(str(path)).st_mtime_ns if path.exists() else 0
+    path.write_text(text)
+    os.utime(str(path), ns=(mtime + 10**9, mtime + 10**9))
+
+def as_dicts(bib):
+    return [dict(entry) for entry in bib]
+
+def record_parsed(parser):
+    """Make parser record files it parses in the list returned"""
+    parsed = []
+    iter_file = parser.iter_file
+    def recording(filename, context):
+        parsed.append(os.path.basename(filename))
+        return iter_file(filename, context)
+    parser.iter_file = recording
+    return parsed
+
+def test_defaults_reach_other_files(tmp_path):
+    d1 = tmp_path / "d1.conf"
+    d2 = tmp_path / "d2.conf"
+    write(d1, "[DEFAULT]\nproject: TeraGrid\n[a]\ntitle: A\n")
+    write(d2, "[b]\ntitle: B\n")
+    filenames = [str(d1), str(d2)]
+    parser = BibParser()
+    incremental = IncrementalBib(parser, filenames)
+    assert as_dicts(incremental.bib) == as_dicts(parser.parse_bib(filenames))
+    assert incremental.bib.get("b")["project"] == "TeraGrid"
+
+    parsed = record_parsed(parser)
+    assert incremental.refresh() == []
+    assert parsed == []
+
+    # Only d1 changed, but its DEFAULT values apply to d2 too
+    write(d1, "[DEFAULT]\nproject: XSEDE\n[a]\ntitle: A\n")
+    changed = incremental.refresh()
+    assert parsed == ["d1.conf", "d2.conf"]
+    assert {e["key"] for e in changed} == {"a", "b"}
+    assert incremental.bib.get("b")["project"] == "XSEDE"
+    assert as_dicts(incremental.bib) == as_dicts(parser.parse_bib(filenames))
+
+    # A change not affecting DEFAULT values only parses that file
+    del parsed[:]
+    write(d1, "[DEFAULT]\nproject: XSEDE\n[a]\ntitle: Changed\n")
+    incremental.refresh()
+    assert parsed == ["d1.conf"]
+    assert incremental.bib.get("a")["title"] == "Changed"
+
+def test_macros_reach_later_files(tmp_path):
+    b1 = tmp_path / "b1.bib"
+    b2 = tmp_path / "b2.bib"
+    b3 = tmp_path / "b3.bib"
+    write(b1, '@string{tg = "TeraGrid"}\n@misc{a, title = tg}\n')
+    write(b2, "@misc{b, title = tg # { Paper}}\n")
+    write(b3, "@misc{c, title = {Unrelated}}\n")
+    filenames = [str(b1), str(b2), str(b3)]
+    parser = BibTexParser()
+    incremental = IncrementalBib(parser, filenames)
+    assert incremental.bib.get("b")["title"] == "TeraGrid Paper"
+
+    parsed = record_parsed(parser)
+    write(b1, '@string{tg = "XSEDE"}\n@misc{a, title = tg}\n')
+    incremental.refresh()
+    # Macros defined in b1 are visible in the files after it
+    assert parsed == ["b1.bib", "b2.bib", "b3.bib"]
+    assert incremental.bib.get("b")["title"] == "XSEDE Paper"
+    assert as_dicts(incremental.bib) == as_dicts(parser.parse_bib(filenames))
+
+    del parsed[:]
+    write(b2, "@misc{b, title = tg # { Paper, Again}}\n")
+    incremental.refresh()
+    assert parsed == ["b2.bib"]
+    assert incremental.bib.get("b")["title"] == "XSEDE Paper, Again"
+
+def test_missing_conf_file(tmp_path):
+    conf = tmp_path / "a.conf"
+    missing = tmp_path / "missing.conf"
+    write(conf, "[a]\ntitle: A\n")
+    incremental = IncrementalBib(BibParser(), [str(conf), str(missing)])
+    assert [e["key"] for e in incremental.bib] == ["a"]
+    write(missing, "[b]\ntitle: B\n")
+    incremental.refresh()
+    assert [e["key"] for e in incremental.bib] == ["a", "b"]
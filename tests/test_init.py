@@ -0,0 +1,50 @@
+"""Tests of pybib's lazily imported names"""
+
+import json
+import os.path
+import subprocess
+import sys
+
+import pytest
+
+import pybib
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Third party modules only some of pybib needs
+HEAVY = ["mako", "requests", "urllib3"]
+
+SUBMODULES = sorted(set("pybib." + module
+                        for module, _ in pybib._EXPORTS.values()))
+
+def loaded_modules(code):
+    """Return names of modules loaded after running code in a fresh
+    interpreter"""
+    child = "{}\nimport json, sys\nprint(json.dumps(sorted(sys.modules)))"
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    result = subprocess.run([sys.executable, "-c", child.format(code)],
+                            env=env, cwd=ROOT, check=True,
+                            stdout=subprocess.PIPE, universal_newlines=True)
+    return set(json.loads(result.stdout))
+
+def test_import_loads_no_submodules():
+    modules = loaded_modules("import pybib")
+    assert "pybib" in modules
+    assert [m for m in HEAVY + SUBMODULES if m in modules] == []
+
+def test_name_loads_only_its_submodule():
+    modules = loaded_modules("from pybib import BibParser")
+    assert "pybib.bibparser" in modules
+    assert [m for m in HEAVY if m in modules] == []
+    for module in ("pybib.figshare", "pybib.renderer", "pybib.server",
+                   "pybib.urlchecker", "pybib.search", "pybib.columns"):
+        assert module not in modules
+
+def test_names():
+    from pybib.entry import Entry
+    assert pybib.Entry is Entry
+    # Cached once looked up
+    assert "Entry" in vars(pybib)
+    assert set(pybib.__all__) <= set(dir(pybib))
+    with pytest.raises(AttributeError):
+        pybib.NoSuchName
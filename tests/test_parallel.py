@@ -0,0 +1,74 @@
+"""Tests of pybib.parallel"""
+
+import io
+
+from pybib import BibParser
+from pybib import BibTexParser
+from pybib.parallel import decode
+from pybib.parallel import parse_parallel
+from pybib.parallel import split_file
+
+CHUNK_SIZE = 200
+
+def as_dicts(entries):
+    return [dict(entry.items()) for entry in entries]
+
+def write_bibtex(path, start, count, note=""):
+    with open(str(path), "w") as f:
+        for n in range(start, start + count):
+            if n % 10 == 5:
+                # Redefined part way through, so later chunks need it
+                f.write('@string{{tg = "TeraGrid {}"}}\n'.format(n))
+            f.write("@inproceedings{{paper{n},\n"
+                    "  title = tg # {{ Paper {n}}},\n"
+                    "  note = {{{note}}},\n"
+                    "  year = {year},\n"
+                    "}}\n\n".format(n=n, note=note, year=1990 + n % 30))
+
+def test_bibtex_matches_serial(tmp_path):
+    first = tmp_path / "first.bib"
+    second = tmp_path / "second.bib"
+    write_bibtex(first, 0, 40)
+    # Macros defined in the first file are used in the second
+    write_bibtex(second, 40, 3)
+    filenames = [str(first), str(second)]
+    parser = BibTexParser()
+    assert len(list(split_file(str(first), parser.BOUNDARY_RE,
+                               CHUNK_SIZE))) > 10
+    entries = parse_parallel(parser, filenames, 2, chunk_size=CHUNK_SIZE)
+    assert as_dicts(entries) == as_dicts(parser.iter_entries(filenames))
+    assert entries[41]["title"] == "TeraGrid 35 Paper 41"
+
+def test_bibtex_split_inside_entry(tmp_path):
+    # Lines starting with "@" inside values look like record starts
+    bib = tmp_path / "papers.bib"
+    write_bibtex(bib, 0, 20, note="Mail\n@example.com")
+    parser = BibTexParser()
+    chunks = list(split_file(str(bib), parser.BOUNDARY_RE, CHUNK_SIZE))
+    assert not all(
+        parser.parse_chunk(decode(data), str(bib), lineno, {})[1]
+        for start, end, lineno, data in chunks[:-1])
+    entries = parse_parallel(parser, [str(bib)], 2, chunk_size=CHUNK_SIZE)
+    assert as_dicts(entries) == as_dicts(parser.iter_entries([str(bib)]))
+    assert entries[19]["note"] == "Mail @example.com"
+
+def test_conf_matches_serial(tmp_path):
+    text = io.StringIO()
+    text.write("[DEFAULT]\nproject: TeraGrid\n\n")
+    for n in range(40):
+        if n == 20:
+            text.write("[DEFAULT]\ntype: paper\nproject: XSEDE\n\n")
+        text.write("[paper{n}]\ntitle: Paper {n} of %(project)s\n"
+                   "year: {year}\n\n".format(n=n, year=1990 + n % 30))
+    conf = tmp_path / "papers.conf"
+    conf.write_text(text.getvalue())
+    missing = str(tmp_path / "missing.conf")
+    filenames = [str(conf), missing]
+    parser = BibParser()
+    entries = parse_parallel(parser, filenames, 2, skip_unreadable=True,
+                             chunk_size=CHUNK_SIZE)
+    assert as_dicts(entries) == as_dicts(parser.iter_entries(filenames))
+    assert as_dicts(parser.parse_bib(filenames, processes=2)) == \
+        as_dicts(parser.parse_bib(filenames))
+    assert entries[0]["title"] == "Paper 0 of XSEDE"
+    assert entries[0]["type"] == "paper"
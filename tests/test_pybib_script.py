@@ -0,0 +1,64 @@
+"""Tests of scripts/pyBib.py"""
+
+import multiprocessing
+import os
+import os.path
+import stat
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), "scripts"))
+import pyBib
+
+from pybib import BibParser
+from pybib import Renderer
+
+EXAMPLES = os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), "examples")
+
+TEMPLATE = """% for entry in entries:
+${entry["key"]}: ${entry["title"]}
+% endfor
+"""
+
+@pytest.mark.parametrize("start_method", [
+    m for m in ("spawn", "forkserver", "fork")
+    if m in multiprocessing.get_all_start_methods()])
+def test_render_jobs_in_pool(tmp_path, start_method):
+    entries = BibParser().parse_bib([os.path.join(EXAMPLES, "papers.conf")])
+    template = tmp_path / "list.mako"
+    template.write_text(TEMPLATE)
+    jobs = [(str(template), str(tmp_path / "all.txt"), {}),
+            (str(template), str(tmp_path / "teragrid.txt"),
+             {"project": "TeraGrid"})]
+    serial = tmp_path / "serial"
+    serial.mkdir()
+    serial_jobs = [(t, str(serial / os.path.basename(o)), c)
+                   for t, o, c in jobs]
+
+    results = list(pyBib.render_jobs(jobs, entries, None, None, 2,
+                                     start_method))
+    assert [error for job, error in results] == [None, None]
+    for job, error in pyBib.render_jobs(serial_jobs, entries, None, None):
+        assert error is None
+    for (_, output, _), (_, serial_output, _) in zip(jobs, serial_jobs):
+        with open(output) as f, open(serial_output) as g:
+            assert f.read() == g.read()
+    with open(jobs[1][1]) as f:
+        lines = f.read().splitlines()
+    assert lines and len(lines) < len(entries) + 1
+
+def test_output_readable_by_others(tmp_path):
+    template = tmp_path / "list.mako"
+    template.write_text(TEMPLATE)
+    output = tmp_path / "list.txt"
+    entries = BibParser().parse_bib([os.path.join(EXAMPLES, "papers.conf")])
+    umask = os.umask(0o022)
+    try:
+        pyBib.render_to_file(Renderer(), str(template), str(output),
+                             {"entries": entries})
+    finally:
+        os.umask(umask)
+    assert stat.S_IMODE(os.stat(str(output)).st_mode) == 0o644
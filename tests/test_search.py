@@ -0,0 +1,52 @@
+"""Tests of pybib.search"""
+
+import pickle
+
+import pytest
+
+from pybib import CompactEntry
+from pybib import Entry
+from pybib import SearchIndex
+
+ENTRIES = [
+    Entry({"key": "a", "title": "Federated identity for grids",
+           "author": "Jim Basney and Von Welch", "year": "2005"}),
+    Entry({"key": "b", "title": "Grid security", "author": "Von Welch",
+           "year": "2010"}),
+    Entry({"key": "c", "title": "Identity overflow", "year": "99999999999"}),
+    Entry({"key": "d", "title": "Identity without year", "year": "n.d."}),
+]
+
+def keys(results):
+    return sorted(entry["key"] for score, entry in results)
+
+def test_bad_years_are_no_year():
+    index = SearchIndex(ENTRIES)
+    assert keys(index.search("identity")) == ["a", "c", "d"]
+    assert keys(index.search("identity year:..3000")) == ["a"]
+
+def test_save_and_load(tmp_path):
+    index = SearchIndex(ENTRIES)
+    filename = str(tmp_path / "index")
+    index.save(filename)
+    loaded = SearchIndex.load(filename)
+    for query in ("identity", "grid", "author:welch year:2006..",
+                  "federated identity", "year:2005"):
+        assert keys(loaded.search(query)) == keys(index.search(query))
+    assert keys(loaded.search("author:welch year:2006..")) == ["b"]
+
+def test_loaded_entries(tmp_path):
+    filename = str(tmp_path / "index")
+    SearchIndex(ENTRIES).save(filename)
+    for entry_class in (Entry, CompactEntry):
+        loaded = SearchIndex.load(filename, entry_class)
+        score, entry = loaded.search("grid security")[0]
+        assert isinstance(entry, entry_class)
+        assert dict(entry.items()) == dict(ENTRIES[1].items())
+
+def test_not_an_index(tmp_path):
+    filename = tmp_path / "index"
+    for data in (b"", b"pyBib search index 2\n", pickle.dumps(ENTRIES)):
+        filename.write_bytes(data)
+        with pytest.raises(ValueError):
+            SearchIndex.load(str(filename))
@@ -0,0 +1,90 @@
+"""Tests of pybib.server"""
+
+import http.client
+import os
+import threading
+
+import pytest
+
+pytest.importorskip("mako")
+
+from pybib import BibParser
+from pybib import IncrementalBib
+from pybib import Renderer
+from pybib import RenderService
+from pybib.server import TemplateNotFound
+from pybib.server import make_server
+
+TEMPLATE = "% for e in entries:\n${e['key']} ${e['year']}\n% endfor\n"
+
+def write(path, text):
+    """Write text to path, making sure its modification time changes"""
+    mtime = os.stat(str(path)).st_mtime_ns if path.exists() else 0
+    path.write_text(text)
+    os.utime(str(path), ns=(mtime + 10**9, mtime + 10**9))
+
+@pytest.fixture
+def service(tmp_path):
+    templates = tmp_path / "templates"
+    templates.mkdir()
+    (templates / "pubs.txt.mako").write_text(TEMPLATE)
+    (templates / "pubs.html.mako").write_text(TEMPLATE)
+    # Outside the template directory, so never rendered
+    (tmp_path / "secret.mako").write_text("Secret\n")
+    bib = tmp_path / "pubs.conf"
+    write(bib, "[a]\nyear: 2010\nproject: TeraGrid\n\n"
+          "[b]\nyear: 2011\nproject: TeraGrid\n\n"
+          "[c]\nyear: 2011\nproject: XSEDE\n")
+    incremental = IncrementalBib(BibParser(), [str(bib)])
+    service = RenderService(incremental, Renderer(), [str(templates)],
+                            interval=0)
+    return service
+
+@pytest.fixture
+def server(service):
+    server = make_server(("127.0.0.1", 0), service)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+def get(server, path):
+    """Return (status, content type, body) of GET path from server"""
+    connection = http.client.HTTPConnection(*server.server_address)
+    try:
+        connection.request("GET", path)
+        response = connection.getresponse()
+        return (response.status, response.getheader("Content-Type"),
+                response.read().decode("utf-8"))
+    finally:
+        connection.close()
+
+def test_render(service):
+    assert service.render("pubs.txt.mako") == "a 2010\nb 2011\nc 2011\n"
+    assert service.render("pubs.txt.mako", {"project": "TeraGrid",
+                                            "year": "2011"}) == "b 2011\n"
+    for name in ("../secret.mako", "/secret.mako", "missing.mako",
+                 "sub/../../secret.mako"):
+        with pytest.raises(TemplateNotFound):
+            service.render(name)
+
+def test_reload(service, tmp_path):
+    assert service.render("pubs.txt.mako", {"year": "2012"}) == ""
+    write(tmp_path / "pubs.conf", "[a]\nyear: 2012\n")
+    assert service.render("pubs.txt.mako", {"year": "2012"}) == "a 2012\n"
+    assert service.render("pubs.txt.mako") == "a 2012\n"
+
+def test_http(server):
+    assert get(server, "/pubs.html.mako?project=TeraGrid&year=2011") == \
+        (200, "text/html; charset=utf-8", "b 2011\n")
+    assert get(server, "/pubs.txt.mako?project=XSEDE") == \
+        (200, "text/plain; charset=utf-8", "c 2011\n")
+    status, _, _ = get(server, "/pubs.txt.mako?year=2010&year=2011")
+    assert status == 400
+    for path in ("/../secret.mako", "/%2e%2e/secret.mako",
+                 "/..%2fsecret.mako", "/missing.mako"):
+        status, _, body = get(server, path)
+        assert status == 404
+        assert "Secret" not in body
@@ -0,0 +1,87 @@
+"""Tests of pybib.snapshot"""
+
+import os
+import pickle
+
+import pytest
+
+from pybib import BibParser
+from pybib import snapshot
+from pybib.snapshot import Snapshot
+from pybib.snapshot import snapshot_dir
+from pybib.snapshot import snapshots_enabled
+
+CONF = "[paper]\ntitle: A Paper\nyear: 2010\n\n[other]\ntitle: Another\n"
+
+@pytest.fixture
+def cache_home(tmp_path, monkeypatch):
+    cache_home = tmp_path / "cache"
+    monkeypatch.setenv("XDG_CACHE_HOME", str(cache_home))
+    return cache_home
+
+@pytest.fixture
+def conf(tmp_path):
+    sources = tmp_path / "sources"
+    sources.mkdir()
+    conf = sources / "papers.conf"
+    conf.write_text(CONF)
+    return conf
+
+def parse(conf):
+    return [dict(e.items()) for e in
+            BibParser(snapshots=True).iter_entries([str(conf)])]
+
+def test_opt_in(monkeypatch):
+    monkeypatch.delenv("PYBIB_SNAPSHOTS", raising=False)
+    assert not snapshots_enabled()
+    monkeypatch.setenv("PYBIB_SNAPSHOTS", "1")
+    assert snapshots_enabled()
+
+def test_saved_in_cache_not_with_sources(cache_home, conf):
+    entries = parse(conf)
+    assert os.listdir(conf.parent) == ["papers.conf"]
+    directory = snapshot_dir()
+    assert directory.startswith(str(cache_home))
+    assert os.stat(directory).st_mode & 0o777 == 0o700
+    assert any(name.endswith(".snapshot") for name in os.listdir(directory))
+    # Loaded from the snapshot
+    path = Snapshot([str(conf)], "BibParser").path
+    assert [dict(e.items()) for e in
+            Snapshot([str(conf)], "BibParser").load(dict)] == entries
+    assert parse(conf) == entries
+    assert os.path.exists(path)
+
+class Exploit(object):
+    def __reduce__(self):
+        return (os.mkdir, (EXPLOITED,))
+
+def test_tampered_snapshot_not_unpickled(cache_home, conf, tmp_path):
+    global EXPLOITED
+    EXPLOITED = str(tmp_path / "exploited")
+    entries = parse(conf)
+    path = Snapshot([str(conf)], "BibParser").path
+    with open(path, "rb") as f:
+        data = f.read()
+    start = len(snapshot.MAGIC) + snapshot.MAC_LENGTH
+    # Replace everything after the MAC with a malicious pickle
+    payload = pickle.dumps(Exploit())
+    with open(path, "wb") as f:
+        f.write(data[:start] + snapshot.HEADER_LENGTH.pack(len(payload))
+                + payload + payload)
+    assert parse(conf) == entries
+    assert not os.path.exists(EXPLOITED)
+
+def test_snapshot_from_another_key_not_loaded(cache_home, conf):
+    entries = parse(conf)
+    other = Snapshot([str(conf)], "BibParser", key=b"x" * 32)
+    other.save([(0, "forged")], ["title"], other.stat_sources())
+    assert parse(conf) == entries
+
+def test_writable_directory_not_used(cache_home, conf):
+    directory = snapshot_dir()
+    os.chmod(directory, 0o777)
+    assert snapshot_dir() is None
+    assert Snapshot([str(conf)], "BibParser").path is None
+    assert parse(conf) == [dict(e.items()) for e in
+                           BibParser().iter_entries([str(conf)])]
+    assert os.listdir(directory) == []
@@ -0,0 +1,153 @@
+"""Tests of pybib.urlchecker against a local HTTP server"""
+
+import http.server
+import os
+import os.path
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from pybib import URLCache
+from pybib import URLChecker
+from pybib.urlchecker import normalize_url
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPTS = os.path.join(ROOT, "scripts")
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    """Responds according to the path:
+
+    /ok          200 to HEAD and GET
+    /no-head     405 to HEAD, 200 to GET
+    /slow-head   HEAD takes longer than the checker's timeout, 200 to GET
+    /missing     404
+    /busy        200 after a pause, counting concurrent requests
+    """
+
+    def do_HEAD(self):
+        self.server.requests.append(("HEAD", self.path))
+        if self.path == "/no-head":
+            self.respond(405)
+        elif self.path == "/slow-head":
+            time.sleep(1)
+            self.respond(200)
+        else:
+            self.respond_to_path()
+
+    def do_GET(self):
+        self.server.requests.append(("GET", self.path))
+        self.respond_to_path()
+
+    def respond_to_path(self):
+        if self.path == "/busy":
+            with self.server.lock:
+                self.server.active += 1
+                self.server.max_active = max(self.server.max_active,
+                                             self.server.active)
+            time.sleep(0.05)
+            with self.server.lock:
+                self.server.active -= 1
+        self.respond(404 if self.path == "/missing" else 200)
+
+    def respond(self, code):
+        try:
+            self.send_response(code)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+        except OSError:
+            # Client gave up waiting
+            pass
+
+    def log_message(self, format, *args):
+        pass
+
+@pytest.fixture
+def server(monkeypatch):
+    monkeypatch.setenv("NO_PROXY", "127.0.0.1")
+    # For scripts run by tests
+    monkeypatch.setenv("PYTHONPATH", ROOT)
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    server.requests = []
+    server.lock = threading.Lock()
+    server.active = server.max_active = 0
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,),
+                              daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def url(server, path):
+    return "http://127.0.0.1:{}{}".format(server.server_address[1], path)
+
+def test_head_ok(server):
+    assert URLChecker().check(url(server, "/ok")) == (True, 200)
+    assert server.requests == [("HEAD", "/ok")]
+
+def test_get_after_head_not_allowed(server):
+    assert URLChecker().check(url(server, "/no-head")) == (True, 200)
+    assert server.requests == [("HEAD", "/no-head"), ("GET", "/no-head")]
+
+def test_get_after_head_fails(server):
+    checker = URLChecker(timeout=0.2, retries=0)
+    assert checker.check(url(server, "/slow-head")) == (True, 200)
+    assert server.requests == [("HEAD", "/slow-head"), ("GET", "/slow-head")]
+
+def test_missing(server):
+    assert URLChecker().check(url(server, "/missing")) == (False, 404)
+
+def test_connection_refused(server):
+    good, status = URLChecker(retries=0).check("http://127.0.0.1:1/")
+    assert not good and isinstance(status, str)
+
+def test_per_host_limit(server):
+    checker = URLChecker(workers=16, per_host=3)
+    urls = [url(server, "/busy")] * 24
+    results = list(checker.check_all(urls))
+    assert [good for _, good, _ in results] == [True] * 24
+    assert 1 < server.max_active <= 3
+
+def test_bad_port(server, tmp_path):
+    cache = URLCache(str(tmp_path / "cache.json"))
+    checker = URLChecker(retries=0, cache=cache)
+    good, status = checker.check("http://127.0.0.1:bad/x")
+    assert not good and isinstance(status, str)
+    assert checker.check(url(server, "/ok")) == (True, 200)
+    cache.save()
+
+def test_unparsable_urls_in_check_all(server, tmp_path):
+    checker = URLChecker(retries=0, cache=URLCache(str(tmp_path / "c.json")))
+    urls = ["http://a..com/", "http://{}.com/".format("a" * 70),
+            "http://[::1/", url(server, "/ok")]
+    results = list(checker.check_all(urls))
+    assert [(u, good) for u, good, status in results] == \
+        [(u, False) for u in urls[:3]] + [(urls[3], True)]
+    assert all(isinstance(status, str) for u, good, status in results[:3])
+
+def test_corrupt_cache(server, tmp_path):
+    filename = tmp_path / "cache.json"
+    filename.write_text('{"http://127.0.0.1/": {"status"')
+    cache = URLCache(str(filename))
+    assert cache.results == {}
+    URLChecker(cache=cache).check(url(server, "/ok"))
+    cache.save()
+    assert normalize_url(url(server, "/ok")) in URLCache(str(filename)).results
+
+def test_script_with_bad_url_and_corrupt_cache(server, tmp_path):
+    bib = tmp_path / "papers.conf"
+    bib.write_text("[bad]\nurl: http://127.0.0.1:bad/x\n"
+                   "[good]\nurl: {}\n".format(url(server, "/ok")))
+    cache = tmp_path / "cache.json"
+    cache.write_text("not json")
+    result = subprocess.run(
+        [sys.executable, os.path.join(SCRIPTS, "pyBib-check-urls.py"),
+         "--cache", str(cache), "--retries", "0", str(bib)],
+        capture_output=True, text=True)
+    assert result.returncode == 1
+    assert "Traceback" not in result.stderr
+    assert result.stdout.startswith("http://127.0.0.1:bad/x ... BAD")
+    assert normalize_url(url(server, "/ok")) in URLCache(str(cache)).results